@@ -0,0 +1,98 @@
+"""Decode, filter and enrich Kaggle <year>.csv files on 1..N cores (parallel_csv.py).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_csv_decode --rows 20000000 --years 2017,2018 --workers 1,2,4,8,16
+
+Runs the per-block work of get_data_and_save.py --streaming (pd.read_csv of
+the FLIGHT_RAW columns, whitelist filter, carrier and airport enrichment) for
+each worker count and prints rows/s and the speedup over one worker, next to
+the chunked single-core pd.read_csv it replaced. Every worker count must
+return the same frames in the same order.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from functools import partial
+
+import pandas as pd
+
+import parallel_csv
+from enrichment import build_airport_lookup, prepare_flights
+from schemas import FLIGHT_RAW, columns, pandas_dtypes
+from benchmarks.synthetic import make_airports, make_carriers, write_kaggle_files
+
+
+def checksum(frames):
+    return sum(int(pd.util.hash_pandas_object(frame, index=False).sum()) for frame in frames)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--airports", type=int, default=140)
+    parser.add_argument("--years", default="2018", help="Comma-separated flight years")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count()}", help="Comma-separated worker counts")
+    parser.add_argument("--block_mb", type=int, default=parallel_csv.BLOCK_MB)
+    parser.add_argument("--workdir", default=None, help="Reuse <year>.csv files generated here")
+    args = parser.parse_args()
+
+    airport_info = make_airports(args.airports)
+    code_to_carrier = make_carriers()
+    years = sorted(int(year) for year in args.years.split(","))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_csv_decode_")
+    paths = [os.path.join(workdir, f"{year}.csv") for year in years]
+    if all(os.path.exists(path) for path in paths):
+        print(f"📂Reusing {paths}")
+    else:
+        write_kaggle_files(
+            workdir, args.rows, airport_info["code"], list(code_to_carrier), years=years
+        )
+    mb = sum(os.path.getsize(path) for path in paths) / 2**20
+
+    options = {"usecols": columns(FLIGHT_RAW), "dtype": pandas_dtypes(FLIGHT_RAW)}
+    # Every other airport is whitelisted, so the filter drops about half the flights
+    transform = partial(
+        prepare_flights,
+        airport_filter=airport_info["code"][::2].to_numpy(),
+        code_to_carrier=code_to_carrier,
+        airport_lookup=build_airport_lookup(airport_info),
+    )
+
+    start = time.perf_counter()
+    rows = 0
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=50000, **options):
+            rows += len(chunk)
+            transform(chunk)
+    baseline = time.perf_counter() - start
+    print(f"{'chunked pd.read_csv':<22} {baseline:>7.1f}s  {rows / baseline:>12,.0f} rows/s  ({mb:,.0f}MB)")
+
+    checksums = set()
+    single = None
+    for workers in (int(n) for n in args.workers.split(",")):
+        pool = parallel_csv.decode_pool(workers)
+        start = time.perf_counter()
+        frames = []
+        rows = 0
+        for _, block_rows, frame in parallel_csv.read_files(
+            paths, args.block_mb * 2**20, options, transform, pool, max_pending=2 * workers
+        ):
+            rows += block_rows
+            frames.append(frame)
+        seconds = time.perf_counter() - start
+        if pool is not None:
+            pool.shutdown()
+        single = single or seconds
+        print(
+            f"{f'{workers} worker(s)':<22} {seconds:>7.1f}s  {rows / seconds:>12,.0f} rows/s"
+            f"  x{single / seconds:.2f} vs. first, x{baseline / seconds:.2f} vs. chunked"
+        )
+        checksums.add(checksum(frames))
+    assert len(checksums) == 1, "worker counts returned different frames"
+
+
+if __name__ == "__main__":
+    main()
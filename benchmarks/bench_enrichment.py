@@ -0,0 +1,82 @@
+"""Compare per-row lambda enrichment with the indexed join in enrichment.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_enrichment --rows 10000000
+"""
+
+import argparse
+import time
+
+from pandas.testing import assert_frame_equal
+
+from enrichment import add_carrier_names, build_airport_lookup, enrich_airports
+from benchmarks.synthetic import make_airports, make_carriers, make_flights
+
+features = ["time_zone", "city", "state", "country", "longitude", "latitude", "airport_name"]
+
+
+def legacy_enrich(df, airport_info, code_to_carrier):
+    # Previous get_data_and_save.py implementation, kept here as the baseline
+    airport_dict = {
+        row.code: {
+            "time_zone": row.time_zone,
+            "city": row.city,
+            "state": row.state,
+            "latitude": row.latitude,
+            "longitude": row.longitude,
+            "country": row.country,
+            "airport_name": row.name,
+        }
+        for row in airport_info.itertuples(index=False)
+    }
+    df["OP_CARRIER_NAME"] = df["OP_CARRIER"].map(lambda x: code_to_carrier.get(x, None))
+    for feature in features:
+        df[f"{feature.upper()}_ORIGIN"] = df["ORIGIN"].map(
+            lambda x: airport_dict.get(x, {}).get(feature, None)
+        )
+        df[f"{feature.upper()}_DEST"] = df["DEST"].map(
+            lambda x: airport_dict.get(x, {}).get(feature, None)
+        )
+    return df
+
+
+def vectorized_enrich(df, airport_info, code_to_carrier):
+    df = add_carrier_names(df, code_to_carrier)
+    return enrich_airports(df, build_airport_lookup(airport_info))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--airports", type=int, default=140)
+    args = parser.parse_args()
+
+    airport_info = make_airports(args.airports)
+    code_to_carrier = make_carriers()
+    # A few codes outside the airport table, like real data
+    codes = list(airport_info["code"]) + ["XXX", "YYY"]
+    flights = make_flights(args.rows, codes, list(code_to_carrier) + ["ZZ"])
+    print(f"📊Synthetic frame: {len(flights):,} rows, {args.airports} airports")
+
+    timings = {}
+    results = {}
+    for name, fn in [("legacy", legacy_enrich), ("vectorized", vectorized_enrich)]:
+        start = time.perf_counter()
+        results[name] = fn(flights.copy(), airport_info, code_to_carrier)
+        timings[name] = time.perf_counter() - start
+        print(f"⏱️{name}: {timings[name]:.2f}s")
+
+    # None (legacy) and NaN (join) both mean "no airport match"; strings are categorical now
+    vectorized = results["vectorized"]
+    categorical = vectorized.select_dtypes("category").columns
+    assert_frame_equal(
+        results["legacy"].astype({name: object for name in categorical}),
+        vectorized.astype({name: object for name in categorical}),
+        check_dtype=False,
+    )
+    print(f"✅Outputs match, speedup x{timings['legacy'] / timings['vectorized']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Bytes written and Spark read time for the CSV vs Parquet stage hand-off.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_handoff_format --rows 2000000
+
+The Spark part is skipped when pyspark is not installed.
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from enrichment import add_carrier_names, build_airport_lookup, enrich_airports
+from parquet_io import write_partitioned
+from schemas import FLIGHT, FLIGHT_PARTITIONS, spark_schema
+from benchmarks.synthetic import make_airports, make_carriers, make_flights
+
+
+def size_of(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def spark_read_times(csv_path, parquet_path):
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col
+
+    spark = (
+        SparkSession.builder.appName("bench_handoff_format")
+        .config("spark.sql.session.timeZone", "UTC")
+        .getOrCreate()
+    )
+    # Same access pattern as spark-job.py: a few columns, one airport filter
+    query = lambda df: (
+        df.select("FL_DATE", "ORIGIN", "DEST", "DEP_TIME", "DEP_DELAY")
+        .where(col("ORIGIN") == "ATL")
+        .count()
+    )
+    timings = {}
+    start = time.perf_counter()
+    query(spark.read.csv(csv_path, header=True, inferSchema=True))
+    timings["csv"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    query(spark.read.schema(spark_schema(FLIGHT)).parquet(parquet_path))
+    timings["parquet"] = time.perf_counter() - start
+    spark.stop()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    airport_info = make_airports()
+    # Make sure the Spark filter matches something
+    airport_info.loc[0, "code"] = "ATL"
+    code_to_carrier = make_carriers()
+    df = make_flights(args.rows, airport_info["code"], list(code_to_carrier))
+    df = add_carrier_names(df, code_to_carrier)
+    df = enrich_airports(df, build_airport_lookup(airport_info))
+    df["year"] = df["FL_DATE"].str[:4].astype("int16")
+
+    workdir = tempfile.mkdtemp(prefix="bench_handoff_")
+    csv_path = os.path.join(workdir, "flights.csv")
+    parquet_path = os.path.join(workdir, "flights.parquet")
+    try:
+        start = time.perf_counter()
+        df.to_csv(csv_path)  # legacy hand-off, pandas index included
+        csv_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_partitioned([df], parquet_path, FLIGHT, FLIGHT_PARTITIONS)
+        parquet_write = time.perf_counter() - start
+
+        csv_bytes, parquet_bytes = size_of(csv_path), size_of(parquet_path)
+        print(f"📊{len(df):,} enriched rows")
+        print(f"💾csv:     {csv_bytes / 1e6:9.1f} MB written in {csv_write:.2f}s")
+        print(f"💾parquet: {parquet_bytes / 1e6:9.1f} MB written in {parquet_write:.2f}s")
+        print(f"✅parquet is {csv_bytes / parquet_bytes:.1f}x smaller")
+
+        try:
+            timings = spark_read_times(csv_path, parquet_path)
+        except ImportError:
+            print("⚠️pyspark not installed, skipping Spark read times")
+        else:
+            for name, seconds in timings.items():
+                print(f"⏱️spark read ({name}): {seconds:.2f}s")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
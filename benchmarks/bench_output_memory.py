@@ -0,0 +1,102 @@
+"""Peak RSS of the streaming flight output, CSV vs. Parquet, as the input grows.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_output_memory --rows 1500000,3000000
+
+Each (format, rows) run is a fresh process that generates enriched flights
+chunk by chunk (like get_data_and_save.py --streaming), casts them to
+schemas.FLIGHT and writes them with the stage's writer: the CSV loop or
+parquet_io.write_partitioned. With output bounded by the chunk size, peak RSS
+stays about flat when the row count doubles.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import make_airports, make_carriers, make_flights
+from enrichment import add_carrier_names, build_airport_lookup, enrich_airports
+from instrumentation import peak_rss_mb
+from schemas import FLIGHT, FLIGHT_PARTITIONS, conform
+
+
+def chunks(rows, chunk_rows, airports, years):
+    airport_info = make_airports(airports)
+    code_to_carrier = make_carriers()
+    lookup = build_airport_lookup(airport_info)
+    for seed, start in enumerate(range(0, rows, chunk_rows)):
+        year = years[seed % len(years)]
+        frame = make_flights(
+            min(chunk_rows, rows - start),
+            airport_info["code"],
+            list(code_to_carrier),
+            seed=seed,
+            start=f"{year}-01-01",
+        )
+        frame = enrich_airports(add_carrier_names(frame, code_to_carrier), lookup)
+        frame["year"] = frame["FL_DATE"].str[:4].astype("int16")
+        yield conform(frame, FLIGHT)
+
+
+def write(output_format, rows, chunk_rows, airports, years, path):
+    """Write rows flights to path as the flight stage would; (seconds, peak RSS MB)."""
+    started = time.perf_counter()
+    frames = chunks(rows, chunk_rows, airports, years)
+    if output_format == "parquet":
+        from parquet_io import write_partitioned
+
+        write_partitioned(frames, path, FLIGHT, FLIGHT_PARTITIONS)
+    else:
+        with open(path, "w") as out:
+            for i, frame in enumerate(frames):
+                frame.to_csv(out, header=i == 0, index=False)
+    return time.perf_counter() - started, peak_rss_mb()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="1500000,3000000", help="Comma-separated row counts")
+    parser.add_argument("--formats", default="csv,parquet")
+    parser.add_argument("--chunk_rows", type=int, default=80_000)
+    parser.add_argument("--airports", type=int, default=140)
+    parser.add_argument("--years", default="2017,2018", help="Comma-separated flight years")
+    parser.add_argument("--child", nargs=2, metavar=("FORMAT", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    years = [int(year) for year in args.years.split(",")]
+
+    if args.child:
+        output_format, rows = args.child[0], int(args.child[1])
+        with tempfile.TemporaryDirectory(prefix="bench_output_memory_") as workdir:
+            seconds, peak = write(
+                output_format, rows, args.chunk_rows, args.airports, years,
+                os.path.join(workdir, f"flights.{output_format}"),
+            )
+        print(f"{seconds:.3f} {peak}")
+        return
+
+    for output_format in args.formats.split(","):
+        peaks = []
+        for rows in (int(n) for n in args.rows.split(",")):
+            # A fresh process per run, so every peak RSS starts from the same baseline
+            result = subprocess.run(
+                [
+                    sys.executable, "-m", "benchmarks.bench_output_memory",
+                    "--chunk_rows", str(args.chunk_rows), "--airports", str(args.airports),
+                    "--years", args.years, "--child", output_format, str(rows),
+                ],
+                check=True, capture_output=True, text=True,
+            )
+            seconds, peak = (float(value) for value in result.stdout.split()[-2:])
+            peaks.append(peak)
+            print(
+                f"{output_format:<8} {rows:>12,} rows {seconds:>7.1f}s  peak RSS {peak:>7.1f}MB"
+                f"  (x{peak / peaks[0]:.2f} vs. first)"
+            )
+
+
+if __name__ == "__main__":
+    main()
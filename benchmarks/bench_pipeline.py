@@ -0,0 +1,159 @@
+"""Run the pipeline stages on synthetic data and report throughput and peak memory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_pipeline --rows 10000000 --airports 100 --years 2017,2018
+
+Flights are generated in the Kaggle <year>.csv layout and hourly weather in the
+Meteostat layout (benchmarks/synthetic.py) into --workdir, then
+get_data_and_save.py (--input_dir), get_weather.py (--local_source) and
+spark-job.py run there as separate processes, exactly as in run_pipeline.sh.
+Wall time, rows and peak RSS come from each stage's run report
+(instrumentation.py), so nothing is downloaded and no Meteostat call is made.
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+import instrumentation
+from schemas import WEATHER_PATHS
+from benchmarks.synthetic import (
+    make_airports,
+    make_carriers,
+    write_kaggle_files,
+    write_weather_files,
+)
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def stage_commands(input_format, years):
+    return {
+        "ingest": [
+            "get_data_and_save.py",
+            "--input_dir",
+            "kaggle",
+            "--start_year",
+            str(min(years)),
+            "--streaming",
+            "--output_format",
+            input_format,
+        ],
+        "weather": [
+            "get_weather.py",
+            "--input_format",
+            input_format,
+            "--output_format",
+            input_format,
+            "--local_source",
+            "meteostat",
+            "--no_cache",
+        ],
+        "spark": ["spark-job.py", "--input_format", input_format],
+    }
+
+
+def generate(workdir, rows, n_airports, years, gap_rate):
+    airport_info = make_airports(n_airports)
+    code_to_carrier = make_carriers()
+    os.makedirs(workdir, exist_ok=True)
+    airport_info.to_csv(os.path.join(workdir, "airports.csv"), index=False)
+    pd.DataFrame({"ORIGIN": airport_info["code"]}).to_csv(
+        os.path.join(workdir, "airport_whitelist.csv"), index=False
+    )
+    shutil.copy(os.path.join(REPO, "codes_to_carrier.csv"), workdir)
+
+    start = time.perf_counter()
+    write_kaggle_files(
+        os.path.join(workdir, "kaggle"),
+        rows,
+        airport_info["code"],
+        list(code_to_carrier),
+        years=years,
+    )
+    # get_weather.py asks for 3 days past the last flight date
+    write_weather_files(
+        os.path.join(workdir, "meteostat"),
+        airport_info["code"],
+        f"{min(years)}-01-01",
+        f"{max(years) + 1}-01-03",
+        gap_rate=gap_rate,
+    )
+    print(f"📊Generated {rows:,} flights, {n_airports} airports in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--airports", type=int, default=100)
+    parser.add_argument("--years", default="2018", help="Comma-separated flight years")
+    parser.add_argument("--gap_rate", type=float, default=0.02)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="parquet")
+    parser.add_argument(
+        "--stages",
+        default="ingest,weather,spark",
+        help="Comma-separated subset of ingest, weather, spark (in that order)",
+    )
+    parser.add_argument(
+        "--workdir",
+        default=None,
+        help="Reuse generated data here (default: a fresh temporary directory)",
+    )
+    args = parser.parse_args()
+
+    years = sorted(int(year) for year in args.years.split(","))
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    if os.path.isdir(os.path.join(workdir, "kaggle")):
+        print(f"📂Reusing synthetic data in {workdir}")
+    else:
+        generate(workdir, args.rows, args.airports, years, args.gap_rate)
+
+    run_id = "bench-" + time.strftime("%Y%m%dT%H%M%S")
+    env = dict(
+        os.environ,
+        PIPELINE_RUN_ID=run_id,
+        PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get("PYTHONPATH")])),
+    )
+    commands = stage_commands(args.format, years)
+    for name in args.stages.split(","):
+        script, *options = commands[name]
+        print(f"⌛️{name}: {script} {' '.join(options)}")
+        if name == "weather":
+            # Otherwise get_weather.py resumes and skips airports fetched by a previous run
+            shutil.rmtree(os.path.join(workdir, WEATHER_PATHS[args.format]), ignore_errors=True)
+        result = subprocess.run(
+            [sys.executable, os.path.join(REPO, script), *options],
+            cwd=workdir,
+            env=env,
+            stdout=subprocess.DEVNULL,
+        )
+        if result.returncode != 0:
+            sys.exit(f"❌{name} failed with exit code {result.returncode}")
+
+    report = instrumentation.load(
+        os.path.join(workdir, instrumentation.report_path(run_id))
+    )
+    print(f"📋Run report {os.path.join(workdir, instrumentation.report_path(run_id))}")
+    for stage in report["stages"]:
+        seconds = stage["wall_seconds"]
+        # Throughput in rows written; spark_job's rows_in counts every scan of every input
+        rows = stage["rows_out"] or 0
+        line = (
+            f"  {stage['stage']:<13} {seconds:>8.1f}s  {rows / seconds if seconds else 0:>12,.0f} rows/s out"
+            f"  rows {stage['rows_in']} -> {stage['rows_out']}"
+            f"  peak RSS {stage['peak_rss_mb']:.0f}MB"
+        )
+        if stage.get("peak_jvm_heap_mb") is not None:
+            line += f", JVM heap {stage['peak_jvm_heap_mb']:.0f}MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Task duration spread of the shuffle weather join on hub-skewed flights, with
+and without salting hot airports and AQE skew-join splitting (weather_join.py).
+
+Run from the repository root (needs pyspark):
+
+    python -m benchmarks.bench_skew --flights 5000000 --airports 140 --skew 4 --salt_buckets 16
+
+Airports are drawn as floor(airports * u ** skew) for uniform u, so the first
+few codes carry most of the flights, like ATL / ORD / DFW / DEN. Broadcast
+joins are disabled so both sides are shuffled as in spark-job.py's fallback.
+Each variant prints wall time and the slowest task against the median of its
+most skewed stage (instrumentation.task_spread).
+"""
+
+import argparse
+import time
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from instrumentation import spark_stage_metrics, task_spread
+from weather_join import airport_counts, hot_airports, shuffle_join
+
+BASE = 1514764800  # 2018-01-01 00:00:00 UTC
+
+
+def make_data(spark, n_flights, n_airports, days, skew, partitions):
+    hours = days * 24
+    weather = spark.range(0, n_airports * hours, numPartitions=partitions).select(
+        F.format_string("A%03d", (F.col("id") / hours).cast("int")).alias("airport"),
+        F.timestamp_seconds(F.lit(BASE) + (F.col("id") % hours) * 3600).alias("time"),
+        (F.rand(1) * 40 - 10).alias("temperature_deg_c"),
+        (F.rand(3) * 60).alias("wind_speed_km_per_hr"),
+        (F.rand(4) * 100).alias("relative_humidity"),
+        (F.rand(5) * 5).alias("precipitation"),
+        F.when(F.rand(6) < 0.8, "Clear").otherwise("Rain").alias("weather_condition"),
+    )
+    departure = F.lit(BASE) + (F.abs(F.hash("id")) % (hours - 12)) * 3600
+    hub = lambda seed: F.format_string(  # noqa: E731
+        "A%03d", F.floor(F.lit(n_airports) * F.pow(F.rand(seed), F.lit(skew))).cast("int")
+    )
+    flights = spark.range(0, n_flights, numPartitions=partitions).select(
+        F.col("id").alias("FLIGHT_ID"),
+        hub(7).alias("ORIGIN"),
+        hub(8).alias("DEST"),
+        F.timestamp_seconds(departure).alias("Departure_Time_UTC"),
+        F.timestamp_seconds(departure + (F.col("id") % 6 + 1) * 3600).alias(
+            "Arrival_Time_UTC"
+        ),
+    )
+    return flights.cache(), weather.cache()
+
+
+def run(spark, name, flights, weather, hot, salt_buckets, skew_join):
+    spark.conf.set("spark.sql.adaptive.skewJoin.enabled", str(skew_join).lower())
+    before = max((s["stage_id"] for s in spark_stage_metrics(spark)), default=-1)
+    start = time.perf_counter()
+    joined = shuffle_join(flights, weather, hot, salt_buckets)
+    # Row hash sum: every variant must return the same rows
+    checksum = joined.select(F.sum(F.xxhash64(*joined.columns)).alias("c")).first().c
+    seconds = time.perf_counter() - start
+    stages = [s for s in spark_stage_metrics(spark) if s["stage_id"] > before]
+    spread = task_spread(stages)
+    line = f"{name:<28} {seconds:>7.1f}s"
+    if spread:
+        line += (
+            f"  slowest task {spread['task_ms_max']:>6}ms, median {spread['task_ms_p50']:>5}ms,"
+            f" p95 {spread['task_ms_p95']:>5}ms ({spread['tasks']} tasks)"
+        )
+    print(line)
+    return checksum
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=2_000_000)
+    parser.add_argument("--airports", type=int, default=140)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--skew", type=float, default=4.0, help="Power-law exponent of airports")
+    parser.add_argument("--salt_buckets", type=int, default=16)
+    parser.add_argument("--skew_factor", type=float, default=4.0)
+    parser.add_argument(
+        "--partitions", type=int, default=8, help="Input partitions (more than one, or nothing is shuffled)"
+    )
+    args = parser.parse_args()
+
+    spark = (
+        SparkSession.builder.appName("bench_skew")
+        .config("spark.sql.session.timeZone", "UTC")
+        .config("spark.sql.autoBroadcastJoinThreshold", "-1")
+        .config("spark.sql.adaptive.enabled", "true")
+        # Keep the 200 shuffle partitions, so the spread is between equal-sized key ranges
+        .config("spark.sql.adaptive.coalescePartitions.enabled", "false")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("ERROR")
+
+    flights, weather = make_data(
+        spark, args.flights, args.airports, args.days, args.skew, args.partitions
+    )
+    print(f"{flights.count():,} flights, {weather.count():,} weather rows")
+    hot = hot_airports(airport_counts(flights), args.skew_factor)
+
+    checksums = {
+        run(spark, "no skew handling", flights, weather, None, 0, False),
+        run(spark, "AQE skew join", flights, weather, None, 0, True),
+        run(spark, f"salted x{args.salt_buckets}", flights, weather, hot, args.salt_buckets, False),
+        run(
+            spark,
+            f"salted x{args.salt_buckets} + AQE skew join",
+            flights,
+            weather,
+            hot,
+            args.salt_buckets,
+            True,
+        ),
+    }
+    assert len(checksums) == 1, "variants returned different rows"
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Exact-timestamp double join vs. the as-of weather join, and shuffle vs.
+broadcast lookup of the compact weather table (weather_join.py).
+
+Run from the repository root (needs pyspark):
+
+    python -m benchmarks.bench_weather_join --flights 5000000 --gap_rate 0.05
+
+Flights and hourly weather are generated in Spark; gap_rate of the hourly
+observations are dropped to mimic missing Meteostat hours.
+"""
+
+import argparse
+import time
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+from weather_join import join_weather, nearest_hourly, shuffle_join
+
+BASE = 1514764800  # 2018-01-01 00:00:00 UTC
+
+
+def make_data(spark, n_flights, n_airports, days, gap_rate):
+    hours = days * 24
+    weather = (
+        spark.range(n_airports * hours)
+        .select(
+            F.format_string("A%03d", (F.col("id") / hours).cast("int")).alias("airport"),
+            F.timestamp_seconds(F.lit(BASE) + (F.col("id") % hours) * 3600).alias("time"),
+            (F.rand(1) * 40 - 10).alias("temperature_deg_c"),
+            (F.rand(3) * 60).alias("wind_speed_km_per_hr"),
+            (F.rand(4) * 100).alias("relative_humidity"),
+            (F.rand(5) * 5).alias("precipitation"),
+            F.when(F.rand(6) < 0.8, "Clear").otherwise("Rain").alias("weather_condition"),
+        )
+        .where(F.rand(2) >= gap_rate)
+    )
+    departure = F.lit(BASE) + (F.abs(F.hash("id")) % (hours - 12)) * 3600
+    flights = spark.range(n_flights).select(
+        F.format_string("A%03d", F.col("id") % n_airports).alias("ORIGIN"),
+        F.format_string("A%03d", (F.col("id") * 7 + 3) % n_airports).alias("DEST"),
+        F.timestamp_seconds(departure).alias("Departure_Time_UTC"),
+        F.timestamp_seconds(departure + (F.col("id") % 6 + 1) * 3600).alias(
+            "Arrival_Time_UTC"
+        ),
+    )
+    return flights.cache(), weather.cache()
+
+
+def double_join(flights, weather):
+    w1, w2 = weather.alias("w1"), weather.alias("w2")
+    return (
+        flights.join(
+            w1,
+            (flights["Departure_Time_UTC"] == F.col("w1.time"))
+            & (flights["ORIGIN"] == F.col("w1.airport")),
+            "left",
+        )
+        .join(
+            w2,
+            (flights["Arrival_Time_UTC"] == F.col("w2.time"))
+            & (flights["DEST"] == F.col("w2.airport")),
+            "left",
+        )
+        .select(
+            F.col("w1.temperature_deg_c").alias("ORIGIN_TEMPERATURE_DEG_C"),
+            F.col("w2.temperature_deg_c").alias("DEST_TEMPERATURE_DEG_C"),
+        )
+    )
+
+
+def measure(name, joined):
+    start = time.perf_counter()
+    row = joined.agg(
+        F.count(F.lit(1)).alias("rows"),
+        F.count("ORIGIN_TEMPERATURE_DEG_C").alias("origin_matched"),
+        F.count("DEST_TEMPERATURE_DEG_C").alias("dest_matched"),
+    ).first()
+    seconds = time.perf_counter() - start
+    print(
+        f"⏱️{name}: {seconds:.2f}s, {row['rows']:,} rows, "
+        f"origin match {row['origin_matched'] / row['rows']:.2%}, "
+        f"dest match {row['dest_matched'] / row['rows']:.2%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=5_000_000)
+    parser.add_argument("--airports", type=int, default=140)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--gap_rate", type=float, default=0.05)
+    parser.add_argument("--tolerance_hours", type=int, default=1)
+    args = parser.parse_args()
+
+    spark = (
+        SparkSession.builder.appName("bench_weather_join")
+        .config("spark.sql.session.timeZone", "UTC")
+        # Measure the shuffle joins spark-job.py runs on real data sizes
+        .config("spark.sql.autoBroadcastJoinThreshold", -1)
+        .getOrCreate()
+    )
+    flights, weather = make_data(
+        spark, args.flights, args.airports, args.days, args.gap_rate
+    )
+    print(f"📊{flights.count():,} flights, {weather.count():,} weather rows")
+
+    measure("exact double join", double_join(flights, weather))
+    measure(
+        f"as-of join (±{args.tolerance_hours}h)",
+        double_join(flights, nearest_hourly(weather, args.tolerance_hours)),
+    )
+    measure("shuffle join (weather_join.shuffle_join)", shuffle_join(flights, weather))
+    measure(
+        "broadcast compact table (weather_join.join_weather)",
+        join_weather(flights, weather, broadcast_mb=1024),
+    )
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
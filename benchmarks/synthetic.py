@@ -0,0 +1,229 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Column order of the Kaggle yearly files (<year>.csv); the header ends with a
+# trailing comma, which pandas reads back as "Unnamed: 27"
+KAGGLE_COLUMNS = [
+    "FL_DATE",
+    "OP_CARRIER",
+    "OP_CARRIER_FL_NUM",
+    "ORIGIN",
+    "DEST",
+    "CRS_DEP_TIME",
+    "DEP_TIME",
+    "DEP_DELAY",
+    "TAXI_OUT",
+    "WHEELS_OFF",
+    "WHEELS_ON",
+    "TAXI_IN",
+    "CRS_ARR_TIME",
+    "ARR_TIME",
+    "ARR_DELAY",
+    "CANCELLED",
+    "CANCELLATION_CODE",
+    "DIVERTED",
+    "CRS_ELAPSED_TIME",
+    "ACTUAL_ELAPSED_TIME",
+    "AIR_TIME",
+    "DISTANCE",
+    "CARRIER_DELAY",
+    "WEATHER_DELAY",
+    "NAS_DELAY",
+    "SECURITY_DELAY",
+    "LATE_AIRCRAFT_DELAY",
+    "",
+]
+
+# Meteostat Hourly columns, after the time index
+METEOSTAT_COLUMNS = [
+    "temp",
+    "dwpt",
+    "rhum",
+    "prcp",
+    "snow",
+    "wdir",
+    "wspd",
+    "wpgt",
+    "pres",
+    "tsun",
+    "coco",
+]
+
+
+def make_airports(n_airports=140, seed=0):
+    """airports.csv-shaped frame with n_airports three-letter codes."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codes = set()
+    while len(codes) < n_airports:
+        codes.add("".join(rng.choice(letters, 3)))
+    codes = sorted(codes)
+    time_zones = ["America/New_York", "America/Chicago", "America/Denver", "America/Los_Angeles"]
+    return pd.DataFrame(
+        {
+            "code": codes,
+            "icao": ["K" + code for code in codes],
+            "name": [f"{code} International" for code in codes],
+            "latitude": rng.uniform(25, 48, n_airports),
+            "longitude": rng.uniform(-124, -67, n_airports),
+            "time_zone": rng.choice(time_zones, n_airports),
+            "city": [f"City {code}" for code in codes],
+            "state": [f"State {code[0]}" for code in codes],
+            "country": "US",
+        }
+    )
+
+
+def make_carriers():
+    codes_to_carrier = pd.read_csv("codes_to_carrier.csv").dropna(subset=["Code"])
+    return dict(zip(codes_to_carrier["Code"], codes_to_carrier["Carrier"]))
+
+
+def make_flights(n_rows, airport_codes, carrier_codes, seed=0, start="2018-01-01", days=365):
+    """Flight frame with the raw Kaggle columns spark-job.py selects."""
+    rng = np.random.default_rng(seed)
+    airport_codes = np.asarray(airport_codes, dtype=object)
+    carrier_codes = np.asarray(carrier_codes, dtype=object)
+    dates = pd.date_range(start, periods=days, freq="D").strftime("%Y-%m-%d").to_numpy()
+
+    crs_dep = rng.integers(5, 23, n_rows) * 100 + rng.integers(0, 60, n_rows)
+    dep_delay = np.round(rng.gamma(1.2, 15, n_rows) - 8)
+    elapsed = rng.integers(45, 360, n_rows)
+    dep_minutes = (crs_dep // 100) * 60 + crs_dep % 100 + dep_delay
+    arr_minutes = (dep_minutes + elapsed) % 1440
+    crs_arr_minutes = ((crs_dep // 100) * 60 + crs_dep % 100 + elapsed) % 1440
+    cancelled = (rng.random(n_rows) < 0.015).astype("float32")
+    diverted = ((rng.random(n_rows) < 0.003) & (cancelled == 0)).astype("float32")
+    flown = cancelled == 0
+    dep_time = np.where(flown, (dep_minutes % 1440) // 60 * 100 + dep_minutes % 60, np.nan)
+    arr_time = np.where(flown, arr_minutes // 60 * 100 + arr_minutes % 60, np.nan)
+
+    return pd.DataFrame(
+        {
+            "FL_DATE": dates[rng.integers(0, days, n_rows)],
+            "OP_CARRIER": carrier_codes[rng.integers(0, len(carrier_codes), n_rows)],
+            "OP_CARRIER_FL_NUM": rng.integers(1, 7000, n_rows).astype("int32"),
+            "ORIGIN": airport_codes[rng.integers(0, len(airport_codes), n_rows)],
+            "DEST": airport_codes[rng.integers(0, len(airport_codes), n_rows)],
+            "CRS_DEP_TIME": crs_dep.astype("int16"),
+            "DEP_TIME": dep_time.astype("float32"),
+            "DEP_DELAY": np.where(flown, dep_delay, np.nan).astype("float32"),
+            "CRS_ARR_TIME": (
+                crs_arr_minutes // 60 * 100 + crs_arr_minutes % 60
+            ).astype("int16"),
+            "ARR_TIME": arr_time.astype("float32"),
+            "ARR_DELAY": np.where(
+                flown, dep_delay + rng.normal(0, 8, n_rows).round(), np.nan
+            ).astype("float32"),
+            "CANCELLED": cancelled,
+            "DIVERTED": diverted,
+            "ACTUAL_ELAPSED_TIME": np.where(flown & (diverted == 0), elapsed, np.nan).astype("float32"),
+        }
+    )
+
+
+def make_kaggle_flights(n_rows, airport_codes, carrier_codes, seed=0, start="2018-01-01", days=365):
+    """Flight frame in the full Kaggle column layout (KAGGLE_COLUMNS)."""
+    df = make_flights(n_rows, airport_codes, carrier_codes, seed, start, days)
+    rng = np.random.default_rng(seed + 1)
+    flown = df["CANCELLED"] == 0
+    landed = flown & (df["DIVERTED"] == 0)
+    taxi_out = np.where(flown, rng.integers(5, 40, n_rows), np.nan)
+    taxi_in = np.where(landed, rng.integers(2, 20, n_rows), np.nan)
+    wheels_off = (df["DEP_TIME"] // 100 * 60 + df["DEP_TIME"] % 100 + taxi_out) % 1440
+    wheels_on = (df["ARR_TIME"] // 100 * 60 + df["ARR_TIME"] % 100 - taxi_in) % 1440
+    crs_elapsed = (
+        (df["CRS_ARR_TIME"] // 100 * 60 + df["CRS_ARR_TIME"] % 100)
+        - (df["CRS_DEP_TIME"] // 100 * 60 + df["CRS_DEP_TIME"] % 100)
+    ) % 1440
+    late = df["ARR_DELAY"] >= 15
+    # Delay causes are only reported for flights 15+ minutes late, and add up
+    causes = rng.dirichlet(np.ones(5), n_rows) * df["ARR_DELAY"].to_numpy()[:, None]
+    causes = np.where(late.to_numpy()[:, None], np.round(causes), np.nan)
+
+    df["TAXI_OUT"] = taxi_out
+    df["WHEELS_OFF"] = wheels_off // 60 * 100 + wheels_off % 60
+    df["WHEELS_ON"] = np.where(landed, wheels_on // 60 * 100 + wheels_on % 60, np.nan)
+    df["TAXI_IN"] = taxi_in
+    df["CANCELLATION_CODE"] = np.where(
+        flown, None, rng.choice(["A", "B", "C", "D"], n_rows)
+    )
+    df["CRS_ELAPSED_TIME"] = crs_elapsed.astype("float32")
+    df["AIR_TIME"] = df["ACTUAL_ELAPSED_TIME"] - taxi_out - taxi_in
+    df["DISTANCE"] = np.round(crs_elapsed * rng.uniform(6.5, 8.5, n_rows))
+    for i, name in enumerate(
+        ["CARRIER_DELAY", "WEATHER_DELAY", "NAS_DELAY", "SECURITY_DELAY", "LATE_AIRCRAFT_DELAY"]
+    ):
+        df[name] = causes[:, i]
+    df[""] = np.nan
+    return df[KAGGLE_COLUMNS]
+
+
+def write_kaggle_files(directory, n_rows, airport_codes, carrier_codes, years=(2018,), seed=0, chunk_rows=1_000_000):
+    """Write n_rows flights as <directory>/<year>.csv, spread evenly over years.
+
+    Rows are generated and appended chunk_rows at a time, so 100M-row
+    datasets are written in bounded memory. Returns the file paths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, year in enumerate(years):
+        year_rows = n_rows // len(years) + (i < n_rows % len(years))
+        days = 366 if pd.Timestamp(f"{year}-12-31").dayofyear == 366 else 365
+        path = os.path.join(directory, f"{year}.csv")
+        with open(path, "w") as out:
+            for j, offset in enumerate(range(0, year_rows, chunk_rows)):
+                chunk = make_kaggle_flights(
+                    min(chunk_rows, year_rows - offset),
+                    airport_codes,
+                    carrier_codes,
+                    seed=seed + 1000 * i + j,
+                    start=f"{year}-01-01",
+                    days=days,
+                )
+                chunk.sort_values("FL_DATE").to_csv(out, header=offset == 0, index=False)
+        paths.append(path)
+    return paths
+
+
+def make_weather(start, end, seed=0, gap_rate=0.02):
+    """Hourly weather in the Meteostat Hourly layout (time index, METEOSTAT_COLUMNS).
+
+    gap_rate of the hours are dropped, like missing Meteostat observations.
+    """
+    rng = np.random.default_rng(seed)
+    time = pd.date_range(start, pd.Timestamp(end) + pd.Timedelta(hours=23), freq="h")
+    n = len(time)
+    season = np.cos((time.dayofyear.to_numpy() - 200) / 365 * 2 * np.pi)
+    daily = np.cos((time.hour.to_numpy() - 15) / 24 * 2 * np.pi)
+    temp = np.round(12 + 12 * season + 5 * daily + rng.normal(0, 3, n), 1)
+    rhum = np.clip(np.round(rng.normal(65, 18, n)), 5, 100)
+    data = pd.DataFrame(
+        {
+            "temp": temp,
+            "dwpt": np.round(temp - (100 - rhum) / 5, 1),
+            "rhum": rhum,
+            "prcp": np.where(rng.random(n) < 0.1, np.round(rng.exponential(1.5, n), 1), 0.0),
+            "snow": np.nan,
+            "wdir": rng.integers(0, 36, n) * 10.0,
+            "wspd": np.round(rng.gamma(2.5, 6, n), 1),
+            "wpgt": np.nan,
+            "pres": np.round(rng.normal(1015, 8, n), 1),
+            "tsun": np.nan,
+            # Meteostat condition codes; coco is missing for a share of hours
+            "coco": rng.choice([np.nan, 1, 2, 3, 4, 5, 7, 8, 9, 12, 14, 17, 25], n),
+        },
+        index=pd.Index(time, name="time"),
+    )
+    return data[rng.random(n) >= gap_rate]
+
+
+def write_weather_files(directory, airport_codes, start, end, seed=0, gap_rate=0.02):
+    """Write <directory>/<airport>.csv per airport, as read by weather_fetch.local_source."""
+    os.makedirs(directory, exist_ok=True)
+    for i, airport in enumerate(airport_codes):
+        make_weather(start, end, seed + i, gap_rate).to_csv(
+            os.path.join(directory, f"{airport}.csv")
+        )
@@ -0,0 +1,203 @@
+"""Stage checkpoints for run_pipeline.sh.
+
+When a stage succeeds, its outputs are recorded in checkpoints/<stage>.json:
+size, mtime and sha256 of every file, rows per output (from Parquet footers /
+CSV lines) and when it completed. The next run skips a stage only if its
+manifest still matches the files on disk, so it resumes after the last good
+stage. A file whose size and mtime are unchanged is not hashed again, so the
+multi-GB flight output is hashed once, when its stage commits, rather than
+by every later verify. Committing a stage with different outputs drops the manifests of the
+stages after it, as their inputs changed. A failed stage only rolls back its
+own outputs.
+
+    python checkpoint.py verify STAGE            # exit 0 if STAGE's outputs are intact
+    python checkpoint.py commit STAGE PATH...    # record STAGE's outputs
+    python checkpoint.py rollback STAGE PATH...  # remove STAGE's partial outputs
+
+Writers stage full rewrites in <path>.tmp and publish() them with a rename,
+so an interrupted write never replaces the previous good output.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+
+CHECKPOINT_DIR = "checkpoints"
+# Pipeline order; a stage's manifest is only valid if the ones before it are
+STAGES = ["flight_data", "weather_data", "spark_job"]
+
+
+def manifest_path(stage):
+    return os.path.join(CHECKPOINT_DIR, f"{stage}.json")
+
+
+def staging(path):
+    """<path>.tmp, emptied of whatever an interrupted write left there."""
+    tmp = path + ".tmp"
+    _remove(tmp)
+    return tmp
+
+
+def publish(tmp, path):
+    """Replace path by the finished tmp (a file or directory)."""
+    old = path + ".old"
+    _remove(old)
+    if os.path.exists(path):
+        os.rename(path, old)
+    os.rename(tmp, path)
+    _remove(old)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _files(path):
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names)
+    return sorted(files)
+
+
+def _sha256(file):
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _rows(file):
+    if file.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(file).metadata.num_rows
+    if file.endswith(".csv"):
+        with open(file, "rb") as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    return None
+
+
+def _unchanged(stat, recorded):
+    return stat.st_size == recorded["bytes"] and stat.st_mtime_ns == recorded.get("mtime_ns")
+
+
+def describe(path, previous=None):
+    """Files (size, mtime, sha256) and rows of one output path.
+
+    Hashes are taken from previous (an earlier describe of path) for files
+    whose size and mtime did not change.
+    """
+    previous = previous["files"] if previous else {}
+    files = {}
+    rows = None
+    for file in _files(path):
+        relpath = os.path.relpath(file, path) if file != path else "."
+        stat = os.stat(file)
+        recorded = previous.get(relpath)
+        files[relpath] = {
+            "bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": recorded["sha256"] if recorded and _unchanged(stat, recorded) else _sha256(file),
+        }
+        count = _rows(file)
+        if count is not None:
+            rows = (rows or 0) + count
+    return {"files": files, "rows": rows}
+
+
+def _content(outputs):
+    # What later stages depend on: file bytes and hashes, not when they were written
+    return {
+        path: {
+            relpath: (recorded["bytes"], recorded["sha256"])
+            for relpath, recorded in output["files"].items()
+        }
+        for path, output in outputs.items()
+    }
+
+
+def commit(stage, paths):
+    previous = None
+    if os.path.exists(manifest_path(stage)):
+        with open(manifest_path(stage)) as f:
+            previous = json.load(f)
+    earlier = previous["outputs"] if previous else {}
+    manifest = {
+        "stage": stage,
+        "completed": datetime.now().isoformat(timespec="seconds"),
+        "run_id": os.environ.get("PIPELINE_RUN_ID"),
+        "outputs": {path: describe(path, earlier.get(path)) for path in paths},
+    }
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    tmp = manifest_path(stage) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, manifest_path(stage))
+    if previous is None or _content(previous["outputs"]) != _content(manifest["outputs"]):
+        for later in STAGES[STAGES.index(stage) + 1 :]:
+            _remove(manifest_path(later))
+    rows = {path: output["rows"] for path, output in manifest["outputs"].items()}
+    print(f"📌Checkpoint {stage}: {rows}")
+    return manifest
+
+
+def verify(stage):
+    """True if stage and every stage before it have manifests matching the disk.
+
+    Only files whose size or mtime differ from the manifest are hashed.
+    """
+    for name in STAGES[: STAGES.index(stage) + 1]:
+        if not os.path.exists(manifest_path(name)):
+            print(f"🔎No checkpoint for {name}")
+            return False
+        with open(manifest_path(name)) as f:
+            manifest = json.load(f)
+        for path, output in manifest["outputs"].items():
+            current = {
+                (os.path.relpath(file, path) if file != path else "."): file
+                for file in _files(path)
+            }
+            if set(current) != set(output["files"]):
+                print(f"🔎Checkpoint {name}: files of {path} changed")
+                return False
+            for relpath, recorded in output["files"].items():
+                file = current[relpath]
+                stat = os.stat(file)
+                if _unchanged(stat, recorded):
+                    continue
+                if stat.st_size != recorded["bytes"] or _sha256(file) != recorded["sha256"]:
+                    print(f"🔎Checkpoint {name}: {file} changed")
+                    return False
+    return True
+
+
+def rollback(stage, paths):
+    """Remove stage's outputs (and staged .tmp copies) and its checkpoint."""
+    for path in paths:
+        _remove(path)
+        _remove(path + ".tmp")
+    _remove(manifest_path(stage))
+    print(f"🔄Rolled back {stage}: {' '.join(paths) or 'no outputs removed'}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("verify", "commit", "rollback"):
+        sys.exit(__doc__)
+    command, stage, paths = sys.argv[1], sys.argv[2], sys.argv[3:]
+    if stage not in STAGES:
+        sys.exit(f"Unknown stage {stage}, expected one of {STAGES}")
+    if command == "verify":
+        sys.exit(0 if verify(stage) else 1)
+    if command == "commit":
+        commit(stage, paths)
+    else:
+        rollback(stage, paths)
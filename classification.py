@@ -0,0 +1,194 @@
+"""Delay and weather categories for spark-job.py, as rules-as-data.
+
+Delay categories are bucket boundaries, Meteostat coco codes map through a
+small broadcast lookup table, and the heuristic weather rules (first match
+wins) are only evaluated for hours without a coco code.
+"""
+
+from pyspark.sql import functions as F
+
+# Delay minutes -> category. x < 0 is early, 0 <= x <= 15 on time, then
+# (15, 30], (30, 60], (60, 120] and above 120. A null delay falls in the
+# last bucket, as it always has.
+DELAY_BOUNDARIES = [0, 15, 30, 60, 120]
+DELAY_LABELS = ["On-Time", "Minor Delay", "Moderate Delay", "Severe Delay", "Extreme Delay"]
+EARLY_LABELS = {"departure": "Early_Departure", "arrival": "Early_Arrival"}
+
+# Meteostat weather condition codes (coco)
+COCO_CONDITIONS = {
+    **dict.fromkeys([1, 2], "Clear"),
+    **dict.fromkeys([3, 4, 5, 6], "Cloudy"),
+    **dict.fromkeys([7, 8, 17], "Light Rain"),
+    **dict.fromkeys([9, 10, 11, 18], "Heavy Rain"),
+    **dict.fromkeys([12, 14, 15, 19, 21, 24], "Snow"),
+    **dict.fromkeys([13, 16, 20, 22], "Heavy Snow"),
+    **dict.fromkeys([23, 25, 27], "Stormy"),
+    26: "Severe Storm",
+}
+
+# Hours without coco: (label, [(column, op, value), ...]); between is inclusive
+HEURISTIC_RULES = [
+    (
+        "Clear",
+        [
+            ("precipitation", "==", 0),
+            ("temperature_deg_c", "between", (-2, 35.0)),
+            ("relative_humidity", "<", 50),
+            ("wind_speed_km_per_hr", "<", 20),
+        ],
+    ),
+    (
+        "Partly Cloudy",
+        [
+            ("precipitation", "==", 0),
+            ("temperature_deg_c", "between", (-10.0, 45.0)),
+            ("relative_humidity", "between", (50, 75)),
+            ("wind_speed_km_per_hr", "<", 30),
+        ],
+    ),
+    (
+        "Cloudy",
+        [
+            ("precipitation", "==", 0),
+            ("temperature_deg_c", "between", (-10.0, 45.0)),
+            ("relative_humidity", ">", 75),
+        ],
+    ),
+    (
+        "Light Rain",
+        [
+            ("precipitation", ">", 0.01),
+            ("precipitation", "<=", 10.0),
+            ("temperature_deg_c", "between", (2, 45.0)),
+            ("relative_humidity", ">", 55),
+            ("wind_speed_km_per_hr", "<", 25),
+        ],
+    ),
+    (
+        "Heavy Rain",
+        [
+            ("precipitation", ">", 10.0),
+            ("temperature_deg_c", "between", (2, 45.0)),
+            ("relative_humidity", ">", 65),
+            ("wind_speed_km_per_hr", "<", 25),
+        ],
+    ),
+    (
+        "Snow",
+        [
+            ("precipitation", ">", 0.05),
+            ("temperature_deg_c", "between", (-20, 2)),
+            ("relative_humidity", ">", 55),
+        ],
+    ),
+    (
+        "Heavy Snow",
+        [
+            ("precipitation", ">", 2.0),
+            ("temperature_deg_c", "between", (-30, 2)),
+            ("relative_humidity", ">", 60),
+        ],
+    ),
+    (
+        "Windy Rain",
+        [
+            ("wind_speed_km_per_hr", "between", (25, 35)),
+            ("precipitation", ">", 1),
+            ("relative_humidity", ">", 55),
+        ],
+    ),
+    (
+        "Stormy",
+        [
+            ("wind_speed_km_per_hr", "between", (35, 40)),
+            ("temperature_deg_c", ">", -5),
+            ("precipitation", ">", 2),
+            ("relative_humidity", ">", 60),
+        ],
+    ),
+    (
+        "Blizzard",
+        [
+            ("temperature_deg_c", "<", -5),
+            ("wind_speed_km_per_hr", "between", (40, 50)),
+            ("precipitation", ">", 2),
+            ("relative_humidity", ">", 60),
+        ],
+    ),
+    (
+        "Severe Storm",
+        [
+            ("wind_speed_km_per_hr", ">", 50),
+            ("precipitation", ">", 5),
+            ("relative_humidity", ">", 70),
+        ],
+    ),
+    (
+        "Hot and Dry",
+        [
+            ("temperature_deg_c", ">", 35),
+            ("relative_humidity", "<", 30),
+            ("wind_speed_km_per_hr", "<", 20),
+        ],
+    ),
+    (
+        "Extreme Cold",
+        [
+            ("temperature_deg_c", "<", -15),
+            ("wind_speed_km_per_hr", "<", 20),
+        ],
+    ),
+]
+UNKNOWN_CONDITION = "Unknown"
+
+_OPS = {
+    "==": lambda c, v: c == v,
+    "<": lambda c, v: c < v,
+    "<=": lambda c, v: c <= v,
+    ">": lambda c, v: c > v,
+    "between": lambda c, v: c.between(*v),
+}
+
+
+def delay_category(column, kind):
+    """Bucket a delay column into EARLY_LABELS[kind] / DELAY_LABELS.
+
+    The bucket index is the number of boundaries the delay is past (>= for
+    the first, > for the rest), looked up in a literal label array.
+    """
+    delay = F.col(column)
+    index = (delay >= DELAY_BOUNDARIES[0]).cast("int")
+    for boundary in DELAY_BOUNDARIES[1:]:
+        index = index + (delay > boundary).cast("int")
+    labels = F.array(*[F.lit(label) for label in [EARLY_LABELS[kind]] + DELAY_LABELS])
+    return F.coalesce(F.element_at(labels, index + 1), F.lit(DELAY_LABELS[-1]))
+
+
+def heuristic_condition():
+    """First matching HEURISTIC_RULES label, else UNKNOWN_CONDITION."""
+    condition = None
+    for label, clauses in HEURISTIC_RULES:
+        test = None
+        for column, op, value in clauses:
+            clause = _OPS[op](F.col(column), value)
+            test = clause if test is None else test & clause
+        condition = F.when(test, label) if condition is None else condition.when(test, label)
+    return condition.otherwise(UNKNOWN_CONDITION)
+
+
+def classify_weather(spark, weather_df):
+    """Add weather_condition: the coco lookup, or the heuristic rules without coco."""
+    coco_lookup = spark.createDataFrame(
+        [(float(code), label) for code, label in COCO_CONDITIONS.items()],
+        "coco double, coco_condition string",
+    )
+    return (
+        weather_df.join(F.broadcast(coco_lookup), on="coco", how="left")
+        .withColumn(
+            "weather_condition",
+            F.when(F.col("coco_condition").isNull(), heuristic_condition()).otherwise(
+                F.col("coco_condition")
+            ),
+        )
+        .drop("coco_condition")
+    )
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+# airports.csv column -> flight data column prefix (suffixed with _ORIGIN / _DEST)
+AIRPORT_FEATURES = {
+    "time_zone": "TIME_ZONE",
+    "city": "CITY",
+    "state": "STATE",
+    "country": "COUNTRY",
+    "longitude": "LONGITUDE",
+    "latitude": "LATITUDE",
+    "name": "AIRPORT_NAME",
+}
+
+
+def build_airport_lookup(airport_info):
+    """Airport features indexed by IATA code, ready to be joined on ORIGIN / DEST."""
+    lookup = airport_info.drop_duplicates("code", keep="last").set_index("code")
+    lookup = lookup[list(AIRPORT_FEATURES)].rename(columns=AIRPORT_FEATURES)
+    # Joined columns come out categorical: one copy of each string per airport
+    strings = lookup.select_dtypes(include=["object", "string"]).columns
+    return lookup.astype({name: "category" for name in strings})
+
+
+def enrich_airports(df, airport_lookup):
+    """Attach airport features for both ORIGIN and DEST with one indexed join each."""
+    origin = airport_lookup.add_suffix("_ORIGIN")
+    dest = airport_lookup.add_suffix("_DEST")
+    df = df.join(origin, on="ORIGIN").join(dest, on="DEST")
+
+    # Keep the column order of the original per-feature loop (X_ORIGIN, X_DEST, ...)
+    enriched = [
+        f"{name}_{side}" for name in AIRPORT_FEATURES.values() for side in ("ORIGIN", "DEST")
+    ]
+    base = [c for c in df.columns if c not in enriched]
+    return df[base + enriched]
+
+
+def add_carrier_names(df, code_to_carrier):
+    """Map OP_CARRIER to OP_CARRIER_NAME once per distinct code instead of once per row."""
+    carriers = df["OP_CARRIER"].astype("category")
+    names = pd.Series(
+        carriers.cat.categories.map(lambda code: code_to_carrier.get(code, None)),
+        dtype=object,
+    )
+    # Carrier code -> carrier name code; unknown codes and code -1 (missing carrier) stay -1
+    name_codes, categories = pd.factorize(names)
+    name_codes = np.append(name_codes, -1)
+    df["OP_CARRIER_NAME"] = pd.Categorical.from_codes(
+        name_codes[carriers.cat.codes.to_numpy()], categories=categories
+    )
+    return df
+
+
+def prepare_flights(chunk, airport_filter, code_to_carrier, airport_lookup):
+    """Whitelist filter, carrier names, airport features and year of a chunk of raw flights.
+
+    Module level (not a closure) so parallel_csv can run it in its worker processes.
+    """
+    chunk = chunk[chunk["ORIGIN"].isin(airport_filter)].copy()
+    if chunk.empty:
+        return chunk
+    chunk = add_carrier_names(chunk, code_to_carrier)
+    chunk = enrich_airports(chunk, airport_lookup)
+    chunk["year"] = chunk["FL_DATE"].str[:4].astype("int16")
+    return chunk
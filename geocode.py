@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Outside every pipeline output, so rollback does not remove it
+CACHE_PATH = "geocode_cache.json"
+FIELDS = ["city", "state", "country", "town"]
+
+
+def cache_key(latitude, longitude, precision=4):
+    """Coordinates rounded to precision decimals (4 is about 11m)."""
+    return f"{latitude:.{precision}f},{longitude:.{precision}f}"
+
+
+def load_cache(path=CACHE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class RateLimiter:
+    """Spaces calls at least min_interval seconds apart, across threads."""
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def nominatim_source(user_agent="my_app", timeout=3):
+    """reverse(latitude, longitude) -> {city, state, country, town} via Nominatim."""
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def reverse(latitude, longitude):
+        location = geolocator.reverse((latitude, longitude), language="en")
+        address = location.raw.get("address", {}) if location else {}
+        return {field: address.get(field, None) for field in FIELDS}
+
+    return reverse
+
+
+def reference_source(path, max_km=30.0):
+    """Offline reverse() from a CSV of latitude, longitude, city, state, country.
+
+    The nearest reference point within max_km answers; farther away it
+    returns None, which is not cached, so an online run can still resolve it.
+    """
+    reference = pd.read_csv(path)
+    lat2 = np.radians(reference["latitude"].to_numpy())
+    lon2 = np.radians(reference["longitude"].to_numpy())
+
+    def reverse(latitude, longitude):
+        lat1, lon1 = np.radians(latitude), np.radians(longitude)
+        a = (
+            np.sin((lat2 - lat1) / 2) ** 2
+            + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        )
+        km = 2 * 6371 * np.arcsin(np.sqrt(a))
+        nearest = int(np.argmin(km))
+        if km[nearest] > max_km:
+            return None
+        row = reference.iloc[nearest]
+        return {
+            field: (row[field] if field in row and pd.notna(row[field]) else None)
+            for field in FIELDS
+        }
+
+    return reverse
+
+
+def resolve(coordinates, reverse, cache_path=CACHE_PATH, workers=4, min_interval=1.0, retries=2, backoff=1.0):
+    """{cache_key: {city, state, country, town}} for every (latitude, longitude).
+
+    Cached coordinates are answered from cache_path. The rest go to reverse
+    on a thread pool of workers, with calls spaced min_interval seconds apart
+    (Nominatim allows one request per second) and retried with backoff.
+    Answers are added to the cache as they arrive; failed lookups and None
+    answers are not cached, so the next run retries them. reverse=None
+    resolves from the cache only (offline).
+    """
+    cache = load_cache(cache_path)
+    keys = {cache_key(latitude, longitude): (latitude, longitude) for latitude, longitude in coordinates}
+    missing = [key for key in keys if key not in cache]
+    print(f"🗺️{len(keys) - len(missing)} coordinates cached, {len(missing)} to look up")
+
+    if missing and reverse is not None:
+        limiter = RateLimiter(min_interval)
+
+        def lookup(key):
+            for attempt in range(retries + 1):
+                limiter.wait()
+                try:
+                    return reverse(*keys[key])
+                except Exception as e:
+                    if attempt == retries:
+                        print(f"❌Reverse geocoding failed for {key} ({e!r})")
+                        return None
+                    time.sleep(backoff * 2**attempt)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for done, (key, result) in enumerate(zip(missing, pool.map(lookup, missing)), 1):
+                if result is not None:
+                    cache[key] = result
+                if done % 20 == 0:
+                    save_cache(cache, cache_path)
+        save_cache(cache, cache_path)
+
+    empty = dict.fromkeys(FIELDS)
+    return {key: cache.get(key, empty) for key in keys}
@@ -2,12 +2,32 @@ import kagglehub
 import os
 import pandas as pd
 import argparse
+from functools import partial
 from tqdm.auto import tqdm
-from geopy.geocoders import Nominatim
 import gc
+import sys
 import requests
 from bs4 import BeautifulSoup
 
+import checkpoint
+from enrichment import add_carrier_names, build_airport_lookup, enrich_airports, prepare_flights
+import geocode
+import parallel_csv
+from instrumentation import Stage
+import run_metadata
+from ingest_state import load_state, pending_files, save_state
+from schemas import (
+    FLIGHT,
+    FLIGHT_METADATA_PATHS,
+    FLIGHT_PARTITIONS,
+    FLIGHT_PATHS,
+    FLIGHT_RAW,
+    columns,
+    conform,
+    memory_footprint,
+    pandas_dtypes,
+)
+
 
 # Use geocoder package to code lat / long to city, state, country
 
@@ -15,38 +35,117 @@ tqdm.pandas()
 
 parser = argparse.ArgumentParser()
 parser.add_argument("--start_year", type=int, default=2018)
+parser.add_argument(
+    "--streaming",
+    action="store_true",
+    help="Filter and enrich each chunk while reading, instead of concat-then-filter",
+)
+parser.add_argument(
+    "--output_format",
+    choices=["csv", "parquet"],
+    default="csv",
+    help="parquet writes a year/ORIGIN partitioned dataset with the schemas.FLIGHT layout",
+)
+parser.add_argument(
+    "--input_dir",
+    default=None,
+    help="Directory of <year>.csv files in the Kaggle layout to use instead of downloading (offline runs)",
+)
+parser.add_argument(
+    "--geocode_workers",
+    type=int,
+    default=4,
+    help="Concurrent reverse-geocoding lookups (spaced 1s apart for Nominatim)",
+)
+parser.add_argument(
+    "--offline_geocode",
+    action="store_true",
+    help="Resolve missing city/state/country from the geocode cache (and --geocode_reference) only",
+)
+parser.add_argument(
+    "--geocode_reference",
+    default=None,
+    help="CSV of latitude, longitude, city, state, country for offline resolution",
+)
+parser.add_argument(
+    "--memory_report",
+    action="store_true",
+    help="Print the frames' memory with compact dtypes vs. plain strings / 64-bit numbers",
+)
+parser.add_argument(
+    "--reference_only",
+    action="store_true",
+    help="Only prepare airports.csv / codes_to_carrier.csv and the run metadata; "
+    "spark-job.py --input_format raw filters and enriches the flights",
+)
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Only ingest year files that are new or changed since the last run (parquet only)",
+)
+parser.add_argument(
+    "--ingest_workers",
+    type=int,
+    default=os.cpu_count(),
+    help="Processes decoding (and, with --streaming, filtering and enriching) the year files; "
+    "1 decodes in this process. The output is the same for any number",
+)
+parser.add_argument(
+    "--block_mb",
+    type=int,
+    default=parallel_csv.BLOCK_MB,
+    help="Year files are decoded in blocks of about this many MB",
+)
 
 args = parser.parse_args()
-
-print("🚀Downloading Flight Data from Kaggle")
-# Download latest version
-path = kagglehub.dataset_download(
-    "yuanyuwendymu/airline-delay-and-cancellation-data-2009-2018"
-)
+if args.ingest_workers < 1:
+    parser.error("--ingest_workers must be at least 1")
+if args.incremental and args.output_format != "parquet":
+    parser.error("--incremental needs --output_format parquet (partitions are replaced per year)")
+if args.incremental and args.reference_only:
+    parser.error("--incremental and --reference_only can not be combined")
+
+# Wall time, rows, peak RSS and bytes of this stage go to the run report
+stage = Stage("flight_data").start()
+
+if args.input_dir:
+    print(f"📂Using local flight data {args.input_dir}")
+    path = args.input_dir
+else:
+    print("🚀Downloading Flight Data from Kaggle")
+    # Download latest version
+    path = kagglehub.dataset_download(
+        "yuanyuwendymu/airline-delay-and-cancellation-data-2009-2018"
+    )
 start_year = args.start_year
 print("Path to dataset files:", path)
 files = os.listdir(path)
 
-# Only from start_year
-get_files = [file for file in files if int(file.split(".")[0]) >= start_year]
+# Only from start_year, in year order (os.listdir order is arbitrary)
+get_files = sorted(
+    (file for file in files if int(file.split(".")[0]) >= start_year),
+    key=lambda file: int(file.split(".")[0]),
+)
 
-dfs = []
-# load and concat all files in files
+if args.incremental:
+    # State lives inside the output, so removing the output also resets it
+    state_path = os.path.join(FLIGHT_PATHS["parquet"], "_ingest_state.json")
+    state = load_state(state_path)
+    get_files, signatures = pending_files(state, path, get_files)
+    print(f"🔄Incremental ingest: {len(get_files)} new or changed files {get_files}")
+    if not get_files:
+        state["last_run"] = {"files": [], "years": []}
+        save_state(state, state_path)
+        print("✅Flight data is up to date, nothing to ingest")
+        stage.rows_in = stage.rows_out = 0
+        stage.finish()
+        sys.exit(0)
 
-for file in tqdm(get_files):
-    print(f"🔃Loading file {file}")
-    chunk_size = 50000  # Adjust based on memory
-    for chunk in pd.read_csv(os.path.join(path, file), chunksize=chunk_size):
-        dfs.append(chunk)
 
-df = pd.concat(dfs, ignore_index=True)
-df["FL_DATE"] = pd.to_datetime(df["FL_DATE"])
 ################################################################################################
-# Subset data for airport whitelist
+# Airport whitelist
 
-print("🔄Filtering data for airport whitelist")
 airport_filter = pd.read_csv("airport_whitelist.csv")["ORIGIN"].unique()
-df = df[df["ORIGIN"].isin(airport_filter)]
 
 ################################################################################################
 # Load airport info masterfile
@@ -87,15 +186,6 @@ else:  # Collect data from wikipedia
 code_to_carrier = dict(zip(codes_to_carrier["Code"], codes_to_carrier["Carrier"]))
 
 
-def get_carrier_name(code):
-    return code_to_carrier.get(code, None)
-
-
-tqdm.pandas()
-# Get carrier name
-print("🔄Getting carrier name for each airline code")
-df["OP_CARRIER_NAME"] = df["OP_CARRIER"].progress_map(get_carrier_name)
-
 
 print("🚀Downloading airports.csv")
 # Try loading airports.csv if file exist, else, download from github and process for city, states
@@ -112,19 +202,15 @@ else:
     # Update city, state, country based on coordinate - airport.csv have omitted cite/staet/country
     print("🔄Updating city, state, country based on coordinate, if they are null")
 
-    geolocator = Nominatim(user_agent="my_app", timeout=3)
-
-    def get_city_state_country(lat, lon):
-        location = geolocator.reverse((lat, lon), language="en")
-        if location:
-            address = location.raw.get("address", {})
-            return (
-                address.get("city", None),
-                address.get("state", None),
-                address.get("country", None),
-                address.get("town", None),
-            )
-        return None, None, None, None
+    # Lookups go through a persistent cache keyed by rounded lat / long (see geocode.py),
+    # which survives rollback, so warm runs make no requests
+    if args.offline_geocode:
+        print("📴Offline geocoding: cache and reference table only")
+        reverse, min_interval = None, 0.0
+        if args.geocode_reference:
+            reverse = geocode.reference_source(args.geocode_reference)
+    else:
+        reverse, min_interval = geocode.nominatim_source(), 1.0
 
     missing_mask = (
         airport_info["city"].isna()
@@ -132,88 +218,223 @@ else:
         | airport_info["country"].isna()
     )
     missing_rows = airport_info[missing_mask]
-
-    for idx, row in tqdm(
-        missing_rows.iterrows(), total=len(missing_rows), desc="Fetching locations"
-    ):
-        city, state, country, town = get_city_state_country(
-            row["latitude"], row["longitude"]
-        )
-        # Update only if values are missing
-        if pd.isna(row["city"]) and city:
-            airport_info.at[idx, "city"] = city
-            # If 'city' variable is None, use town
-        elif pd.isna(row["city"]) and not city:
-            airport_info.at[idx, "city"] = town
-
-        if pd.isna(row["state"]) and state:
-            airport_info.at[idx, "state"] = state
-        if pd.isna(row["country"]) and country:
-            airport_info.at[idx, "country"] = country
+    locations = geocode.resolve(
+        zip(missing_rows["latitude"], missing_rows["longitude"]),
+        reverse,
+        workers=args.geocode_workers,
+        min_interval=min_interval,
+    )
+    resolved = pd.DataFrame(
+        [
+            locations[geocode.cache_key(latitude, longitude)]
+            for latitude, longitude in zip(missing_rows["latitude"], missing_rows["longitude"])
+        ],
+        index=missing_rows.index,
+        columns=geocode.FIELDS,
+    )
+    # Update only if values are missing; if there is no city, use town
+    resolved["city"] = resolved["city"].fillna(resolved["town"])
+    for field in ["city", "state", "country"]:
+        airport_info.loc[missing_mask, field] = missing_rows[field].fillna(resolved[field])
 
     airport_info.to_csv("airports.csv", index=False)
 
 
 ################################################################################################
 # Additional featrure processing
-tqdm.pandas()
-airport_dict = {
-    code: {
-        "time_zone": time_zone,
-        "city": city,
-        "state": state,
-        "latitude": latitude,
-        "longitude": longitude,
-        "country": country,
-        "airport_name": name,
+# Airport features are attached with an indexed join on ORIGIN / DEST (see enrichment.py)
+airport_lookup = build_airport_lookup(airport_info)
+
+if args.reference_only:
+    # Flights are not read here: the run metadata covers whole years of the selected
+    # files and every whitelisted airport (row counts are unknown, so 0)
+    years = sorted(int(file.split(".")[0]) for file in get_files)
+    stats = {
+        str(year): {
+            "min_date": f"{year}-01-01",
+            "max_date": f"{year}-12-31",
+            "rows": 0,
+            "airports": {airport: 0 for airport in sorted(airport_filter)},
+        }
+        for year in years
     }
-    for code, time_zone, city, state, latitude, longitude, country, name in zip(
-        airport_info["code"],
-        airport_info["time_zone"],
-        airport_info["city"],
-        airport_info["state"],
-        airport_info["latitude"],
-        airport_info["longitude"],
-        airport_info["country"],
-        airport_info["name"],
-    )
-}
-
-features = [
-    "time_zone",
-    "city",
-    "state",
-    "country",
-    "longitude",
-    "latitude",
-    "airport_name",
-]
-
-for feature in tqdm(features):
-    print(f"⏱️Processing {feature} for ORIGIN...")
-    df[f"{feature.upper()}_ORIGIN"] = df["ORIGIN"].map(
-        lambda x: airport_dict.get(x, {}).get(feature, None)
-    )
+    metadata_path = FLIGHT_METADATA_PATHS["csv"]
+    run_metadata.write(metadata_path, stats)
+    print(f"💾Reference data ready, run metadata for years {years} saved to {metadata_path}")
+    print(f"➡️Raw flight files for spark-job.py --input_format raw --raw_dir {path}")
+    stage.rows_in = stage.rows_out = 0
+    stage.finish()
+    sys.exit(0)
 
-    print(f"⏱️Processing {feature} for DESTINATION...")
-    df[f"{feature.upper()}_DEST"] = df["DEST"].map(
-        lambda x: airport_dict.get(x, {}).get(feature, None)
-    )
 
-print("✅Completed preprocessing acquired data!")
-print("📊Sample data:", "\n", df.head(10))
+################################################################################################
+# Load, filter and enrich flight data
+
+output_path = FLIGHT_PATHS[args.output_format]
+# Date range, airports and row counts per year / airport, for downstream stages
+stats = {}
+# Per-column bytes before / after compact dtypes, summed over all written frames
+footprint = None
+stage.read(*(os.path.join(path, file) for file in get_files))
+stage.rows_in = 0
+# Forked before the writers start any threads; blocks come back in file order
+pool = parallel_csv.decode_pool(args.ingest_workers)
+block_bytes = args.block_mb * 2**20
+print(f"🧵Decoding year files in {args.block_mb}MB blocks with {args.ingest_workers} worker(s)")
+stage.extra["ingest_workers"] = args.ingest_workers
+
+
+def file_blocks(options=None, transform=None):
+    """(rows read, frame) of every block of get_files, in order."""
+    current = None
+    for file_path, rows, frame in parallel_csv.read_files(
+        [os.path.join(path, file) for file in get_files],
+        block_bytes,
+        options,
+        transform,
+        pool,
+        max_pending=2 * args.ingest_workers,
+    ):
+        if file_path != current:
+            current = file_path
+            print(f"🔃Loading file {os.path.basename(file_path)}")
+        yield rows, frame
+
+
+def measured(frames):
+    global footprint
+    for frame in frames:
+        usage = memory_footprint(frame)
+        footprint = usage if footprint is None else footprint + usage
+        yield frame
+
+
+def write_output(frames):
+    # Every frame is cast to the schemas.FLIGHT layout, which spark-job.py reads with
+    # (categorical strings, float32 / int16 numbers)
+    frames = (conform(frame, FLIGHT) for frame in frames)
+    if args.memory_report:
+        frames = measured(frames)
+    # A full rewrite goes to <output>.tmp and replaces the previous output only once
+    # complete; incremental runs replace year partitions in place
+    target = output_path if args.incremental else checkpoint.staging(output_path)
+    if args.output_format == "parquet":
+        from parquet_io import write_partitioned
+
+        # Incremental runs rewrite each re-ingested year in full
+        years = [int(file.split(".")[0]) for file in get_files] if args.incremental else ()
+        write_partitioned(frames, target, FLIGHT, FLIGHT_PARTITIONS, replace=years)
+    else:
+        header = True
+        with open(target, "w") as out:
+            for frame in frames:
+                frame.to_csv(out, header=header, index=False)
+                header = False
+    if target != output_path:
+        checkpoint.publish(target, output_path)
+
+
+if args.streaming:
+    # Each block is pruned, filtered, enriched (in the decoding workers) and written to
+    # the output as it is read, so peak memory is bounded by the blocks in flight
+    # rather than the whole dataset.
+    print("🔄Streaming flight data: filtering and enriching each block")
+    airpot_id = set()
+    total_rows = 0
+
+    def enriched_chunks():
+        global total_rows
+        for rows, chunk in file_blocks(
+            {"usecols": columns(FLIGHT_RAW), "dtype": pandas_dtypes(FLIGHT_RAW)},
+            partial(
+                prepare_flights,
+                airport_filter=airport_filter,
+                code_to_carrier=code_to_carrier,
+                airport_lookup=airport_lookup,
+            ),
+        ):
+            stage.rows_in += rows
+            if chunk.empty:
+                continue
+            total_rows += len(chunk)
+            airpot_id.update(chunk["ORIGIN"].unique())
+            run_metadata.collect(stats, chunk)
+            yield chunk
+
+    write_output(enriched_chunks())
+    stage.rows_out = total_rows
+    print(f"✅Completed preprocessing acquired data! {total_rows} rows written")
+else:
+    # load and concat all files in files
+    dfs = [chunk for _, chunk in file_blocks()]
+
+    df = pd.concat(dfs, ignore_index=True)
+    stage.rows_in = len(df)
+    df["FL_DATE"] = pd.to_datetime(df["FL_DATE"])
+    df["year"] = df["FL_DATE"].dt.year.astype("int16")
+
+    # Subset data for airport whitelist
+    print("🔄Filtering data for airport whitelist")
+    df = df[df["ORIGIN"].isin(airport_filter)]
 
-print("💾Saving merged file")
-df.to_csv("airline_delay_cancellation_data.csv")
+    # Get carrier name
+    print("🔄Getting carrier name for each airline code")
+    df = add_carrier_names(df, code_to_carrier)
+
+    print("🔄Joining airport info for ORIGIN and DEST")
+    df = enrich_airports(df, airport_lookup)
+
+    print("✅Completed preprocessing acquired data!")
+    print("📊Sample data:", "\n", df.head(10))
+
+    print("💾Saving merged file")
+    write_output([df])
+    stage.rows_out = len(df)
+
+    airpot_id = df["ORIGIN"].unique()
+    run_metadata.collect(stats, df)
+
+    # Free up RAM after saving
+    del df
+    gc.collect()
+
+if pool is not None:
+    pool.shutdown()
+
+# Incremental runs only replace the years they re-ingested
+metadata_path = FLIGHT_METADATA_PATHS[args.output_format]
+previous = run_metadata.read(metadata_path) if args.incremental else None
+metadata = run_metadata.write(metadata_path, stats, previous)
+print(
+    f"💾Run metadata saved to {metadata_path}: "
+    f"{metadata['min_date']} to {metadata['max_date']}, {len(metadata['airports'])} airports"
+)
+
+if args.incremental:
+    for file in get_files:
+        state["files"][file] = signatures[file]
+    state["last_run"] = {
+        "files": get_files,
+        "years": sorted(int(file.split(".")[0]) for file in get_files),
+    }
+    os.makedirs(FLIGHT_PATHS["parquet"], exist_ok=True)
+    save_state(state, state_path)
+    print(f"💾Ingest state saved, new partitions for years {state['last_run']['years']}")
 
 # Export station_ids to txt
 print("💾Exporting airport ids to txt file")
-airpot_id = df["ORIGIN"].unique()
 with open("airport_ids.txt", "w") as f:
     for airport in airpot_id:
         f.write(airport + "\n")
     print("✈️Airport ids exported to airport_ids.txt")
 
-# Free up RAM after saving
-del df
-gc.collect()
+if footprint is not None:
+    mb = footprint / 2**20
+    print("🧮Memory by column (MB, plain dtypes -> compact dtypes):")
+    print(mb.sort_values("before_bytes", ascending=False).round(1).to_string())
+    before, after = mb.sum()
+    print(f"🧮Total {before:.1f}MB -> {after:.1f}MB ({1 - after / before:.0%} smaller)")
+    stage.extra["memory_mb"] = {"before": round(before, 1), "after": round(after, 1)}
+
+stage.wrote(output_path)
+stage.finish()
@@ -1,16 +1,79 @@
-from meteostat import Hourly, Daily
-from meteostat import Stations
 from datetime import datetime
 import pandas as pd
 from tqdm import tqdm
+import argparse
 import os
 
+from instrumentation import Stage
+import run_metadata
+from schemas import FLIGHT_METADATA_PATHS, FLIGHT_PATHS, WEATHER_PATHS
+from weather_cache import cached_source
+from weather_fetch import PartWriter, fetch_all, local_source, meteostat_source
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--input_format", choices=["csv", "parquet"], default="csv")
+parser.add_argument("--output_format", choices=["csv", "parquet"], default="csv")
+parser.add_argument(
+    "--workers", type=int, default=8, help="Stations fetched concurrently"
+)
+parser.add_argument(
+    "--retries", type=int, default=3, help="Retries per station, with backoff"
+)
+parser.add_argument(
+    "--local_source",
+    default=None,
+    help="Directory of <airport>.csv hourly files to use instead of Meteostat (offline runs)",
+)
+parser.add_argument(
+    "--cache_dir",
+    default="weather_cache",
+    help="Per-airport, per-month hourly cache; only missing days are fetched",
+)
+parser.add_argument("--no_cache", action="store_true", help="Always fetch the full range")
+parser.add_argument(
+    "--refresh_since",
+    "--refresh-since",
+    default=None,
+    help="YYYY-MM-DD; refetch cached days from this date on",
+)
+args = parser.parse_args()
+
+# Wall time, rows, peak RSS and bytes of this stage go to the run report
+stage = Stage("weather_data").start()
+
 # add confiruration for hourly and daily
-print("🔃Loading flight data to get target airport and date range...")
-airplane_data = pd.read_csv("airline_delay_cancellation_data.csv")
+# Date range and airports come from the run-metadata sidecar written by
+# get_data_and_save.py; without it, only FL_DATE / ORIGIN are scanned.
+metadata = run_metadata.read(FLIGHT_METADATA_PATHS[args.input_format])
+if metadata is not None:
+    print("🔃Loading target airports and date range from run metadata...")
+    stage.read(FLIGHT_METADATA_PATHS[args.input_format])
+    start_ts, end_ts = metadata["min_date"], metadata["max_date"]
+    airport_id = metadata["airports"]
+else:
+    print("🔃Scanning flight data to get target airport and date range...")
+    if args.input_format == "parquet":
+        import pyarrow.dataset as ds
+
+        # Only the two columns needed, batch by batch
+        dataset = ds.dataset(FLIGHT_PATHS["parquet"], partitioning="hive")
+        chunks = (
+            batch.to_pandas().astype({"FL_DATE": str})
+            for batch in dataset.to_batches(columns=["FL_DATE", "ORIGIN"])
+        )
+    else:
+        chunks = pd.read_csv(
+            FLIGHT_PATHS["csv"], usecols=["FL_DATE", "ORIGIN"], chunksize=1000000
+        )
+    start_ts, end_ts, airport_id = None, None, set()
+    for chunk in chunks:
+        low, high = chunk["FL_DATE"].min(), chunk["FL_DATE"].max()
+        start_ts = low if start_ts is None else min(start_ts, low)
+        end_ts = high if end_ts is None else max(end_ts, high)
+        airport_id.update(chunk["ORIGIN"].unique())
+    airport_id = sorted(airport_id)
+    stage.read(FLIGHT_PATHS[args.input_format])
 
-start_ts = airplane_data["FL_DATE"].min()
-end_ts = airplane_data["FL_DATE"].max()
 end_ts_dt = pd.to_datetime(end_ts)
 # Add 3 days
 end_ts_plus_3 = end_ts_dt + pd.Timedelta(days=3)
@@ -21,8 +84,6 @@ end_ts = end_ts_plus_3.strftime("%Y-%m-%d")
 start_dt = datetime.strptime(start_ts, "%Y-%m-%d")
 end_dt = datetime.strptime(end_ts, "%Y-%m-%d")
 
-airport_id = airplane_data["ORIGIN"].unique()
-
 """
 print("Loading airport ids from txt file...")
 with open("airport_ids.txt", "r") as f:
@@ -31,53 +92,66 @@ with open("airport_ids.txt", "r") as f:
 
 # code_map = pd.read_csv("iata-icao.csv")
 
-errors = []
-
-stations = Stations()
-stations = stations.fetch()
-
-code_map = pd.read_csv("airports.csv")[["code", "icao"]]
-code_map = dict(zip(code_map["code"], code_map["icao"]))
-
-
-def get_weather_data(iata, start, end):
-
-    icao = code_map[iata]
-
-    stations = Stations()
-    stations = stations.fetch()
-
-    select_station = stations[stations["icao"] == icao]
-    id = select_station.index.values[0]
-
-    data = Hourly(id, start, end)
-    data = data.fetch()
-    # make weather_data directory if not exists
-
-    return data
-
-
-# Get weather data for all stations
+if args.local_source:
+    print(f"📂Using local weather source {args.local_source}")
+    get_weather_data = local_source(args.local_source)
+else:
+    # Station catalogue is downloaded once and indexed by ICAO
+    print("🔃Loading Meteostat station catalogue...")
+    get_weather_data = meteostat_source("airports.csv")
+
+if not args.no_cache:
+    print(f"🗄️Using weather cache {args.cache_dir}")
+    get_weather_data = cached_source(get_weather_data, args.cache_dir, args.refresh_since)
+
+
+# Each airport is written as its own part as soon as it is fetched (see PartWriter)
+writer = PartWriter(
+    WEATHER_PATHS[args.output_format], args.output_format, start_dt, end_dt
+)
+writer.prune(airport_id)
+todo = [airport for airport in airport_id if not writer.done(airport)]
+if len(todo) < len(airport_id):
+    print(f"⏩{len(airport_id) - len(todo)} airports already fetched, resuming")
+
+# Get weather data for all stations, args.workers at a time
 error = []
-df = pd.DataFrame()
-
-for airport in tqdm(airport_id):
-
-    print(f"Getting data for {airport}")
-
-    try:
-        data = get_weather_data(airport, start_dt, end_dt)
-        data["airport"] = airport
-        df = pd.concat([df, data])
-        print(f"✅Successcully fetched {airport}! and concatenated to df")
-    except:
+timings = {}
+stage.rows_in, stage.rows_out = len(todo), 0
+
+for airport, data, seconds, exc in tqdm(
+    fetch_all(
+        get_weather_data,
+        todo,
+        start_dt,
+        end_dt,
+        workers=args.workers,
+        retries=args.retries,
+    ),
+    total=len(todo),
+):
+    timings[airport] = seconds
+    if exc is None:
+        writer.write(airport, data, seconds)
+        stage.rows_out += len(data)
+        print(f"✅Successcully fetched {airport} ({seconds:.1f}s)! {len(data)} rows saved")
+    else:
         error.append(airport)
-        print(f"❌Error fetching {airport}!")
+        print(f"❌Error fetching {airport} after {seconds:.1f}s! ({exc!r})")
 
-df.to_csv(f"merged_weather.csv")
+slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5]
+print("⏱️Slowest airports:", ", ".join(f"{a} {t:.1f}s" for a, t in slowest))
+
+writer.finish(sorted(error))
 
 # export error as comma seperated string
-error_str = ",\n".join(error)
+# Airports finish in any order; keep the file stable between runs
+error_str = ",\n".join(sorted(error))
 with open("error.txt", "w") as f:
     f.write(error_str)
     print("Error file created!")
+
+# rows_in counts airports to fetch, rows_out the weather rows written
+stage.extra.update(airports=len(airport_id), fetched=len(todo) - len(error), failed=len(error))
+stage.wrote(WEATHER_PATHS[args.output_format])
+stage.finish()
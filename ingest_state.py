@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+
+def file_checksum(path, block_size=1 << 20):
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {"files": {}, "last_run": {"files": [], "years": []}}
+
+
+def save_state(state, state_path):
+    tmp = state_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, state_path)
+
+
+def pending_files(state, directory, files):
+    """Files that are new or changed since they were last ingested.
+
+    Size and mtime are checked first; the checksum is only computed when they
+    differ, so a touched-but-identical file is not ingested again. Returns the
+    pending file names and the signatures to record once they are ingested.
+    """
+    pending, signatures = [], {}
+    for file in sorted(files):
+        stat = os.stat(os.path.join(directory, file))
+        known = state["files"].get(file)
+        signature = {"size": stat.st_size, "mtime": stat.st_mtime}
+        if known and (known["size"], known["mtime"]) == (stat.st_size, stat.st_mtime):
+            continue
+        signature["md5"] = file_checksum(os.path.join(directory, file))
+        signatures[file] = signature
+        if known and known.get("md5") == signature["md5"]:
+            state["files"][file] = signature  # same content, just a new mtime
+            continue
+        pending.append(file)
+    return pending, signatures
@@ -0,0 +1,287 @@
+"""Per-stage run report shared by the pipeline scripts.
+
+Each stage records wall time, rows in / out, peak RSS and bytes read /
+written (plus Spark stage metrics for spark-job.py) into one JSON report per
+pipeline run, run_reports/<PIPELINE_RUN_ID>.json. run_pipeline.sh exports
+PIPELINE_RUN_ID so all stages of a run land in the same report; a script run
+on its own gets a report of its own.
+
+    python instrumentation.py [RUN_ID]   # a run's report vs. the run before it
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+REPORT_DIR = "run_reports"
+RUN_ID = os.environ.get("PIPELINE_RUN_ID") or datetime.now().strftime("%Y%m%dT%H%M%S")
+
+
+def report_path(run_id=RUN_ID):
+    return os.path.join(REPORT_DIR, f"{run_id}.json")
+
+
+def path_size(path):
+    """Bytes of a file, or of every file under a directory (0 if missing)."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak RSS of this process, or with RUSAGE_CHILDREN of its largest finished child.
+
+    Child processes (get_data_and_save.py's decode workers) only count once
+    they have exited and been waited for, e.g. after pool.shutdown().
+    """
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def _io_counters():
+    """Bytes this process read / wrote through the OS, where /proc has them."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+# Task run time quantiles recorded per Spark stage (median, p95, slowest)
+TASK_QUANTILES = {"task_ms_p50": 0.5, "task_ms_p95": 0.95, "task_ms_max": 1.0}
+
+
+def _task_quantiles(base_url, stage):
+    """Run time quantiles of a finished stage's tasks, {} if unavailable."""
+    if stage["status"] != "COMPLETE" or not stage["numTasks"]:
+        return {}
+    quantiles = ",".join(str(q) for q in TASK_QUANTILES.values())
+    url = f"{base_url}/{stage['stageId']}/{stage['attemptId']}/taskSummary?quantiles={quantiles}"
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            run_times = json.load(response)["executorRunTime"]
+    except (OSError, KeyError, ValueError):
+        return {}
+    return {name: round(ms) for name, ms in zip(TASK_QUANTILES, run_times)}
+
+
+def task_spread(stages):
+    """The Spark stage whose slowest task most exceeds its median (straggler), or None."""
+    timed = [s for s in stages or [] if s.get("task_ms_max") is not None and s["tasks"] > 1]
+    if not timed:
+        return None
+    worst = max(timed, key=lambda s: s["task_ms_max"] - s["task_ms_p50"])
+    return {key: worst[key] for key in ("stage_id", "name", "tasks", *TASK_QUANTILES)}
+
+
+def spark_stage_metrics(spark):
+    """Per-stage metrics of the application from the Spark status API.
+
+    The UI's REST endpoint has task time, records and bytes per stage, and
+    per-task run time quantiles; when the UI is disabled only the status
+    tracker's task counts are available.
+    """
+    sc = spark.sparkContext
+    if sc.uiWebUrl:
+        url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages"
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                stages = json.load(response)
+            return [
+                {
+                    "stage_id": stage["stageId"],
+                    "name": stage["name"].split(" at ")[0],
+                    "status": stage["status"],
+                    "tasks": stage["numTasks"],
+                    "executor_run_time_ms": stage["executorRunTime"],
+                    "input_records": stage["inputRecords"],
+                    "input_bytes": stage["inputBytes"],
+                    "output_records": stage["outputRecords"],
+                    "output_bytes": stage["outputBytes"],
+                    "shuffle_read_bytes": stage["shuffleReadBytes"],
+                    "shuffle_write_bytes": stage["shuffleWriteBytes"],
+                    "spilled_bytes": stage["memoryBytesSpilled"] + stage["diskBytesSpilled"],
+                    "peak_execution_memory": stage.get("peakExecutionMemory", 0),
+                    **_task_quantiles(url, stage),
+                }
+                for stage in sorted(stages, key=lambda stage: stage["stageId"])
+            ]
+        except OSError as exc:
+            print(f"⚠️Spark status API unavailable ({exc!r}), using status tracker")
+    tracker = sc.statusTracker()
+    stages = []
+    for job_id in tracker.getJobIdsForGroup():
+        for stage_id in tracker.getJobInfo(job_id).stageIds:
+            info = tracker.getStageInfo(stage_id)
+            if info is not None:
+                stages.append(
+                    {
+                        "stage_id": stage_id,
+                        "name": info.name,
+                        "tasks": info.numTasks,
+                        "failed_tasks": info.numFailedTasks,
+                    }
+                )
+    return sorted(stages, key=lambda stage: stage["stage_id"])
+
+
+def spark_peak_jvm_mb(spark):
+    """Largest peak JVM heap of the driver / executors, from the status API."""
+    sc = spark.sparkContext
+    if not sc.uiWebUrl:
+        return None
+    url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/executors"
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            executors = json.load(response)
+    except OSError:
+        return None
+    peaks = [
+        executor["peakMemoryMetrics"]["JVMHeapMemory"]
+        for executor in executors
+        if "peakMemoryMetrics" in executor
+    ]
+    return round(max(peaks) / 2**20, 1) if peaks else None
+
+
+class Stage:
+    """Wall time, rows, memory and bytes of one pipeline stage.
+
+    start() begins timing, finish() appends the stage to the run report. A
+    stage that dies before finish() is still recorded, as "failed".
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = None
+        self.bytes_written = None
+        self.extra = {}
+        self.spark_stages = None
+        self._started = None
+        self._finished = False
+
+    def start(self):
+        self._started = time.time()
+        self._io_start = _io_counters()
+        atexit.register(self._on_exit)
+        print(f"⏱️Stage {self.name} started, report {report_path()}")
+        return self
+
+    def read(self, *paths):
+        self.bytes_read = (self.bytes_read or 0) + sum(path_size(p) for p in paths)
+
+    def wrote(self, *paths):
+        self.bytes_written = (self.bytes_written or 0) + sum(path_size(p) for p in paths)
+
+    def spark_metrics(self, spark):
+        self.spark_stages = spark_stage_metrics(spark)
+        self.extra["peak_jvm_heap_mb"] = spark_peak_jvm_mb(spark)
+
+    def finish(self, status="ok"):
+        if self._finished:
+            return None
+        self._finished = True
+        ended = time.time()
+        record = {
+            "stage": self.name,
+            "status": status,
+            "started": datetime.fromtimestamp(self._started).isoformat(timespec="seconds"),
+            "wall_seconds": round(ended - self._started, 2),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+        io_end = _io_counters()
+        if self._io_start and io_end:
+            record["process_bytes_read"] = io_end[0] - self._io_start[0]
+            record["process_bytes_written"] = io_end[1] - self._io_start[1]
+        if self.spark_stages is not None:
+            record["spark_stages"] = self.spark_stages
+            record["task_spread"] = task_spread(self.spark_stages)
+        record.update(self.extra)
+        append(record)
+        workers = record["peak_rss_children_mb"]
+        print(
+            f"⏱️Stage {self.name} {status}: {record['wall_seconds']:.1f}s, "
+            f"peak RSS {record['peak_rss_mb']}MB"
+            + (f" (largest worker {workers}MB)" if workers else "")
+            + f", rows {self.rows_in} -> {self.rows_out}"
+        )
+        return record
+
+    def _on_exit(self):
+        self.finish("failed")
+
+
+def append(record, path=None):
+    """Add a stage record to the run report (replacing a previous attempt)."""
+    path = path or report_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    run_id = os.path.splitext(os.path.basename(path))[0]
+    report = load(path) or {"run_id": run_id, "stages": []}
+    report["stages"] = [s for s in report["stages"] if s["stage"] != record["stage"]]
+    report["stages"].append(record)
+    report["wall_seconds"] = round(sum(s["wall_seconds"] for s in report["stages"]), 2)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+
+def compare(previous, current):
+    """Print each stage of current next to the same stage of previous."""
+    before = {s["stage"]: s for s in previous["stages"]} if previous else {}
+    print(f"📋Run {current['run_id']}" + (f" vs. {previous['run_id']}" if previous else ""))
+    for stage in current["stages"]:
+        line = (
+            f"  {stage['stage']:<16} {stage['status']:<7} {stage['wall_seconds']:>9.1f}s"
+            f" {stage['peak_rss_mb']:>9.1f}MB rows_out={stage['rows_out']}"
+        )
+        old = before.get(stage["stage"])
+        if old and old["wall_seconds"]:
+            change = stage["wall_seconds"] / old["wall_seconds"] - 1
+            line += f"  ({change:+.0%} time vs. {old['wall_seconds']:.1f}s)"
+        print(line)
+        for label, run in (("now", stage), ("before", old)):
+            spread = (run or {}).get("task_spread")
+            if spread:
+                print(
+                    f"    {label:<6} slowest task {spread['task_ms_max']}ms vs. median "
+                    f"{spread['task_ms_p50']}ms (p95 {spread['task_ms_p95']}ms) "
+                    f"in stage {spread['stage_id']} {spread['name']}"
+                )
+
+
+if __name__ == "__main__":
+    # python instrumentation.py [RUN_ID]: that run (default: latest) vs. the run before it
+    reports = []
+    if os.path.isdir(REPORT_DIR):
+        reports = sorted(name[:-5] for name in os.listdir(REPORT_DIR) if name.endswith(".json"))
+    current = sys.argv[1] if len(sys.argv) > 1 else (reports[-1] if reports else None)
+    if current not in reports:
+        sys.exit(f"No run report for {current} in {REPORT_DIR}")
+    index = reports.index(current)
+    previous = load(report_path(reports[index - 1])) if index > 0 else None
+    compare(previous, load(report_path(current)))
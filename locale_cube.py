@@ -0,0 +1,149 @@
+"""measures_by_locale as a pre-aggregated grouping-set cube.
+
+snowflake/queries.sql defines measures_by_locale as a view over six GROUPING
+SETS of the whole flightwx table, so every Tableau refresh rescans all
+flights. spark-job.py --locale_cube writes the same grouping sets once per
+year to LOCALE_CUBE_PATH, with additive measures only (counts and sums;
+ratios and the average delay are derived from them), and
+snowflake/locale_cube.sql redefines the view as a sum over that small table.
+Incremental runs recompute the reloaded years and merge them into the rows
+of all other years.
+
+    python locale_cube.py [SPARK_DATA] [CUBE]   # cube vs. the Snowflake view, in DuckDB
+"""
+
+import os
+import sys
+
+from pyspark.sql import functions as F
+
+import checkpoint
+
+LOCALE_CUBE_PATH = "measures_by_locale"
+
+# measures_by_locale grouping sets (snowflake/queries.sql), in spark_data column names
+CARRIER_KEYS = ["OP_CARRIER", "OP_CARRIER_NAME"]
+ORIGIN_KEYS = ["ORIGIN", "AIRPORT_NAME_ORIGIN", "LONGITUDE_ORIGIN", "LATITUDE_ORIGIN"]
+DEST_KEYS = ["DEST", "AIRPORT_NAME_DEST", "LONGITUDE_DEST", "LATITUDE_DEST"]
+KEY_COLUMNS = CARRIER_KEYS + ORIGIN_KEYS + DEST_KEYS
+GROUPING_SETS = [
+    [],
+    ORIGIN_KEYS,
+    DEST_KEYS,
+    CARRIER_KEYS,
+    CARRIER_KEYS + ORIGIN_KEYS,
+    CARRIER_KEYS + ORIGIN_KEYS + DEST_KEYS,
+]
+
+# Additive measures, so cube rows of different years / partitions merge by summing.
+# Upper case like spark_data, as Snowflake's infer_schema keeps Parquet names as-is
+MEASURES = {
+    "TOTAL_FLIGHT_CNT": "COUNT(1)",
+    "DELAYED_CNT": "SUM(CASE WHEN DEP_DELAY > 15 THEN 1 ELSE 0 END)",
+    "CANCELLED_CNT": "SUM(CANCELLED)",
+    "DIVERTED_CNT": "SUM(DIVERTED)",
+    "DEP_DELAY_SUM": "SUM(DEP_DELAY)",
+    "DEP_DELAY_CNT": "COUNT(DEP_DELAY)",
+}
+
+
+def build(spark, flights):
+    """Per-year GROUPING_SETS rows of flights (spark_data rows), one pass.
+
+    GROUPING_SET is the index into GROUPING_SETS; key columns outside the set
+    are null, as in the Snowflake view.
+    """
+    # grouping_id() takes the grouping columns in order of first appearance in the sets
+    grouping_columns = ["year"]
+    for keys in GROUPING_SETS:
+        grouping_columns += [column for column in keys if column not in grouping_columns]
+    # grouping_id() bit of a column is 1 when the row is aggregated over it
+    cases = " ".join(
+        "WHEN {} THEN {}".format(
+            sum(
+                1 << (len(grouping_columns) - 1 - position)
+                for position, column in enumerate(grouping_columns)
+                if column != "year" and column not in keys
+            ),
+            index,
+        )
+        for index, keys in enumerate(GROUPING_SETS)
+    )
+    flights.createOrReplaceTempView("locale_cube_flights")
+    return spark.sql(
+        f"""
+        SELECT year,
+               CASE grouping_id({", ".join(grouping_columns)}) {cases} END AS GROUPING_SET,
+               {", ".join(KEY_COLUMNS)},
+               {", ".join(f"{expression} AS {name}" for name, expression in MEASURES.items())}
+        FROM locale_cube_flights
+        GROUP BY GROUPING SETS ({", ".join(f"({', '.join(['year'] + keys)})" for keys in GROUPING_SETS)})
+        """
+    )
+
+
+def merge(spark, cube, path=LOCALE_CUBE_PATH, years=None):
+    """cube plus the rows of the cube at path for every year not in years.
+
+    Without years (a full run) cube replaces the existing one.
+    """
+    if years and os.path.exists(path):
+        kept = spark.read.parquet(path).where(~F.col("year").isin(list(years)))
+        cube = (
+            kept.unionByName(cube)
+            .groupBy("year", "GROUPING_SET", *KEY_COLUMNS)
+            .agg(*[F.sum(name).alias(name) for name in MEASURES])
+        )
+    return cube
+
+
+def write(cube, path=LOCALE_CUBE_PATH):
+    """Write cube partitioned by year, replacing path once complete."""
+    staged = checkpoint.staging(path)
+    cube.repartition("year").write.partitionBy("year").parquet(staged, mode="overwrite")
+    checkpoint.publish(staged, path)
+
+
+def view_query(sql_path, source):
+    """The measures_by_locale view's query in sql_path, reading FROM source."""
+    with open(sql_path) as f:
+        sql = f.read()
+    head = "CREATE OR REPLACE VIEW final.public.measures_by_locale AS ("
+    start = sql.index(head) + len(head)
+    end = sql.index("FROM agg)", start) + len("FROM agg")
+    query = sql[start:end]
+    for table in ("final.public.flightwx", "final.public.locale_cube"):
+        query = query.replace(table, source)
+    return query
+
+
+def check(spark_data="spark_data", path=LOCALE_CUBE_PATH):
+    """Row-for-row comparison of both measures_by_locale definitions in DuckDB.
+
+    The original view runs over every flight in spark_data, the cube view over
+    path; both come straight from the snowflake/ SQL files.
+    """
+    import duckdb
+
+    import pandas as pd
+
+    sql_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "snowflake")
+    connection = duckdb.connect()
+    # Snowflake's NVL
+    connection.execute("CREATE MACRO nvl(a, b) AS coalesce(a, b)")
+    results = []
+    for sql_file, directory in (("queries.sql", spark_data), ("locale_cube.sql", path)):
+        source = f"read_parquet('{directory}/**/*.parquet', hive_partitioning = true)"
+        frame = connection.sql(view_query(os.path.join(sql_dir, sql_file), source)).df()
+        # Both engines' integer types differ (COUNT vs. SUM of counts), the values must not
+        measures = frame.columns[6:]
+        frame[measures] = frame[measures].astype("float64")
+        results.append(frame.sort_values(list(frame.columns[:10])).reset_index(drop=True))
+    view, cube = results
+    print(f"🧊{len(view)} view rows, {len(cube)} cube rows")
+    pd.testing.assert_frame_equal(view, cube, check_dtype=False, check_exact=True)
+    print("✅ measures_by_locale from the cube matches the view")
+
+
+if __name__ == "__main__":
+    check(*sys.argv[1:3])
@@ -0,0 +1,112 @@
+"""Decode CSV files on several cores, in byte-range blocks, in file order.
+
+pd.read_csv decodes a file on one core. read_files splits each file (after
+its header line) into blocks of about block_bytes that end on a line break,
+decodes each block with pd.read_csv, optionally applies a transform to it in
+the same worker process, and yields the results in file / block order. Block
+boundaries depend only on the files and block_bytes, so the output is the
+same for any number of workers; without a pool the blocks are decoded in this
+process. At most max_pending blocks are in flight, so memory stays bounded as
+with a chunked read.
+
+Lines are split on b"\\n": quoted fields must not contain line breaks (the
+Kaggle files have none).
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import pandas as pd
+
+# Default block size; about 80k rows of a Kaggle <year>.csv
+BLOCK_MB = 16
+
+
+def header(path):
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def file_blocks(path, block_bytes):
+    """(start, end) byte ranges of the lines after path's header, each ending on a line break."""
+    blocks = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        f.readline()
+        start = f.tell()
+        while start < size:
+            if start + block_bytes >= size:
+                end = size
+            else:
+                # From the block's last byte to the end of its line
+                f.seek(start + block_bytes - 1)
+                f.readline()
+                end = f.tell()
+            blocks.append((start, end))
+            start = end
+    return blocks
+
+
+def read_block(path, start, end, names, options, transform=None):
+    """(rows decoded, frame) of one block, transformed if transform is given."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    frame = pd.read_csv(BytesIO(data), header=None, names=names, **options)
+    rows = len(frame)
+    if transform is not None:
+        frame = transform(frame)
+    return rows, frame
+
+
+def decode_pool(workers):
+    """Worker processes for read_files, or None to decode in this process.
+
+    Workers are forked, not spawned: spawning re-imports the calling script,
+    and the pipeline scripts run at import. All of them are started here, so
+    call this before the process starts other threads (pyarrow writers, tqdm).
+    """
+    if workers <= 1:
+        return None
+    if "fork" not in multiprocessing.get_all_start_methods():
+        print("⚠️Forked worker processes are not available here, decoding on one core")
+        return None
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    pool.submit(int).result()
+    return pool
+
+
+def read_files(paths, block_bytes, options=None, transform=None, pool=None, max_pending=1):
+    """Yield (path, rows decoded, frame) for every block of paths, in order.
+
+    options go to pd.read_csv (usecols, dtype, ...), with the names of each
+    file's header. transform must be picklable (a module-level function or a
+    functools.partial of one) when a pool is given.
+    """
+    options = options or {}
+
+    def blocks():
+        for path in paths:
+            names = header(path)
+            for start, end in file_blocks(path, block_bytes):
+                yield path, start, end, names
+
+    tasks = blocks()
+    if pool is None:
+        for path, start, end, names in tasks:
+            yield (path, *read_block(path, start, end, names, options, transform))
+        return
+
+    pending = deque()
+    for path, start, end, names in tasks:
+        pending.append(
+            (path, pool.submit(read_block, path, start, end, names, options, transform))
+        )
+        if len(pending) >= max_pending:
+            path, future = pending.popleft()
+            yield (path, *future.result())
+    while pending:
+        path, future = pending.popleft()
+        yield (path, *future.result())
@@ -0,0 +1,114 @@
+import os
+import shutil
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from schemas import arrow_schema
+
+# Rows of one partition collected before they are written out as a row group
+ROW_GROUP_ROWS = 50_000
+# Rows buffered over all partitions; beyond it the largest partitions are written early
+MAX_BUFFERED_ROWS = 200_000
+# Partition files kept open at once (each holds a file descriptor)
+MAX_OPEN_FILES = 512
+# Row groups in the open files; an open file keeps the metadata of each until closed
+MAX_OPEN_ROW_GROUPS = 512
+
+
+def _segment(name, value):
+    # Hive directory name, with pyarrow's name for a null partition value
+    return f"{name}={'__HIVE_DEFAULT_PARTITION__' if value is None or value != value else value}"
+
+
+def write_partitioned(
+    frames,
+    path,
+    layout,
+    partition_cols,
+    replace=(),
+    row_group_rows=ROW_GROUP_ROWS,
+    max_buffered_rows=MAX_BUFFERED_ROWS,
+    max_open_files=MAX_OPEN_FILES,
+    max_open_row_groups=MAX_OPEN_ROW_GROUPS,
+):
+    """Stream pandas frames into a Hive-partitioned Parquet dataset at path.
+
+    frames may be any iterable of DataFrames (e.g. the chunks of a streaming
+    ingest). Each frame is split by partition as it arrives and its rows are
+    buffered per partition: a partition is written as a row group once it has
+    row_group_rows, and when all partitions together hold more than
+    max_buffered_rows the largest are written early. Memory is bounded by
+    max_buffered_rows, not by the total rows, and small chunks still do not
+    turn into small files: each partition's writer stays open across frames.
+    An open file holds the footer metadata of every row group written to it,
+    so at most max_open_files files (least recently used closed first) with
+    max_open_row_groups row groups between them (the file with the most
+    closed first) stay open; a partition written again after its file was
+    closed gets another part file.
+
+    A leaf partition directory is cleared the first time it is written, and
+    the whole directory of each value of the first partition column in
+    replace (e.g. re-ingested years) is removed up front, so a year that lost
+    an ORIGIN does not keep its old partition.
+    """
+    schema = arrow_schema(layout)
+    file_schema = pa.schema([field for field in schema if field.name not in partition_cols])
+    os.makedirs(path, exist_ok=True)
+    for value in replace:
+        shutil.rmtree(os.path.join(path, f"{partition_cols[0]}={value}"), ignore_errors=True)
+
+    buffered = {}  # partition values -> (tables, rows)
+    writers = OrderedDict()  # partition values -> open ParquetWriter, least recently used first
+    row_groups = {}  # partition values -> row groups in its open file
+    parts = {}  # partition values -> part files started
+
+    def close(key):
+        writers.pop(key).close()
+        del row_groups[key]
+
+    def flush(key):
+        tables, _ = buffered.pop(key)
+        writer = writers.get(key)
+        if writer is None:
+            directory = os.path.join(
+                path, *(_segment(name, value) for name, value in zip(partition_cols, key))
+            )
+            if key not in parts:
+                shutil.rmtree(directory, ignore_errors=True)
+                os.makedirs(directory)
+            parts[key] = parts.get(key, 0) + 1
+            if len(writers) >= max_open_files:
+                close(next(iter(writers)))
+            writer = writers[key] = pq.ParquetWriter(
+                os.path.join(directory, f"part-{parts[key] - 1}.parquet"), file_schema
+            )
+            row_groups[key] = 0
+        writers.move_to_end(key)
+        table = pa.concat_tables(tables)
+        writer.write_table(table, row_group_size=row_group_rows)
+        row_groups[key] += -(-len(table) // row_group_rows)
+        while sum(row_groups.values()) > max_open_row_groups:
+            close(max(row_groups, key=row_groups.get))
+
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False).select(
+                file_schema.names
+            )
+            groups = frame.groupby(partition_cols, observed=True, sort=False, dropna=False)
+            for key, positions in groups.indices.items():
+                key = key if isinstance(key, tuple) else (key,)
+                tables, rows = buffered.get(key, ([], 0))
+                tables.append(table.take(positions))
+                buffered[key] = (tables, rows + len(positions))
+                if buffered[key][1] >= row_group_rows:
+                    flush(key)
+            while sum(rows for _, rows in buffered.values()) > max_buffered_rows:
+                flush(max(buffered, key=lambda key: buffered[key][1]))
+        for key in list(buffered):
+            flush(key)
+    finally:
+        for writer in writers.values():
+            writer.close()
@@ -0,0 +1,261 @@
+"""Local dashboard queries over spark-job.py's spark_data Parquet output.
+
+Answers the dashboard's delay-ratio slices (by origin, destination, carrier,
+route, origin / destination weather condition or season, for a FL_DATE
+range) from spark_data directly, with the measures of measures_by_locale in
+snowflake/queries.sql, so repeated dashboard reads and the serving path can
+be tried without the warehouse.
+
+Only the year=/month= partitions overlapping the date range are listed and
+read, and only the columns the slice needs. Results are kept in an LRU
+cache, each entry valid for the partition files (path, size, mtime) it was
+computed from: a query over a partition that spark-job.py rewrote or added
+is recomputed, others are served from memory.
+
+    python query_service.py serve [--data spark_data] [--port 8050]
+        GET /delay_ratio?by=carrier&start=2018-01-01&end=2018-06-30
+    python query_service.py query --by route [--start ...] [--end ...]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from schemas import JOINED, JOINED_PARTITIONS, arrow_schema
+
+SPARK_DATA_PATH = "spark_data"
+
+# Dashboard slice -> spark_data group-by columns (SEASON is derived from DEP_TIME_UTC)
+DIMENSIONS = {
+    "origin": ["ORIGIN", "AIRPORT_NAME_ORIGIN"],
+    "dest": ["DEST", "AIRPORT_NAME_DEST"],
+    "carrier": ["OP_CARRIER", "OP_CARRIER_NAME"],
+    "route": ["ORIGIN", "DEST"],
+    "weather": ["ORIGIN_WEATHER_CONDITION"],
+    "dest_weather": ["DEST_WEATHER_CONDITION"],
+    "season": ["SEASON"],
+}
+
+# Month of DEP_TIME_UTC -> season, as in flightwx (snowflake/queries.sql); index 0 unused
+SEASONS = pa.array(
+    [None, "Winter", "Winter", "Spring", "Spring", "Spring", "Summer",
+     "Summer", "Summer", "Autumn", "Autumn", "Autumn", "Winter"]
+)
+
+# A departure delayed by more than this counts towards delayed_cnt / delay_ratio
+DELAY_MINUTES = 15
+
+CACHE_ENTRIES = 256
+
+
+def parse_date(value):
+    return date.fromisoformat(value) if value else None
+
+
+def partition_files(root, start=None, end=None):
+    """(path, size, mtime_ns) of the Parquet files in the partitions overlapping [start, end].
+
+    Partitions with a non-numeric value (Spark's __HIVE_DEFAULT_PARTITION__ for
+    a null FL_DATE) can not fall in a date range and are skipped.
+    """
+    year_key, month_key = (f"{name}=" for name in JOINED_PARTITIONS)
+    first = (start.year, start.month) if start else None
+    last = (end.year, end.month) if end else None
+    files = []
+    for year_dir in sorted(os.listdir(root)):
+        if not year_dir.startswith(year_key) or not year_dir[len(year_key):].isdigit():
+            continue
+        year = int(year_dir[len(year_key):])
+        for month_dir in sorted(os.listdir(os.path.join(root, year_dir))):
+            if not month_dir.startswith(month_key) or not month_dir[len(month_key):].isdigit():
+                continue
+            month = (year, int(month_dir[len(month_key):]))
+            if (first and month < first) or (last and month > last):
+                continue
+            directory = os.path.join(root, year_dir, month_dir)
+            for name in sorted(os.listdir(directory)):
+                # Spark's .crc checksums and _SUCCESS markers
+                if name.startswith((".", "_")):
+                    continue
+                stat = os.stat(os.path.join(directory, name))
+                files.append((os.path.join(directory, name), stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def delay_ratio(files, by, start=None, end=None):
+    """measures_by_locale's measures of files' flights in [start, end], grouped by DIMENSIONS[by].
+
+    Returns a pandas frame with lower-case key columns and total_flight_cnt,
+    delayed_cnt, delay_ratio, cancelled_cnt, cancelled_ratio, diverted_cnt,
+    diverted_ratio and avg_dep_delay, most flights first.
+    """
+    keys = DIMENSIONS[by]
+    needed = [key for key in keys if key != "SEASON"] + ["DEP_DELAY", "CANCELLED", "DIVERTED"]
+    if "SEASON" in keys:
+        needed.append("DEP_TIME_UTC")
+    condition = None
+    if start:
+        condition = ds.field("FL_DATE") >= pa.scalar(start, pa.date32())
+    if end:
+        before_end = ds.field("FL_DATE") <= pa.scalar(end, pa.date32())
+        condition = before_end if condition is None else condition & before_end
+
+    if files:
+        table = ds.dataset([path for path, _, _ in files], format="parquet").to_table(
+            columns=needed, filter=condition
+        )
+    else:
+        table = arrow_schema(JOINED).empty_table().select(needed)
+    if "SEASON" in keys:
+        table = table.append_column(
+            "SEASON", pc.take(SEASONS, pc.month(table["DEP_TIME_UTC"]))
+        )
+    delayed = pc.fill_null(pc.greater(table["DEP_DELAY"], DELAY_MINUTES), False)
+    table = table.append_column("DELAYED", pc.cast(delayed, pa.int64()))
+
+    grouped = table.group_by(keys, use_threads=False).aggregate(
+        [
+            ("DEP_DELAY", "count", pc.CountOptions(mode="all")),
+            ("DELAYED", "sum"),
+            ("CANCELLED", "sum"),
+            ("DIVERTED", "sum"),
+            ("DEP_DELAY", "mean"),
+        ]
+    )
+    frame = grouped.to_pandas().rename(
+        columns={
+            "DEP_DELAY_count": "total_flight_cnt",
+            "DELAYED_sum": "delayed_cnt",
+            "CANCELLED_sum": "cancelled_cnt",
+            "DIVERTED_sum": "diverted_cnt",
+            "DEP_DELAY_mean": "avg_dep_delay",
+            **{key: key.lower() for key in keys},
+        }
+    )
+    for measure in ["delayed", "cancelled", "diverted"]:
+        frame[f"{measure}_ratio"] = frame[f"{measure}_cnt"] / frame["total_flight_cnt"]
+    columns = [key.lower() for key in keys] + [
+        "total_flight_cnt", "delayed_cnt", "delay_ratio", "cancelled_cnt",
+        "cancelled_ratio", "diverted_cnt", "diverted_ratio", "avg_dep_delay",
+    ]
+    frame = frame.rename(columns={"delayed_ratio": "delay_ratio"})[columns]
+    return frame.sort_values(
+        ["total_flight_cnt"] + columns[: len(keys)], ascending=[False] + [True] * len(keys)
+    ).reset_index(drop=True)
+
+
+class QueryCache:
+    """LRU cache of delay_ratio results over the spark_data dataset at root.
+
+    An entry is reused only while the partition files its date range covers
+    are unchanged; results are shared between callers, so do not modify them.
+    """
+
+    def __init__(self, root=SPARK_DATA_PATH, entries=CACHE_ENTRIES):
+        self.root = root
+        self.entries = entries
+        self.hits = self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def delay_ratio(self, by, start=None, end=None):
+        """(result frame, True if served from the cache) of delay_ratio."""
+        if by not in DIMENSIONS:
+            raise ValueError(f"by must be one of {', '.join(DIMENSIONS)}, not {by!r}")
+        start, end = parse_date(start), parse_date(end)
+        files = partition_files(self.root, start, end)
+        key = (by, start, end)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == files:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return cached[1], True
+        result = delay_ratio(files, by, start, end)
+        with self._lock:
+            self._results[key] = (files, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self.entries:
+                self._results.popitem(last=False)
+            self.misses += 1
+        return result, False
+
+
+def handler(cache):
+    class DelayRatioHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/delay_ratio":
+                self.send_error(404, "Only /delay_ratio?by=...&start=...&end=... is served")
+                return
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            started = time.perf_counter()
+            try:
+                result, hit = cache.delay_ratio(
+                    params.get("by", ""), params.get("start"), params.get("end")
+                )
+            except ValueError as e:
+                self.send_error(400, str(e))
+                return
+            except OSError as e:
+                # spark_data missing, or swapped by checkpoint.publish mid-query
+                self.send_error(503, f"spark_data is not readable: {e}")
+                return
+            body = result.to_json(orient="records").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Cache", "hit" if hit else "miss")
+            self.send_header("X-Query-Ms", f"{(time.perf_counter() - started) * 1000:.1f}")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return DelayRatioHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data", default=SPARK_DATA_PATH)
+    parser.add_argument("--cache_entries", type=int, default=CACHE_ENTRIES)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="Serve GET /delay_ratio as JSON")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8050)
+    query = commands.add_parser("query", help="Print one slice, cold and then from the cache")
+    query.add_argument("--by", choices=list(DIMENSIONS), required=True)
+    query.add_argument("--start", default=None, help="First FL_DATE, YYYY-MM-DD")
+    query.add_argument("--end", default=None, help="Last FL_DATE, YYYY-MM-DD")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.data):
+        sys.exit(f"❌{args.data} not found, run spark-job.py first")
+    cache = QueryCache(args.data, args.cache_entries)
+    if args.command == "serve":
+        server = ThreadingHTTPServer((args.host, args.port), handler(cache))
+        print(f"📡Serving {args.data} on http://{args.host}:{args.port}/delay_ratio")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    else:
+        for attempt in ("cold", "cached"):
+            started = time.perf_counter()
+            try:
+                result, hit = cache.delay_ratio(args.by, args.start, args.end)
+            except ValueError as e:
+                parser.error(str(e))
+            except OSError as e:
+                # spark_data missing, or swapped by checkpoint.publish mid-query
+                sys.exit(f"❌{args.data} is not readable, retry once spark-job.py is done: {e}")
+            print(f"⏱️{attempt}: {(time.perf_counter() - started) * 1000:.1f}ms (cache {'hit' if hit else 'miss'})")
+        print(result.to_string(max_rows=30))
@@ -3,6 +3,8 @@
  rm -fr spark_data
 
 # Remove specific files 
-rm -f airline_delay_cancellation_data.csv airports.csv merged_weather.csv error.txt airport_ids.txt
+rm -f airline_delay_cancellation_data.csv airline_delay_cancellation_data.meta.json airports.csv error.txt airport_ids.txt
+rm -fr airline_delay_cancellation_data.parquet merged_weather.csv merged_weather.parquet
+rm -fr checkpoints measures_by_locale measures_by_locale.tmp spark_data.tmp airline_delay_cancellation_data.parquet.tmp airline_delay_cancellation_data.csv.tmp
  echo "✅ Rollback completed."
 
@@ -0,0 +1,49 @@
+import json
+import os
+
+import pandas as pd
+
+
+def collect(stats, frame):
+    """Add a frame's date range and per-year / per-airport row counts to stats."""
+    dates = pd.to_datetime(frame["FL_DATE"])
+    for year, group in frame.groupby(dates.dt.year, observed=True):
+        entry = stats.setdefault(
+            str(year), {"min_date": None, "max_date": None, "rows": 0, "airports": {}}
+        )
+        group_dates = dates.loc[group.index]
+        low, high = str(group_dates.min().date()), str(group_dates.max().date())
+        entry["min_date"] = min(filter(None, [entry["min_date"], low]))
+        entry["max_date"] = max(filter(None, [entry["max_date"], high]))
+        entry["rows"] += len(group)
+        counts = group["ORIGIN"].value_counts()
+        # A categorical ORIGIN also lists the airports with no rows here
+        for airport, rows in counts[counts > 0].items():
+            entry["airports"][airport] = entry["airports"].get(airport, 0) + int(rows)
+    return stats
+
+
+def write(path, stats, previous=None):
+    """Write the sidecar; years in stats replace the same years of previous."""
+    years = dict(previous["years"]) if previous else {}
+    years.update(stats)
+    airports = sorted({airport for entry in years.values() for airport in entry["airports"]})
+    metadata = {
+        "min_date": min((entry["min_date"] for entry in years.values()), default=None),
+        "max_date": max((entry["max_date"] for entry in years.values()), default=None),
+        "rows": sum(entry["rows"] for entry in years.values()),
+        "airports": airports,
+        "years": dict(sorted(years.items())),
+    }
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(tmp, path)
+    return metadata
+
+
+def read(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
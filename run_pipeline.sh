@@ -1,14 +1,15 @@
 # Save start time
 start_time=$(date +%s)
 echo "⏱️ Start time: $(date)"
+# All stages of this run write their timings to run_reports/$PIPELINE_RUN_ID.json
+export PIPELINE_RUN_ID=$(date +%Y%m%dT%H%M%S)
 echo "🔗Install dependencies"
 
-pip install kagglehub tqdm geopy pyspark findspark pandas meteostat requests bs4
+pip install kagglehub tqdm geopy pyspark findspark pandas pyarrow meteostat requests bs4
 
 #set -e
 
 # Define Functions # Added by Jiwon
-# Need to add rollback logic (delete output if Spark fails)
 message() {
         printf "%50s\n" | tr " " "-"
         printf "$1\n"
@@ -31,56 +32,170 @@ check() {
         exit 1  # Stop execution
     fi
 }
-# Rollback function
+# Rollback function: only the failed stage's partial outputs are removed, the
+# checkpointed outputs of earlier stages are kept for the next run to resume from
 
 rollback() {
-    echo "🔄 Rolling back... Deleting all files"
-    
-    # Remove Spark directory 
-    rm -fr spark_data
+    echo "🔄 Rolling back stage ${CURRENT_STAGE:-none}..."
 
-    # Remove specific files 
-    rm -f airline_delay_cancellation_data.csv airports.csv merged_weather.csv error.txt airport_ids.txt
+    case "$CURRENT_STAGE" in
+        flight_data)
+            if [ "$INCREMENTAL" = "1" ]; then
+                # Partitions are replaced per year and the ingest state is only saved
+                # at the end, so the next run re-ingests the same years
+                python checkpoint.py rollback flight_data
+            else
+                python checkpoint.py rollback flight_data $FLIGHT_OUTPUTS airport_ids.txt
+            fi
+            ;;
+        weather_data)
+            # Completed airports are kept (merged_weather/_manifest.json) and resumed
+            python checkpoint.py rollback weather_data
+            ;;
+        spark_job)
+            # spark_data is only replaced once the job finished, see spark-job.py; an
+            # incremental run only leaves the staging dirs of its dynamic partition overwrite
+            python checkpoint.py rollback spark_job spark_data.tmp measures_by_locale.tmp
+            rm -rf spark_data/.spark-staging-*
+            ;;
+        *)
+            # Snowflake: the local outputs are complete and checkpointed, keep them
+            ;;
+    esac
 
     echo "✅ Rollback completed."
 }
 
+# Intermediate hand-off format between pipeline stages (csv or parquet)
+FORMAT=parquet
+if [ "$FORMAT" = "parquet" ]; then
+    FLIGHT_OUTPUT="airline_delay_cancellation_data.parquet"
+    WEATHER_OUTPUT="merged_weather.parquet"
+else
+    FLIGHT_OUTPUT="airline_delay_cancellation_data.csv"
+    WEATHER_OUTPUT="merged_weather.csv"
+fi
+# Outputs checkpointed (checkpoints/<stage>.json) after each successful stage
+FLIGHT_OUTPUTS="$FLIGHT_OUTPUT airports.csv"
+if [ "$FORMAT" = "csv" ]; then
+    FLIGHT_OUTPUTS="$FLIGHT_OUTPUTS airline_delay_cancellation_data.meta.json"
+fi
+
+# Incremental mode (parquet only): ingest only new / changed year files and push
+# just those years through Spark and Snowflake
+INCREMENTAL=0
+NEW_YEARS=""
+
+# Spark ingest: spark-job.py reads the raw Kaggle files and does the whitelist filter
+# and enrichment itself; get_data_and_save.py only prepares the reference data
+SPARK_INGEST=0
+RAW_DIR=""
+if [ "$SPARK_INGEST" = "1" ]; then
+    FLIGHT_OUTPUTS="airports.csv airline_delay_cancellation_data.meta.json"
+fi
+if [ "$SPARK_INGEST" = "1" ] && [ "$INCREMENTAL" = "1" ]; then
+    echo "❌ SPARK_INGEST and INCREMENTAL cannot be combined"
+    exit 1
+fi
+
+# Locale cube: spark-job.py also writes the measures_by_locale grouping sets,
+# pre-aggregated per year, and Snowflake serves the view from that small table
+LOCALE_CUBE=0
+# Flights whose departure / arrival hour has no observation take the nearest
+# one up to an hour away; --weather_tolerance_hours 0 is the exact-hour join
+SPARK_OPTIONS="--weather_tolerance_hours 1"
+SPARK_OUTPUTS="spark_data"
+if [ "$LOCALE_CUBE" = "1" ]; then
+    SPARK_OPTIONS="$SPARK_OPTIONS --locale_cube"
+    SPARK_OUTPUTS="spark_data measures_by_locale"
+fi
+
 # Pipeline Operation 
 flight_data(){
+    CURRENT_STAGE=flight_data
     START_YEAR=2018
     echo "🚀Starting the pipeline... Start year is $START_YEAR"
     #echo "Enter the start year: (integer only)"
     #read START_YEAR
-    if [ ! -f "airline_delay_cancellation_data.csv" ] || [ ! -f "airports.csv" ]; then
+    if [ "$SPARK_INGEST" = "1" ] && python checkpoint.py verify flight_data; then
+        echo "✅ Reference data already exists. Moving on to the next step..."
+    elif [ "$SPARK_INGEST" = "1" ]; then
+        echo "⌛️run python script for reference data, flights are processed in Spark..."
+        python get_data_and_save.py --start_year $START_YEAR --reference_only
+
+        exit_code=$?
+        check "✅ Reference data completed successfully." "❌ Reference data failed!" $exit_code
+        python checkpoint.py commit flight_data $FLIGHT_OUTPUTS
+    elif [ "$INCREMENTAL" = "1" ]; then
+        echo "⌛️run python script for incremental flight data ingest from $START_YEAR..."
+        python get_data_and_save.py --start_year $START_YEAR --streaming --output_format parquet --incremental
+
+        exit_code=$?
+        check "✅ Flight data ingest completed successfully." "❌ Flight data ingest failed!" $exit_code
+        python checkpoint.py commit flight_data $FLIGHT_OUTPUTS
+
+        NEW_YEARS=$(python -c "import json; print(','.join(str(y) for y in json.load(open('$FLIGHT_OUTPUT/_ingest_state.json'))['last_run']['years']))")
+        if [ -z "$NEW_YEARS" ]; then
+            message "✅ No new flight data. Nothing to do."
+            exit 0
+        fi
+        echo "🆕 New or changed years: $NEW_YEARS"
+    elif ! python checkpoint.py verify flight_data; then
         echo "⌛️run python script for flight delay data collection from $START_YEAR..."
-        python get_data_and_save.py --start_year $START_YEAR
+        python get_data_and_save.py --start_year $START_YEAR --streaming --output_format $FORMAT
         
         exit_code=$?
         check "✅ Flight data collection completed successfully." "❌ Flight data collection failed!" $exit_code
+        python checkpoint.py commit flight_data $FLIGHT_OUTPUTS
     else
         echo "✅ Data files already exist. Moving on to the next step..."
     fi
 }
 
 weather_data(){
-    if [ ! -f "merged_weather.csv" ]; then
+    CURRENT_STAGE=weather_data
+    # Rerun unless checkpointed after the current flight data; a partial run resumes
+    # (incremental runs always refresh it; the weather cache only fetches missing days)
+    if [ "$INCREMENTAL" = "1" ] || ! python checkpoint.py verify weather_data; then
         echo "⌛️run python script for weather data collection for flight data..."
-        python get_weather.py
+        # With SPARK_INGEST the target airports / dates come from the CSV-side run metadata
+        WEATHER_INPUT=$FORMAT
+        if [ "$SPARK_INGEST" = "1" ]; then
+            WEATHER_INPUT=csv
+        fi
+        python get_weather.py --input_format $WEATHER_INPUT --output_format $FORMAT
         
         exit_code=$?
         check "✅ Weather data collection completed successfully." "❌ Weather data collection failed!" $exit_code
+        python checkpoint.py commit weather_data $WEATHER_OUTPUT
     else
         echo "✅ Weather data file already exists. Moving on to the next step..."
     fi
 }
 
 run_spark(){
-    if [ ! -d spark_data ]; then 
-        echo "⭐️🪄Spark job for data processing..."
-        spark-submit spark-job.py
+    CURRENT_STAGE=spark_job
+    if [ "$INCREMENTAL" = "1" ]; then
+        # spark-job.py replaces only the $NEW_YEARS partitions of spark_data
+        echo "⭐️🪄Spark job for data processing, years $NEW_YEARS..."
+        spark-submit spark-job.py --input_format $FORMAT --years $NEW_YEARS $SPARK_OPTIONS
 
         exit_code=$?
         check "✅ Spark process completed successfully." "❌ Sprak process failed!" $exit_code
+        python checkpoint.py commit spark_job $SPARK_OUTPUTS
+    elif ! python checkpoint.py verify spark_job; then
+        if [ "$SPARK_INGEST" = "1" ]; then
+            echo "⭐️🪄Spark job for data processing, from the raw flight files..."
+            RAW_DIR=$(python -c "import kagglehub; print(kagglehub.dataset_download('yuanyuwendymu/airline-delay-and-cancellation-data-2009-2018'))")
+            spark-submit spark-job.py --input_format raw --raw_dir "$RAW_DIR" --start_year $START_YEAR $SPARK_OPTIONS
+        else
+            echo "⭐️🪄Spark job for data processing..."
+            spark-submit spark-job.py --input_format $FORMAT $SPARK_OPTIONS
+        fi
+
+        exit_code=$?
+        check "✅ Spark process completed successfully." "❌ Sprak process failed!" $exit_code
+        python checkpoint.py commit spark_job $SPARK_OUTPUTS
         echo "Completed! 🎉 Ready to load data to Snowflake"
     else
         echo "✅ Spark data already exists. Moving on to the next step..."
@@ -90,32 +205,56 @@ run_spark(){
 # Snowflake Operation
 
 run_snowflake() {
+    CURRENT_STAGE=snowflake
     export SNOWSQL_PWD="$SNFLK_PASSWORD"
     export SNOWSQL_ACCOUNT="$SNFLK_ACCOUNT"
     export SNOWSQL_USER="$SNFLK_USERNAME"
 
-    ## Define filepath, rename files before loading to Snowflake # Added by Ethan
-    INITIAL_JOINNED_OUTPUT=$(ls -t spark_data/part*.parquet 2>/dev/null | head -n 1)
-
-    # Define new file names
-    JOINNED_OUTPUT="spark_data/sparktbl.parquet"
-
-    mv "$INITIAL_JOINNED_OUTPUT" "$JOINNED_OUTPUT"
-    echo "✅ Renamed $INITIAL_JOINNED_OUTPUT to $JOINNED_OUTPUT"
+    ## spark_data is partitioned by year/month: stage every part file under sparktbl/
+    # keeping the same year=/month= layout, replacing whatever the last run staged.
+    # Incremental runs only stage the reloaded years (spark_data holds all of them)
+    LOAD_DIRS="spark_data"
+    if [ "$INCREMENTAL" = "1" ]; then
+        LOAD_DIRS=$(echo "$NEW_YEARS" | tr ',' '\n' | sed 's|^|spark_data/year=|')
+    fi
+    PUT_STATEMENTS=""
+    for PARTITION in $(find $LOAD_DIRS -name "part-*.parquet" -exec dirname {} \; | sort -u); do
+        PUT_STATEMENTS="$PUT_STATEMENTS PUT 'file://${PWD}/${PARTITION}/part-*.parquet' @project_stage/sparktbl/${PARTITION#spark_data/}/ PARALLEL = 8 OVERWRITE = TRUE;"
+    done
+    echo "✅ $(find $LOAD_DIRS -name "part-*.parquet" | wc -l) part files to load"
+    # The whole cube is small: it is always restaged and reloaded
+    if [ "$LOCALE_CUBE" = "1" ]; then
+        PUT_STATEMENTS="$PUT_STATEMENTS REMOVE @project_stage/locale_cube/;"
+        for PARTITION in $(find measures_by_locale -name "part-*.parquet" -exec dirname {} \; | sort -u); do
+            PUT_STATEMENTS="$PUT_STATEMENTS PUT 'file://${PWD}/${PARTITION}/part-*.parquet' @project_stage/locale_cube/${PARTITION#measures_by_locale/}/ PARALLEL = 8 OVERWRITE = TRUE;"
+        done
+    fi
 
-    echo "❄️Loading the file to Snowflake Stage..."
+    echo "❄️Loading the files to Snowflake Stage..."
     snowsql -q "
         USE ROLE ACCOUNTADMIN;
         USE DATABASE FINAL;
         USE SCHEMA FINAL.PUBLIC;
         USE WAREHOUSE COMPUTE_WH;
-        PUT file://${JOINNED_OUTPUT} @project_stage OVERWRITE = TRUE;
+        REMOVE @project_stage/sparktbl/;
+        $PUT_STATEMENTS
     " 
     check "✅ Data loaded to Snowflake successfully" "❌ Failed to load the file to Snowflake Stage" $?
 
     echo "❄️Running Snowflake query"
-    snowsql -f snowflake/queries.sql                                            
+    if [ "$INCREMENTAL" = "1" ]; then
+        # Replace only the reloaded years in the existing tables
+        snowsql -o variable_substitution=true -D years=$NEW_YEARS -f snowflake/incremental_load.sql
+    else
+        snowsql -f snowflake/queries.sql                                            
+    fi
     check "✅ Snowflake query executed successfully." "❌ Snowflake query FAILED."
+
+    if [ "$LOCALE_CUBE" = "1" ]; then
+        echo "❄️Serving measures_by_locale from the locale cube"
+        snowsql -f snowflake/locale_cube.sql
+        check "✅ Locale cube loaded successfully." "❌ Locale cube load FAILED."
+    fi
 }
 
 
@@ -138,3 +277,5 @@ run_snowflake
 end_time=$(date +%s)
 echo "⏱️ End time: $(date)"
 echo "⏱️ Total Pipeline Elapsed Time: $((end_time - start_time)) seconds"
+# Per-stage report of this run, compared with the previous run
+python instrumentation.py "$PIPELINE_RUN_ID"
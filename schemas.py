@@ -0,0 +1,261 @@
+"""Column layouts shared by get_data_and_save.py, get_weather.py and spark-job.py.
+
+Each layout is an ordered list of (column, type) where the type is a Spark SQL
+type name. Converters build the pandas dtypes / pyarrow schema for the Python
+producers and the Spark StructType for spark-job.py, so both sides agree
+without schema inference. Producers write CSV columns in layout order, which is
+what lets Spark apply a StructType to the CSV header.
+"""
+
+import pandas as pd
+
+# Raw Kaggle columns spark-job.py uses
+FLIGHT_RAW = [
+    ("FL_DATE", "date"),
+    ("OP_CARRIER", "string"),
+    ("OP_CARRIER_FL_NUM", "int"),
+    ("ORIGIN", "string"),
+    ("DEST", "string"),
+    ("CRS_DEP_TIME", "short"),
+    ("DEP_TIME", "float"),
+    ("DEP_DELAY", "float"),
+    ("CRS_ARR_TIME", "short"),
+    ("ARR_TIME", "float"),
+    ("ARR_DELAY", "float"),
+    ("CANCELLED", "float"),
+    ("DIVERTED", "float"),
+    ("ACTUAL_ELAPSED_TIME", "float"),
+]
+
+# Output of get_data_and_save.py: raw columns plus carrier / airport enrichment
+FLIGHT = FLIGHT_RAW + [
+    ("OP_CARRIER_NAME", "string"),
+    ("TIME_ZONE_ORIGIN", "string"),
+    ("TIME_ZONE_DEST", "string"),
+    ("CITY_ORIGIN", "string"),
+    ("CITY_DEST", "string"),
+    ("STATE_ORIGIN", "string"),
+    ("STATE_DEST", "string"),
+    ("COUNTRY_ORIGIN", "string"),
+    ("COUNTRY_DEST", "string"),
+    ("LONGITUDE_ORIGIN", "double"),
+    ("LONGITUDE_DEST", "double"),
+    ("LATITUDE_ORIGIN", "double"),
+    ("LATITUDE_DEST", "double"),
+    ("AIRPORT_NAME_ORIGIN", "string"),
+    ("AIRPORT_NAME_DEST", "string"),
+    ("year", "short"),
+]
+
+# Meteostat Hourly columns, plus the airport the station was fetched for
+WEATHER = [
+    ("time", "timestamp"),
+    ("temp", "double"),
+    ("dwpt", "double"),
+    ("rhum", "double"),
+    ("prcp", "double"),
+    ("snow", "double"),
+    ("wdir", "double"),
+    ("wspd", "double"),
+    ("wpgt", "double"),
+    ("pres", "double"),
+    ("tsun", "double"),
+    ("coco", "double"),
+    ("airport", "string"),
+]
+
+# Output of spark-job.py (ARR_TIME_UTC stays a string, as loaded into Snowflake)
+JOINED = [
+    ("FL_DATE", "date"),
+    ("ORIGIN", "string"),
+    ("DEST", "string"),
+    ("OP_CARRIER", "string"),
+    ("OP_CARRIER_FL_NUM", "int"),
+    ("OP_CARRIER_NAME", "string"),
+    ("AIRPORT_NAME_ORIGIN", "string"),
+    ("AIRPORT_NAME_DEST", "string"),
+    ("CRS_DEP_TIME", "short"),
+    ("DEP_TIME", "float"),
+    ("DEP_DELAY", "float"),
+    ("DEP_DELAY_CATEGORY", "string"),
+    ("CANCELLED", "float"),
+    ("DIVERTED", "float"),
+    ("CITY_ORIGIN", "string"),
+    ("STATE_ORIGIN", "string"),
+    ("COUNTRY_ORIGIN", "string"),
+    ("LONGITUDE_ORIGIN", "double"),
+    ("LATITUDE_ORIGIN", "double"),
+    ("TIME_ZONE_DEST", "string"),
+    ("TIME_ZONE_ORIGIN", "string"),
+    ("DEP_TIME_LOCAL", "timestamp"),
+    ("DEP_TIME_UTC", "timestamp"),
+    ("ARR_TIME_LOCAL", "timestamp"),
+    ("ARR_TIME_UTC", "string"),
+    ("ARR_TIME", "float"),
+    ("ARR_DELAY", "float"),
+    ("ARR_DELAY_CATEGORY", "string"),
+    ("CITY_DEST", "string"),
+    ("STATE_DEST", "string"),
+    ("COUNTRY_DEST", "string"),
+    ("LONGITUDE_DEST", "double"),
+    ("LATITUDE_DEST", "double"),
+    ("ORIGIN_TEMPERATURE_DEG_C", "double"),
+    ("ORIGIN_WIND_SPEED_KM_PER_HR", "double"),
+    ("ORIGIN_RELATIVE_HUMIDITY", "double"),
+    ("ORIGIN_PRECIPITATION", "double"),
+    ("ORIGIN_WEATHER_CONDITION", "string"),
+    ("DEST_TEMPERATURE_DEG_C", "double"),
+    ("DEST_WIND_SPEED_KM_PER_HR", "double"),
+    ("DEST_RELATIVE_HUMIDITY", "double"),
+    ("DEST_PRECIPITATION", "double"),
+    ("DEST_WEATHER_CONDITION", "string"),
+]
+
+# Low-cardinality string columns, held as pandas categoricals and written as
+# Arrow dictionaries (Spark still reads them as plain strings)
+CATEGORICAL = {
+    "OP_CARRIER",
+    "ORIGIN",
+    "DEST",
+    "OP_CARRIER_NAME",
+    "TIME_ZONE_ORIGIN",
+    "TIME_ZONE_DEST",
+    "CITY_ORIGIN",
+    "CITY_DEST",
+    "STATE_ORIGIN",
+    "STATE_DEST",
+    "COUNTRY_ORIGIN",
+    "COUNTRY_DEST",
+    "AIRPORT_NAME_ORIGIN",
+    "AIRPORT_NAME_DEST",
+}
+
+# Hive-style partition columns of the Parquet hand-off
+FLIGHT_PARTITIONS = ["year", "ORIGIN"]
+WEATHER_PARTITIONS = ["airport"]
+# spark-job.py output (spark_data), derived from FL_DATE
+JOINED_PARTITIONS = ["year", "month"]
+
+# Intermediate file names per --output_format / --input_format
+FLIGHT_PATHS = {
+    "csv": "airline_delay_cancellation_data.csv",
+    "parquet": "airline_delay_cancellation_data.parquet",
+}
+# Run-metadata sidecar of the flight output (date range, airports, row counts)
+FLIGHT_METADATA_PATHS = {
+    "csv": "airline_delay_cancellation_data.meta.json",
+    "parquet": "airline_delay_cancellation_data.parquet/_run_metadata.json",
+}
+WEATHER_PATHS = {
+    "csv": "merged_weather.csv",
+    "parquet": "merged_weather.parquet",
+}
+
+
+def columns(layout):
+    return [name for name, _ in layout]
+
+
+def pandas_dtypes(layout):
+    """dtype mapping for pd.read_csv; dates and timestamps are left to parse_dates."""
+    types = {
+        "string": str,
+        "short": "int16",
+        "int": "int32",
+        "float": "float32",
+        "double": "float64",
+    }
+    return {
+        name: "category" if name in CATEGORICAL else types[kind]
+        for name, kind in layout
+        if kind in types
+    }
+
+
+def conform(df, layout):
+    """Select the layout's columns in order and cast them to the layout's types."""
+    df = df[columns(layout)].copy()
+    for name, kind in layout:
+        if kind == "date":
+            df[name] = pd.to_datetime(df[name]).dt.normalize()
+        elif kind == "timestamp":
+            df[name] = pd.to_datetime(df[name], utc=True).dt.tz_localize(None)
+        elif kind != "string" or name in CATEGORICAL:
+            df[name] = df[name].astype(pandas_dtypes([(name, kind)])[name])
+    return df
+
+
+def memory_footprint(df):
+    """Deep bytes per column as held, and as object strings / 64-bit numbers.
+
+    The "before" column is what the frame costs without the layout's compact
+    types, i.e. how pd.read_csv and the old enrichment held it: pandas' default
+    string dtype (object before pandas 3) and 64-bit numbers.
+    """
+    default_string = pd.Series([""]).dtype
+    plain = {}
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(default_string)
+        elif pd.api.types.is_float_dtype(column.dtype):
+            column = column.astype("float64")
+        elif pd.api.types.is_integer_dtype(column.dtype):
+            column = column.astype("int64")
+        plain[name] = column.memory_usage(deep=True, index=False)
+    return pd.DataFrame(
+        {
+            "before_bytes": pd.Series(plain),
+            "after_bytes": df.memory_usage(deep=True, index=False),
+        }
+    )
+
+
+def arrow_schema(layout):
+    import pyarrow as pa
+
+    types = {
+        "date": pa.date32(),
+        "string": pa.string(),
+        "short": pa.int16(),
+        "int": pa.int32(),
+        "float": pa.float32(),
+        "double": pa.float64(),
+        # Meteostat times are UTC; Spark reads tz-aware micros as TimestampType
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema(
+        [
+            (
+                name,
+                pa.dictionary(pa.int32(), pa.string())
+                if kind == "string" and name in CATEGORICAL
+                else types[kind],
+            )
+            for name, kind in layout
+        ]
+    )
+
+
+def spark_schema(layout):
+    from pyspark.sql import types as T
+
+    types = {
+        "date": T.DateType(),
+        "string": T.StringType(),
+        "short": T.ShortType(),
+        "int": T.IntegerType(),
+        "float": T.FloatType(),
+        "double": T.DoubleType(),
+        "timestamp": T.TimestampType(),
+    }
+    return T.StructType(
+        [T.StructField(name, types[kind], True) for name, kind in layout]
+    )
+
+
+def spark_conform(df, layout):
+    """Spark counterpart of conform(): fixed column order and types on a DataFrame."""
+    from pyspark.sql.functions import col
+
+    return df.select([col(name).cast(kind) for name, kind in layout])
@@ -0,0 +1,41 @@
+USE DATABASE final;
+USE SCHEMA final.public;
+
+-- Incremental refresh: replace only the years in &years (comma-separated),
+-- run with: snowsql -o variable_substitution=true -D years=2018,2019 -f ...
+
+--Drop the reloaded years
+DELETE FROM final.public.sparktbl
+WHERE EXTRACT(year FROM fl_date) IN (&years);
+
+--Load data (FORCE: the stage only holds this run's part files)
+COPY INTO final.public.sparktbl
+FROM @project_stage/sparktbl/
+file_format = parquet_format
+match_by_column_name = case_insensitive
+FORCE = TRUE;
+
+--Refresh the same years in the refined table
+DELETE FROM final.public.flightwx
+WHERE EXTRACT(year FROM fl_date) IN (&years);
+
+INSERT INTO final.public.flightwx
+SELECT s.*,
+       EXTRACT(year FROM dep_time_utc) AS year,
+       EXTRACT(month FROM dep_time_utc) AS month,
+       EXTRACT(day FROM dep_time_utc) AS day,
+       EXTRACT(dayofweek FROM dep_time_utc) AS dow,
+       DAYNAME(dep_time_utc) AS dayname,
+       CASE WHEN EXTRACT(dayofweek FROM dep_time_utc) IN (0,6) THEN 1
+            ELSE 0 END AS is_weekend,
+       CASE WHEN EXTRACT(dayofweek FROM dep_time_utc) NOT IN (0,6) THEN 1
+            ELSE 0 END AS is_weekday,
+       CASE 
+        WHEN EXTRACT(month FROM dep_time_utc) IN (3,4,5) THEN 'Spring'
+        WHEN EXTRACT(month FROM dep_time_utc) IN (6,7,8) THEN 'Summer'
+        WHEN EXTRACT(month FROM dep_time_utc) IN (9,10,11) THEN 'Autumn'
+        WHEN EXTRACT(month FROM dep_time_utc) IN (12,1,2) THEN 'Winter' END AS season    
+FROM final.public.sparktbl s
+WHERE EXTRACT(year FROM s.fl_date) IN (&years);
+
+--measures_by_locale / measures_by_time are views over flightwx and pick up the new rows
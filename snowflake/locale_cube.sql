@@ -0,0 +1,61 @@
+USE DATABASE final;
+USE SCHEMA final.public;
+
+--Pre-aggregated measures_by_locale grouping sets, written by spark-job.py --locale_cube
+CREATE OR REPLACE TABLE final.public.locale_cube
+USING template (
+    SELECT array_agg(object_construct(*))
+    FROM TABLE(
+        infer_schema(
+          location=>'@project_stage/locale_cube/',
+          file_format=>'parquet_format'
+        )
+    )
+);
+
+COPY INTO final.public.locale_cube
+FROM @project_stage/locale_cube/
+file_format = parquet_format
+match_by_column_name = case_insensitive;
+
+
+--Same columns as the flightwx-based view in queries.sql, summed over the per-year cube rows
+CREATE OR REPLACE VIEW final.public.measures_by_locale AS (
+WITH agg AS (
+SELECT c.origin,
+       c.dest,
+       c.airport_name_origin,
+       c.airport_name_dest,
+       c.op_carrier,
+       c.op_carrier_name,
+       c.longitude_origin,
+       c.latitude_origin,
+       c.latitude_dest,
+       c.longitude_dest,
+       SUM(c.dep_delay_sum) / SUM(c.dep_delay_cnt) AS avg_dep_delay,
+       SUM(c.total_flight_cnt) AS total_flight_cnt,
+       SUM(c.delayed_cnt) AS delayed_cnt,
+       SUM(c.cancelled_cnt) AS cancelled_cnt,
+       SUM(c.diverted_cnt) AS diverted_cnt,
+       SUM(c.delayed_cnt) / SUM(c.total_flight_cnt) AS delay_ratio,
+       SUM(c.cancelled_cnt) / SUM(c.total_flight_cnt) AS cancelled_ratio,
+       SUM(c.diverted_cnt) / SUM(c.total_flight_cnt) AS diverted_ratio,
+FROM final.public.locale_cube c
+GROUP BY c.grouping_set,
+         c.origin, c.dest, c.airport_name_origin, c.airport_name_dest,
+         c.op_carrier, c.op_carrier_name,
+         c.longitude_origin, c.latitude_origin, c.latitude_dest, c.longitude_dest)
+
+SELECT NVL(origin, 'ALL') AS origin,
+       NVL(dest, 'ALL') AS dest,
+       NVL(airport_name_origin, 'ALL') AS airport_name_origin,
+       NVL(airport_name_dest, 'ALL') AS airport_name_dest,
+       NVL(op_carrier_name, 'ALL') AS op_carrier_name,
+       NVL(op_carrier, 'ALL') AS op_carrier,
+       longitude_origin AS longitude_origin,
+       latitude_origin AS latitude_origin,
+       longitude_dest AS longitude_dest,
+       latitude_dest AS latitude_dest,
+       total_flight_cnt, delayed_cnt, delay_ratio,
+       cancelled_cnt, cancelled_ratio, diverted_cnt, diverted_ratio
+FROM agg);
@@ -7,7 +7,7 @@ USING template (
     SELECT array_agg(object_construct(*))
     FROM TABLE(
         infer_schema(
-          location=>'@project_stage/sparktbl.parquet',  
+          location=>'@project_stage/sparktbl/',  
           file_format=>'parquet_format'
         )
     )
@@ -15,7 +15,7 @@ USING template (
 
 --Load data 
 COPY INTO final.public.sparktbl
-FROM @project_stage/sparktbl.parquet
+FROM @project_stage/sparktbl/
 file_format = parquet_format
 match_by_column_name = case_insensitive;
 
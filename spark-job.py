@@ -2,71 +2,209 @@ from pyspark.sql import SparkSession
 
 from pyspark.sql.functions import (
     col,
-    to_timestamp,
-    date_trunc,
-    row_number,
-    split,
-    regexp_extract,
-    regexp_replace,
     when,
-    round,
-    monotonically_increasing_id,
-    broadcast,
-    floor,
-    lpad,
-    concat_ws,
-    lit,
-    to_utc_timestamp,
-    unix_timestamp,
-    from_unixtime,
-    from_utc_timestamp,
 )
 from pyspark.sql import functions as F
-from pyspark.sql.window import Window
 
+import argparse
 import os
 
+import checkpoint
+from classification import classify_weather, delay_category
+from instrumentation import Stage
+import locale_cube
+import run_metadata
+from schemas import (
+    FLIGHT,
+    FLIGHT_METADATA_PATHS,
+    FLIGHT_PATHS,
+    JOINED,
+    JOINED_PARTITIONS,
+    WEATHER,
+    WEATHER_PATHS,
+    spark_conform,
+    spark_schema,
+)
+from spark_ingest import raw_files, read_raw_flights
+from utc_offsets import add_flight_times, airport_time_zones, offsets_frame
+from weather_join import join_weather, nearest_hourly
 
-def main():
-
-    spark = SparkSession.builder.appName("405_project").getOrCreate()
 
-    airline_df = (
+def read_input(spark, input_format, layout, paths):
+    # Explicit schema from schemas.py: no inference pass, stable types run-to-run
+    reader = (
         spark.read.option(
             "spark.sql.files.maxPartitionBytes", "128MB"
         )  # Optimize partition size
-        .csv("airline_delay_cancellation_data.csv", header=True, inferSchema=True)
-        .select(
-            col("FL_DATE"),
-            col("OP_CARRIER"),
-            col("OP_CARRIER_FL_NUM"),
-            col("ORIGIN"),
-            col("DEST"),
-            col("CRS_DEP_TIME"),
-            col("DEP_TIME"),
-            col("DEP_DELAY"),
-            col("CRS_ARR_TIME"),
-            col("ARR_TIME"),
-            col("ARR_DELAY"),
-            col("CANCELLED"),
-            col("DIVERTED"),
-            col("ACTUAL_ELAPSED_TIME"),
-            col("TIME_ZONE_ORIGIN"),
-            col("TIME_ZONE_DEST"),
-            col("CITY_ORIGIN"),
-            col("CITY_DEST"),
-            col("STATE_ORIGIN"),
-            col("STATE_DEST"),
-            col("COUNTRY_ORIGIN"),
-            col("COUNTRY_DEST"),
-            col("LONGITUDE_ORIGIN"),
-            col("LONGITUDE_DEST"),
-            col("LATITUDE_ORIGIN"),
-            col("LATITUDE_DEST"),
-            col("OP_CARRIER_NAME"),
-            col("AIRPORT_NAME_ORIGIN"),
-            col("AIRPORT_NAME_DEST"),
+        .schema(spark_schema(layout))
+    )
+    if input_format == "parquet":
+        return reader.parquet(paths["parquet"])
+    # Producers write CSV columns in layout order; fail loudly if the header disagrees
+    return reader.option("enforceSchema", False).csv(paths["csv"], header=True)
+
+
+def flight_metadata(input_format, years=None):
+    """Per-year entries of the flight stage's run-metadata sidecar (restricted to years)."""
+    metadata = run_metadata.read(FLIGHT_METADATA_PATHS["csv" if input_format == "raw" else input_format])
+    if not metadata:
+        return []
+    return [
+        entry
+        for year, entry in metadata["years"].items()
+        if (not years or int(year) in years) and entry["min_date"]
+    ]
+
+
+def flight_date_range(input_format, years=None, files=()):
+    """(first, last) FL_DATE of the flights read, without a pass over them, or None.
+
+    From the flight stage's run-metadata sidecar (restricted to years), else
+    whole years of --years / the raw <year>.csv files read.
+    """
+    entries = flight_metadata(input_format, years)
+    if entries:
+        return (
+            min(entry["min_date"] for entry in entries),
+            max(entry["max_date"] for entry in entries),
         )
+    known = years or [int(os.path.basename(file).split(".")[0]) for file in files]
+    if known:
+        return f"{min(known)}-01-01", f"{max(known)}-12-31"
+    return None
+
+
+def main():
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--input_format",
+        choices=["csv", "parquet", "raw"],
+        default="csv",
+        help="raw: read the Kaggle <year>.csv files in --raw_dir and filter / enrich them here",
+    )
+    parser.add_argument(
+        "--raw_dir",
+        default=None,
+        help="Directory of the downloaded Kaggle <year>.csv files (--input_format raw)",
+    )
+    parser.add_argument(
+        "--start_year", type=int, default=2018, help="First year read with --input_format raw"
+    )
+    parser.add_argument(
+        "--years",
+        default=None,
+        help="Comma-separated years to process (e.g. partitions added by --incremental)",
+    )
+    parser.add_argument(
+        "--weather_tolerance_hours",
+        type=int,
+        default=0,
+        help="Use the nearest weather observation up to this many hours away (default 0 = exact)",
+    )
+    parser.add_argument(
+        "--broadcast_weather_mb",
+        type=int,
+        default=256,
+        help="Broadcast the compact weather table up to this size, else shuffle (0 = never)",
+    )
+    parser.add_argument(
+        "--salt_buckets",
+        type=int,
+        default=0,
+        help="Shuffle join: split hot airports' flights over this many join keys (0 = off)",
+    )
+    parser.add_argument(
+        "--skew_factor",
+        type=float,
+        default=4.0,
+        help="An airport is hot above this many times the median airport's flights",
+    )
+    parser.add_argument(
+        "--no_adaptive", action="store_true", help="Disable adaptive query execution"
+    )
+    parser.add_argument(
+        "--no_skew_join",
+        action="store_true",
+        help="Disable AQE's splitting of skewed shuffle join partitions",
+    )
+    parser.add_argument(
+        "--advisory_partition_mb",
+        type=int,
+        default=64,
+        help="AQE target size of shuffle partitions after coalescing / skew splitting",
+    )
+    parser.add_argument(
+        "--locale_cube",
+        action="store_true",
+        help="Also write the measures_by_locale grouping sets, pre-aggregated per year",
+    )
+    args = parser.parse_args()
+    if args.input_format == "raw" and not args.raw_dir:
+        parser.error("--input_format raw needs --raw_dir")
+
+    # Wall time, rows, peak RSS, bytes and Spark stage metrics go to the run report
+    stage = Stage("spark_job").start()
+
+    spark = (
+        SparkSession.builder.appName("405_project")
+        # Parquet weather times are UTC instants; keep the session clock in UTC
+        .config("spark.sql.session.timeZone", "UTC")
+        # Adaptive execution coalesces small shuffle partitions and splits skewed ones
+        .config("spark.sql.adaptive.enabled", str(not args.no_adaptive).lower())
+        .config("spark.sql.adaptive.skewJoin.enabled", str(not args.no_skew_join).lower())
+        .config("spark.sql.adaptive.advisoryPartitionSizeInBytes", f"{args.advisory_partition_mb}m")
+        # Driver-built lookups (UTC offsets) go to Spark as Arrow batches
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+
+    years = [int(year) for year in args.years.split(",")] if args.years else None
+    files = []
+    if args.input_format == "raw":
+        # Whitelist and carrier / airport enrichment as broadcast joins (spark_ingest.py),
+        # no pandas pre-pass; only the selected year files are read
+        files = raw_files(args.raw_dir, args.start_year, years)
+        print(f"Reading raw flight files {[os.path.basename(file) for file in files]}")
+        flights = read_raw_flights(spark, files)
+    else:
+        flights = read_input(spark, args.input_format, FLIGHT, FLIGHT_PATHS)
+        if years:
+            # Partition filter: only the year=... directories are read from Parquet
+            flights = flights.where(col("year").isin(years))
+    if years:
+        print(f"Processing years {years} only")
+
+    airline_df = flights.select(
+        col("FL_DATE"),
+        col("OP_CARRIER"),
+        col("OP_CARRIER_FL_NUM"),
+        col("ORIGIN"),
+        col("DEST"),
+        col("CRS_DEP_TIME"),
+        col("DEP_TIME"),
+        col("DEP_DELAY"),
+        col("CRS_ARR_TIME"),
+        col("ARR_TIME"),
+        col("ARR_DELAY"),
+        col("CANCELLED"),
+        col("DIVERTED"),
+        col("ACTUAL_ELAPSED_TIME"),
+        col("TIME_ZONE_ORIGIN"),
+        col("TIME_ZONE_DEST"),
+        col("CITY_ORIGIN"),
+        col("CITY_DEST"),
+        col("STATE_ORIGIN"),
+        col("STATE_DEST"),
+        col("COUNTRY_ORIGIN"),
+        col("COUNTRY_DEST"),
+        col("LONGITUDE_ORIGIN"),
+        col("LONGITUDE_DEST"),
+        col("LATITUDE_ORIGIN"),
+        col("LATITUDE_DEST"),
+        col("OP_CARRIER_NAME"),
+        col("AIRPORT_NAME_ORIGIN"),
+        col("AIRPORT_NAME_DEST"),
     )
 
     # Remove Unknown timezone (Added by Ethan)
@@ -84,70 +222,30 @@ def main():
     )
     ##
 
-    # Extract hour and minute from DEP_TIME
-    airline_df = airline_df.withColumn("Hour", floor(col("DEP_TIME") / 100).cast("int"))
-
-    # Format Hour and Minute as two-digit strings
-    airline_df = airline_df.withColumn("Hour", lpad(col("Hour"), 2, "0"))
+    # Departure / arrival times: epoch-second arithmetic and broadcast (time zone, hour)
+    # -> UTC offset lookups, precomputed for airports.csv's time zones (utc_offsets.py)
+    # instead of per-row timestamp strings and time zone database lookups. The table
+    # spans the flights' dates, known from the flight stage; aggregated only as a last resort
+    date_range = flight_date_range(args.input_format, years, files)
+    if date_range is None:
+        date_range = airline_df.agg(F.min("FL_DATE"), F.max("FL_DATE")).first()
+    first_date, last_date = date_range
+    offsets = offsets_frame(spark, airport_time_zones(), first_date, last_date)
+    airline_df = add_flight_times(airline_df, offsets)
 
-    # Create Departure_Time in local timezone (based on the Timezone column)
+    # Delay categories are bucket boundaries in classification.py
     airline_df = airline_df.withColumn(
-        "Departure_Time_Local",
-        to_timestamp(
-            concat_ws(
-                " ", col("FL_DATE"), concat_ws(":", col("Hour"), lit("00"), lit("00"))
-            ),
-            "yyyy-MM-dd HH:mm:ss",
-        ),
+        "Departure_Delay_Category", delay_category("DEP_DELAY", "departure")
     )
 
-    # Convert Departure_Time_Local to UTC based on the Timezone column
     airline_df = airline_df.withColumn(
-        "Departure_Time_UTC",
-        to_utc_timestamp(col("Departure_Time_Local"), col("TIME_ZONE_ORIGIN")),
-    )
-
-    # Drop columns
-    airline_df = airline_df.drop("Hour", "Minute")
-
-    airline_df = airline_df.withColumn(
-        "Arrival_Time_UTC",
-        from_unixtime(
-            unix_timestamp(col("Departure_Time_UTC"))
-            + (round(col("ACTUAL_ELAPSED_TIME") / 60) * 3600)
-        ),
-    )
-
-    airline_df = airline_df.withColumn(
-        "Arrival_Time_Local",
-        from_utc_timestamp(col("Arrival_Time_UTC"), col("TIME_ZONE_DEST")),
-    )
-
-    airline_df = airline_df.withColumn(
-        "Departure_Delay_Category",
-        when(col("DEP_DELAY") < 0, "Early_Departure")
-        .when((col("DEP_DELAY") >= 0) & (col("DEP_DELAY") <= 15), "On-Time")
-        .when((col("DEP_DELAY") > 15) & (col("DEP_DELAY") <= 30), "Minor Delay")
-        .when((col("DEP_DELAY") > 30) & (col("DEP_DELAY") <= 60), "Moderate Delay")
-        .when((col("DEP_DELAY") > 60) & (col("DEP_DELAY") <= 120), "Severe Delay")
-        .otherwise("Extreme Delay"),
-    )
-
-    airline_df = airline_df.withColumn(
-        "Arrival_Delay_Category",
-        when(col("ARR_DELAY") < 0, "Early_Arrival")
-        .when((col("ARR_DELAY") >= 0) & (col("ARR_DELAY") <= 15), "On-Time")
-        .when((col("ARR_DELAY") > 15) & (col("ARR_DELAY") <= 30), "Minor Delay")
-        .when((col("ARR_DELAY") > 30) & (col("ARR_DELAY") <= 60), "Moderate Delay")
-        .when((col("ARR_DELAY") > 60) & (col("ARR_DELAY") <= 120), "Severe Delay")
-        .otherwise("Extreme Delay"),
+        "Arrival_Delay_Category", delay_category("ARR_DELAY", "arrival")
     )
 
+    # Weather comes from get_weather.py, in parquet unless the flights were CSV
+    weather_format = "csv" if args.input_format == "csv" else "parquet"
     weather_df = (
-        spark.read.option(
-            "spark.sql.files.maxPartitionBytes", "128MB"
-        )  # should save RAM
-        .csv("merged_weather.csv", header=True, inferSchema=True)
+        read_input(spark, weather_format, WEATHER, WEATHER_PATHS)
         .select(
             col("time"),
             col("temp").alias("temperature_deg_c"),
@@ -159,122 +257,21 @@ def main():
         )
     )
 
-    weather_df = weather_df.withColumn(
-        "weather_condition",
-        when(
-            (col("precipitation") == 0)
-            & (col("temperature_deg_c").between(-2, 35.0))
-            & (col("relative_humidity") < 50)
-            & (col("wind_speed_km_per_hr") < 20),
-            "Clear",
-        )
-        .when(
-            (col("precipitation") == 0)
-            & (col("temperature_deg_c").between(-10.0, 45.0))
-            & (col("relative_humidity").between(50, 75))
-            & (col("wind_speed_km_per_hr") < 30),
-            "Partly Cloudy",
-        )
-        .when(
-            (col("precipitation") == 0)
-            & (col("temperature_deg_c").between(-10.0, 45.0))
-            & (col("relative_humidity") > 75),
-            "Cloudy",
-        )
-        .when(
-            (col("precipitation") > 0.01)
-            & (col("precipitation") <= 10.0)
-            & (col("temperature_deg_c").between(2, 45.0))
-            & (col("relative_humidity") > 55)
-            & (col("wind_speed_km_per_hr") < 25),
-            "Light Rain",
-        )
-        .when(
-            (col("precipitation") > 10.0)
-            & (col("temperature_deg_c").between(2, 45.0))
-            & (col("relative_humidity") > 65)
-            & (col("wind_speed_km_per_hr") < 25),
-            "Heavy Rain",
-        )
-        .when(
-            (col("precipitation") > 0.05)
-            & (col("temperature_deg_c").between(-20, 2))
-            & (col("relative_humidity") > 55),
-            "Snow",
-        )
-        .when(
-            (col("precipitation") > 2.0)
-            & (col("temperature_deg_c").between(-30, 2))
-            & (col("relative_humidity") > 60),
-            "Heavy Snow",
-        )
-        .when(
-            (col("wind_speed_km_per_hr").between(25, 35))
-            & (col("precipitation") > 1)
-            & (col("relative_humidity") > 55),
-            "Windy Rain",
-        )
-        .when(
-            (col("wind_speed_km_per_hr").between(35, 40))
-            & (col("temperature_deg_c") > -5)
-            & (col("precipitation") > 2)
-            & (col("relative_humidity") > 60),
-            "Stormy",
-        )
-        .when(
-            (col("temperature_deg_c") < -5)
-            & (col("wind_speed_km_per_hr").between(40, 50))
-            & (col("precipitation") > 2)
-            & (col("relative_humidity") > 60),
-            "Blizzard",
-        )
-        .when(
-            (col("wind_speed_km_per_hr") > 50)
-            & (col("precipitation") > 5)
-            & (col("relative_humidity") > 70),
-            "Severe Storm",
-        )
-        .when(
-            (col("temperature_deg_c") > 35)
-            & (col("relative_humidity") < 30)
-            & (col("wind_speed_km_per_hr") < 20),
-            "Hot and Dry",
-        )
-        .when(
-            (col("temperature_deg_c") < -15) & (col("wind_speed_km_per_hr") < 20),
-            "Extreme Cold",
-        )
-        .otherwise("Unknown"),
-    )
+    # coco codes through a broadcast lookup; heuristic rules only for hours without coco
+    weather_df = classify_weather(spark, weather_df)
 
-    weather_df = weather_df.withColumn(
-        "weather_condition",
-        when(col("coco").isin(1, 2), "Clear")
-        .when(col("coco").isin(3, 4, 5, 6), "Cloudy")
-        .when(col("coco").isin(7, 8, 17), "Light Rain")
-        .when(col("coco").isin(9, 10, 11, 18), "Heavy Rain")
-        .when(col("coco").isin(12, 14, 15, 19, 21, 24), "Snow")
-        .when(col("coco").isin(13, 16, 20, 22), "Heavy Snow")
-        .when(col("coco").isin(23, 25, 27), "Stormy")
-        .when(col("coco") == 26, "Severe Storm")
-        .otherwise(col("weather_condition")),
-    )
-
-    w1 = weather_df.alias("w1")
-    w2 = weather_df.alias("w2")
+    # As-of join: each (airport, hour) gets the nearest observation within the
+    # tolerance, so the hour-aligned equi-joins below survive missing hours
+    weather_df = nearest_hourly(weather_df, args.weather_tolerance_hours)
 
+    # ORIGIN_* / DEST_* weather columns, via a broadcast lookup when it fits
     joined_spark_output = (
-        airline_df.join(
-            w1,
-            (airline_df["Departure_Time_UTC"] == w1["time"])
-            & (airline_df["ORIGIN"] == w1["airport"]),
-            "left",
-        )
-        .join(
-            w2,
-            (airline_df["Arrival_Time_UTC"] == w2["time"])
-            & (airline_df["DEST"] == w2["airport"]),
-            "left",
+        join_weather(
+            airline_df,
+            weather_df,
+            args.broadcast_weather_mb,
+            salt_buckets=args.salt_buckets,
+            skew_factor=args.skew_factor,
         )
         .select(
             airline_df.FL_DATE,
@@ -310,29 +307,80 @@ def main():
             airline_df.COUNTRY_DEST,
             airline_df.LONGITUDE_DEST,
             airline_df.LATITUDE_DEST,
-            col("w1.temperature_deg_c").alias("ORIGIN_TEMPERATURE_DEG_C"),
-            col("w1.wind_speed_km_per_hr").alias("ORIGIN_WIND_SPEED_KM_PER_HR"),
-            col("w1.relative_humidity").alias("ORIGIN_RELATIVE_HUMIDITY"),
-            col("w1.precipitation").alias("ORIGIN_PRECIPITATION"),
-            col("w1.weather_condition").alias("ORIGIN_WEATHER_CONDITION"),
-            col("w2.temperature_deg_c").alias("DEST_TEMPERATURE_DEG_C"),
-            col("w2.wind_speed_km_per_hr").alias("DEST_WIND_SPEED_KM_PER_HR"),
-            col("w2.relative_humidity").alias("DEST_RELATIVE_HUMIDITY"),
-            col("w2.precipitation").alias("DEST_PRECIPITATION"),
-            col("w2.weather_condition").alias("DEST_WEATHER_CONDITION"),
+            col("ORIGIN_TEMPERATURE_DEG_C"),
+            col("ORIGIN_WIND_SPEED_KM_PER_HR"),
+            col("ORIGIN_RELATIVE_HUMIDITY"),
+            col("ORIGIN_PRECIPITATION"),
+            col("ORIGIN_WEATHER_CONDITION"),
+            col("DEST_TEMPERATURE_DEG_C"),
+            col("DEST_WIND_SPEED_KM_PER_HR"),
+            col("DEST_RELATIVE_HUMIDITY"),
+            col("DEST_PRECIPITATION"),
+            col("DEST_WEATHER_CONDITION"),
         )
     )
 
-    if not os.path.exists("spark_data"):
-        os.makedirs("spark_data")
-    print("🗒️ Saving data to CSV files...")
-    # check number of rows
-    print("Number of rows in depature_df: ", joined_spark_output.count())
+    joined_spark_output = (
+        spark_conform(joined_spark_output, JOINED)
+        .withColumn("year", F.year("FL_DATE"))
+        .withColumn("month", F.month("FL_DATE"))
+    )
 
-    # Export to 1 parquet file using coalesce, into parquet
-    joined_spark_output.coalesce(1).write.parquet("spark_data", mode="overwrite")
+    print("🗒️ Saving data to Parquet, partitioned by year/month...")
+    # Written in parallel, one task per year/month, instead of a single coalesce(1) task
+    writer = joined_spark_output.repartition(*JOINED_PARTITIONS).write.partitionBy(
+        *JOINED_PARTITIONS
+    )
+    if years:
+        # Only the year/month partitions written are replaced: spark_data stays the full
+        # dataset (locale cube, query_service.py) with the --years partitions refreshed
+        spark.conf.set("spark.sql.sources.partitionOverwriteMode", "dynamic")
+        writer.parquet("spark_data", mode="overwrite")
+    else:
+        # The job writes spark_data.tmp, which replaces spark_data once complete
+        staged = checkpoint.staging("spark_data")
+        writer.parquet(staged, mode="overwrite")
+        checkpoint.publish(staged, "spark_data")
+    # join_weather cached the weather lookup; nothing reads it after the write
+    weather_df.unpersist()
+    written = spark.read.parquet("spark_data")
+    if years:
+        written = written.where(col("year").isin(years))
+    # Row count from the written files' Parquet footers, not a second evaluation of the job
+    stage.rows_out = written.count()
+    print("Number of rows in depature_df: ", stage.rows_out)
     print("✅ Data successfully saved!")
 
+    if args.locale_cube:
+        # From the written spark_data partitions (only --years on incremental runs),
+        # merged into the existing cube's other years
+        print("🧊 Updating the measures_by_locale cube...")
+        cube = locale_cube.build(spark, written)
+        locale_cube.write(locale_cube.merge(spark, cube, years=years))
+        print(f"✅ Cube saved to {locale_cube.LOCALE_CUBE_PATH}")
+
+    # Bytes scanned by all Spark stages (flights, weather and their lookups)
+    stage.spark_metrics(spark)
+    stage.bytes_read = sum(s.get("input_bytes", 0) for s in stage.spark_stages)
+    # Flights read: the sidecar's row count, as summing input_records over stages counts
+    # every rescan (weather lookups, counts, the cube) again. Without one (or for raw
+    # input, whose sidecar has no rows), the largest single scan is the flight read
+    stage.rows_in = sum(entry["rows"] for entry in flight_metadata(args.input_format, years))
+    if not stage.rows_in:
+        stage.rows_in = max((s.get("input_records", 0) for s in stage.spark_stages), default=None)
+    stage.wrote("spark_data")
+    if args.locale_cube:
+        stage.wrote(locale_cube.LOCALE_CUBE_PATH)
+    # Skew settings, to read next to the run's task duration spread (task_spread)
+    stage.extra["skew"] = {
+        "salt_buckets": args.salt_buckets,
+        "skew_factor": args.skew_factor,
+        "adaptive": not args.no_adaptive,
+        "skew_join": not args.no_skew_join,
+        "advisory_partition_mb": args.advisory_partition_mb,
+    }
+    stage.finish()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+"""Whitelist filtering and enrichment of the raw Kaggle files in Spark.
+
+Spark-side counterpart of get_data_and_save.py for spark-job.py
+--input_format raw: the <year>.csv files are read as they were downloaded,
+the airport whitelist is applied as a broadcast semi-join and the carrier /
+airport features as broadcast joins. The small reference tables are built by
+the same pandas code as the pandas stage (enrichment.build_airport_lookup,
+last row wins for duplicate codes), so both paths give the same
+schemas.FLIGHT rows.
+"""
+
+import os
+
+import pandas as pd
+from pyspark.sql import functions as F
+
+from enrichment import AIRPORT_FEATURES, build_airport_lookup
+from schemas import FLIGHT, FLIGHT_RAW, spark_conform
+
+# Spark types of the airport lookup columns (enrichment.AIRPORT_FEATURES)
+AIRPORT_TYPES = {
+    "TIME_ZONE": "string",
+    "CITY": "string",
+    "STATE": "string",
+    "COUNTRY": "string",
+    "LONGITUDE": "double",
+    "LATITUDE": "double",
+    "AIRPORT_NAME": "string",
+}
+
+
+def raw_files(raw_dir, start_year, years=None):
+    """<year>.csv paths in raw_dir from start_year on (and in years, if given)."""
+    files = []
+    for file in sorted(os.listdir(raw_dir)):
+        year = int(file.split(".")[0])
+        if year >= start_year and (not years or year in years):
+            files.append(os.path.join(raw_dir, file))
+    return files
+
+
+def _lookup_frame(spark, frame, schema):
+    # Categoricals / NaN become plain objects / None, as Spark expects
+    frame = frame.astype(object).where(frame.notna(), None)
+    return spark.createDataFrame(frame.values.tolist(), schema)
+
+
+def read_raw_flights(
+    spark,
+    files,
+    whitelist_path="airport_whitelist.csv",
+    airports_path="airports.csv",
+    carriers_path="codes_to_carrier.csv",
+):
+    """Whitelisted, enriched flights from raw Kaggle CSVs, in the schemas.FLIGHT layout."""
+    # Kaggle files carry 28 columns (and a trailing empty one); only FLIGHT_RAW is kept
+    flights = spark_conform(spark.read.csv(files, header=True), FLIGHT_RAW)
+
+    whitelist = spark.createDataFrame(
+        [(code,) for code in pd.read_csv(whitelist_path)["ORIGIN"].dropna().unique()],
+        "ORIGIN string",
+    )
+    flights = flights.join(F.broadcast(whitelist), on="ORIGIN", how="left_semi")
+
+    codes_to_carrier = pd.read_csv(carriers_path).dropna(subset=["Code"])
+    code_to_carrier = dict(zip(codes_to_carrier["Code"], codes_to_carrier["Carrier"]))
+    carriers = _lookup_frame(
+        spark,
+        pd.DataFrame(code_to_carrier.items(), columns=["OP_CARRIER", "OP_CARRIER_NAME"]),
+        "OP_CARRIER string, OP_CARRIER_NAME string",
+    )
+    flights = flights.join(F.broadcast(carriers), on="OP_CARRIER", how="left")
+
+    lookup = build_airport_lookup(pd.read_csv(airports_path)).reset_index()
+    for side in ("ORIGIN", "DEST"):
+        columns = [f"{name}_{side}" for name in AIRPORT_FEATURES.values()]
+        airports = _lookup_frame(
+            spark,
+            lookup,
+            ", ".join(
+                [f"{side} string"]
+                + [f"{name}_{side} {AIRPORT_TYPES[name]}" for name in AIRPORT_FEATURES.values()]
+            ),
+        ).select(side, *columns)
+        flights = flights.join(F.broadcast(airports), on=side, how="left")
+
+    flights = flights.withColumn("year", F.year("FL_DATE"))
+    return spark_conform(flights, FLIGHT)
@@ -0,0 +1,120 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+pytest.importorskip("pyspark")
+if not (os.environ.get("JAVA_HOME") or shutil.which("java")):
+    pytest.skip("Spark needs Java (JAVA_HOME or java on PATH)", allow_module_level=True)
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import locale_cube
+from schemas import JOINED, JOINED_PARTITIONS, arrow_schema, columns, conform
+
+AIRPORTS = {
+    "ATL": ("Hartsfield-Jackson Atlanta", -84.43, 33.64),
+    "BOS": ("Logan", -71.01, 42.36),
+    "DEN": ("Denver", -104.67, 39.86),
+    "SEA": ("Seattle-Tacoma", -122.31, 47.45),
+}
+CARRIERS = {"AA": "American Airlines", "DL": "Delta Air Lines", "WN": "Southwest Airlines"}
+
+
+@pytest.fixture(scope="module")
+def spark():
+    from pyspark.sql import SparkSession
+
+    session = (
+        SparkSession.builder.master("local[1]")
+        .appName("test_locale_cube")
+        .config("spark.sql.shuffle.partitions", "2")
+        .config("spark.ui.enabled", "false")
+        .getOrCreate()
+    )
+    yield session
+    session.stop()
+
+
+def flights(year, rows, seed):
+    """rows spark_data flights of year over AIRPORTS and CARRIERS, some delays missing."""
+    rng = np.random.default_rng(seed)
+    origin = rng.choice(list(AIRPORTS), rows)
+    dest = rng.choice(list(AIRPORTS), rows)
+    carrier = rng.choice(list(CARRIERS), rows)
+    delay = rng.integers(-20, 120, rows).astype("float64")
+    delay[rng.random(rows) < 0.1] = np.nan
+    frame = pd.DataFrame({name: None for name in columns(JOINED)}, index=range(rows))
+    frame["FL_DATE"] = pd.Timestamp(f"{year}-01-01") + pd.to_timedelta(
+        rng.integers(0, 365, rows), unit="D"
+    )
+    frame["ORIGIN"], frame["DEST"], frame["OP_CARRIER"] = origin, dest, carrier
+    frame["OP_CARRIER_FL_NUM"] = rng.integers(1, 5000, rows)
+    frame["CRS_DEP_TIME"] = rng.integers(0, 2400, rows)
+    frame["OP_CARRIER_NAME"] = [CARRIERS[code] for code in carrier]
+    for side, codes in (("ORIGIN", origin), ("DEST", dest)):
+        frame[f"AIRPORT_NAME_{side}"] = [AIRPORTS[code][0] for code in codes]
+        frame[f"LONGITUDE_{side}"] = [AIRPORTS[code][1] for code in codes]
+        frame[f"LATITUDE_{side}"] = [AIRPORTS[code][2] for code in codes]
+    frame["DEP_DELAY"] = delay
+    frame["CANCELLED"] = (rng.random(rows) < 0.05).astype("float64")
+    frame["DIVERTED"] = (rng.random(rows) < 0.02).astype("float64")
+    frame = conform(frame, JOINED)
+    frame["year"] = frame["FL_DATE"].dt.year
+    frame["month"] = frame["FL_DATE"].dt.month
+    return frame
+
+
+def write_spark_data(path, frame):
+    """frame as spark-job.py lays out spark_data: Parquet under year=/month=."""
+    schema = arrow_schema(JOINED).append(pa.field("year", pa.int32())).append(
+        pa.field("month", pa.int32())
+    )
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    pq.write_to_dataset(table, path, partition_cols=JOINED_PARTITIONS)
+
+
+def build_cube(spark, spark_data, path, years=None):
+    written = spark.read.parquet(spark_data)
+    if years:
+        written = written.where(written["year"].isin(years))
+    cube = locale_cube.build(spark, written)
+    locale_cube.write(locale_cube.merge(spark, cube, path, years=years), path)
+
+
+def test_cube_matches_view(spark, tmp_path):
+    spark_data, path = str(tmp_path / "spark_data"), str(tmp_path / "measures_by_locale")
+    write_spark_data(spark_data, pd.concat([flights(2017, 400, 1), flights(2018, 400, 2)]))
+    build_cube(spark, spark_data, path)
+    assert sorted(name for name in os.listdir(path) if name.startswith("year=")) == [
+        "year=2017",
+        "year=2018",
+    ]
+    locale_cube.check(spark_data, path)
+
+
+def test_incremental_year_merges_into_cube(spark, tmp_path):
+    spark_data, path = str(tmp_path / "spark_data"), str(tmp_path / "measures_by_locale")
+    write_spark_data(spark_data, pd.concat([flights(2017, 400, 1), flights(2018, 400, 2)]))
+    build_cube(spark, spark_data, path)
+
+    # 2018 is reloaded with other flights; only its cube rows are recomputed
+    shutil.rmtree(os.path.join(spark_data, "year=2018"))
+    write_spark_data(spark_data, flights(2018, 300, 3))
+    build_cube(spark, spark_data, path, years=[2018])
+    locale_cube.check(spark_data, path)
+
+
+def test_check_detects_a_stale_cube(spark, tmp_path):
+    spark_data, path = str(tmp_path / "spark_data"), str(tmp_path / "measures_by_locale")
+    write_spark_data(spark_data, flights(2018, 400, 1))
+    build_cube(spark, spark_data, path)
+
+    shutil.rmtree(spark_data)
+    write_spark_data(spark_data, flights(2018, 400, 2))
+    with pytest.raises(AssertionError):
+        locale_cube.check(spark_data, path)
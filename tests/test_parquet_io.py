@@ -0,0 +1,105 @@
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import pytest
+
+from benchmarks.synthetic import make_airports, make_carriers, make_flights
+from enrichment import add_carrier_names, build_airport_lookup, enrich_airports
+from parquet_io import write_partitioned
+from schemas import FLIGHT, FLIGHT_PARTITIONS, conform
+
+AIRPORTS = make_airports(40)
+CARRIERS = make_carriers()
+LOOKUP = build_airport_lookup(AIRPORTS)
+
+
+def chunk(rows, seed, year=2018):
+    """rows enriched flights of year in the schemas.FLIGHT layout, as the ingest writes them."""
+    frame = make_flights(
+        rows, AIRPORTS["code"], list(CARRIERS), seed=seed, start=f"{year}-01-01"
+    )
+    frame = enrich_airports(add_carrier_names(frame, CARRIERS), LOOKUP)
+    frame["year"] = frame["FL_DATE"].str[:4].astype("int16")
+    return conform(frame, FLIGHT)
+
+
+def sorted_rows(frame):
+    # Row order is not kept across partitions; compare as sorted strings
+    frame = frame[sorted(frame.columns)].astype(str)
+    return frame.sort_values(list(frame.columns)).reset_index(drop=True)
+
+
+def read(path):
+    return sorted_rows(ds.dataset(path, format="parquet", partitioning="hive").to_table().to_pandas())
+
+
+def expected(frames):
+    # Partition values read back as int32
+    return sorted_rows(pd.concat(frames).astype({"year": "int32"}))
+
+
+def files(path):
+    return sorted(
+        os.path.relpath(os.path.join(root, name), path)
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return [chunk(5000, seed, year) for seed, year in enumerate([2017, 2018] * 4)]
+
+
+def test_round_trip(frames, tmp_path):
+    write_partitioned(iter(frames), str(tmp_path), FLIGHT, FLIGHT_PARTITIONS)
+    assert read(str(tmp_path)).equals(expected(frames))
+    # One file per partition: small chunks do not turn into small files
+    assert len(files(str(tmp_path))) == 2 * len(AIRPORTS)
+
+
+def test_open_file_limits_start_new_part_files(frames, tmp_path):
+    write_partitioned(
+        iter(frames), str(tmp_path), FLIGHT, FLIGHT_PARTITIONS,
+        max_buffered_rows=2000, max_open_files=10, max_open_row_groups=20,
+    )
+    written = files(str(tmp_path))
+    assert len(written) > 2 * len(AIRPORTS)
+    assert any(name.endswith("part-1.parquet") for name in written)
+    assert read(str(tmp_path)).equals(expected(frames))
+
+
+def test_replace_removes_whole_years(frames, tmp_path):
+    path = str(tmp_path)
+    write_partitioned(iter(frames), path, FLIGHT, FLIGHT_PARTITIONS)
+    # 2018 is re-ingested without its first airport; 2017 is kept as it was
+    dropped = AIRPORTS["code"].iloc[0]
+    reloaded = chunk(3000, 99)
+    reloaded = reloaded[reloaded["ORIGIN"] != dropped]
+    write_partitioned([reloaded], path, FLIGHT, FLIGHT_PARTITIONS, replace=[2018])
+    assert not os.path.exists(os.path.join(path, "year=2018", f"ORIGIN={dropped}"))
+    kept = [frame for frame in frames if (frame["year"] == 2017).all()]
+    assert read(path).equals(expected(kept + [reloaded]))
+
+
+def test_memory_is_bounded_by_the_buffer_not_the_rows(tmp_path):
+    """Arrow memory in use while writing stays flat as the rows written grow."""
+    in_use = []
+
+    def frames():
+        for seed in range(40):
+            in_use.append(pa.total_allocated_bytes())
+            yield chunk(5000, seed, [2017, 2018][seed % 2])
+
+    write_partitioned(frames(), str(tmp_path), FLIGHT, FLIGHT_PARTITIONS, max_buffered_rows=20000)
+    # Up to the buffer limit first, then flat: the second half of the rows must
+    # not need more than the first
+    assert max(in_use[20:]) <= 1.2 * max(in_use[:20])
+    rows = sum(
+        pq.ParquetFile(os.path.join(tmp_path, name)).metadata.num_rows
+        for name in files(str(tmp_path))
+    )
+    assert rows == 40 * 5000
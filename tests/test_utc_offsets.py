@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from utc_offsets import offset_table
+
+ZONES = ["America/New_York", "America/Phoenix", "Pacific/Honolulu", "America/St_Johns"]
+# 2018 spring-forward and fall-back Sundays in the US (and Newfoundland)
+TRANSITIONS = ["2018-03-11", "2018-11-04"]
+
+
+@pytest.fixture(scope="module")
+def table():
+    return offset_table(ZONES, "2018-03-01", "2018-11-30").set_index(["TIME_ZONE", "hour"])
+
+
+def expected_offsets(zone, hour):
+    """(local_offset, utc_offset) seconds the way Spark resolves the hour.
+
+    A wall-clock hour in the spring-forward gap takes the offset before the
+    transition, an hour repeated at fall-back the earlier (summer) offset.
+    """
+    wall = pd.Timestamp(hour * 3600, unit="s")
+    local = wall.tz_localize(zone, ambiguous=True, nonexistent="shift_backward")
+    utc = wall.tz_localize("UTC").tz_convert(zone)
+    return int(local.utcoffset().total_seconds()), int(utc.utcoffset().total_seconds())
+
+
+@pytest.mark.parametrize("zone", ZONES)
+@pytest.mark.parametrize("day", TRANSITIONS)
+def test_offsets_around_dst_transitions(table, zone, day):
+    first = int(pd.Timestamp(day).timestamp()) // 3600 - 24
+    for hour in range(first, first + 72):
+        row = table.loc[(zone, hour)]
+        assert (row["local_offset"], row["utc_offset"]) == expected_offsets(zone, hour), (
+            zone,
+            pd.Timestamp(hour * 3600, unit="s"),
+        )
+
+
+def test_new_york_gap_and_fold_hours(table):
+    hour = lambda text: int(pd.Timestamp(text).timestamp()) // 3600  # noqa: E731
+    new_york = table.loc["America/New_York"]
+    # 02:00 does not exist on 2018-03-11: EST, so it lands on 03:00 EDT
+    assert new_york.loc[hour("2018-03-11 01:00"), "local_offset"] == -5 * 3600
+    assert new_york.loc[hour("2018-03-11 02:00"), "local_offset"] == -5 * 3600
+    assert new_york.loc[hour("2018-03-11 03:00"), "local_offset"] == -4 * 3600
+    # 01:00 happens twice on 2018-11-04: the first (EDT) one
+    assert new_york.loc[hour("2018-11-04 01:00"), "local_offset"] == -4 * 3600
+    assert new_york.loc[hour("2018-11-04 02:00"), "local_offset"] == -5 * 3600
+    # The switches happen at 07:00 and 06:00 UTC
+    assert new_york.loc[hour("2018-03-11 06:00"), "utc_offset"] == -5 * 3600
+    assert new_york.loc[hour("2018-03-11 07:00"), "utc_offset"] == -4 * 3600
+    assert new_york.loc[hour("2018-11-04 05:00"), "utc_offset"] == -4 * 3600
+    assert new_york.loc[hour("2018-11-04 06:00"), "utc_offset"] == -5 * 3600
+
+
+@pytest.mark.parametrize("zone, offset", [("America/Phoenix", -7), ("Pacific/Honolulu", -10)])
+def test_zones_without_dst_keep_one_offset(table, zone, offset):
+    assert (table.loc[zone, "local_offset"] == offset * 3600).all()
+    assert (table.loc[zone, "utc_offset"] == offset * 3600).all()
+
+
+def test_table_covers_range_with_margin_and_skips_unknown_zones():
+    small = offset_table(["America/New_York", "Mars/Olympus_Mons"], "2018-01-01", "2018-01-01")
+    assert set(small["TIME_ZONE"]) == {"America/New_York"}
+    assert len(small) == 24 * (1 + 2 * 3)
+    assert offset_table(ZONES, None, None).empty
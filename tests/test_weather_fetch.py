@@ -0,0 +1,111 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+import weather_fetch
+from weather_fetch import fetch_all, fetch_with_retry
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FlakyFetch:
+    """fetch(airport, start, end) that fails the first failures[airport] calls per airport."""
+
+    def __init__(self, failures):
+        self.failures = dict(failures)
+        self.calls = {}
+
+    def __call__(self, airport, start, end):
+        self.calls[airport] = self.calls.get(airport, 0) + 1
+        if self.calls[airport] <= self.failures.get(airport, 0):
+            raise ConnectionError(f"{airport} attempt {self.calls[airport]}")
+        return pd.DataFrame({"temp": [float(len(airport))]})
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(weather_fetch.time, "sleep", slept.append)
+    return slept
+
+
+def test_retry_succeeds_after_failures(sleeps):
+    fetch = FlakyFetch({"JFK": 2})
+    data = fetch_with_retry(fetch, "JFK", None, None, retries=3, backoff=0.5)
+    assert len(data) == 1
+    assert fetch.calls == {"JFK": 3}
+    # Exponential backoff before each retry: backoff, 2*backoff, ...
+    assert sleeps == [0.5, 1.0]
+
+
+def test_retry_gives_up_after_retries(sleeps):
+    fetch = FlakyFetch({"JFK": 10})
+    with pytest.raises(ConnectionError, match="attempt 4"):
+        fetch_with_retry(fetch, "JFK", None, None, retries=3, backoff=1.0)
+    assert fetch.calls == {"JFK": 4}
+    assert sleeps == [1.0, 2.0, 4.0]
+
+
+def test_fetch_all_reports_failed_airports(sleeps):
+    airports = ["ATL", "BOS", "JFK", "LAX", "SEA"]
+    fetch = FlakyFetch({"BOS": 1, "JFK": 5, "SEA": 2})
+    results = {
+        airport: (data, error)
+        for airport, data, _, error in fetch_all(
+            fetch, airports, None, None, workers=2, retries=2, backoff=1.0
+        )
+    }
+    assert sorted(results) == airports
+    failed = sorted(airport for airport, (_, error) in results.items() if error is not None)
+    assert failed == ["JFK"]
+    assert isinstance(results["JFK"][1], ConnectionError)
+    assert results["JFK"][0] is None
+    assert all(len(results[airport][0]) == 1 for airport in ["ATL", "BOS", "LAX", "SEA"])
+    # retries=2: JFK gives up after 3 calls, the others stop at their first success
+    assert fetch.calls == {"ATL": 1, "BOS": 2, "JFK": 3, "LAX": 1, "SEA": 3}
+    assert sorted(sleeps) == sorted([1.0] + [1.0, 2.0] + [1.0, 2.0])
+
+
+def test_get_weather_writes_failed_airports_to_error_txt(tmp_path):
+    # Sidecar of get_data_and_save.py: date range and the airports to fetch
+    (tmp_path / "airline_delay_cancellation_data.meta.json").write_text(
+        json.dumps(
+            {"min_date": "2018-01-01", "max_date": "2018-01-02", "airports": ["ATL", "XXX"]}
+        )
+    )
+    source = tmp_path / "hourly"
+    source.mkdir()
+    hours = pd.date_range("2018-01-01", "2018-01-05", freq="h")
+    # Meteostat Hourly columns, as local_source files carry them
+    columns = ["temp", "dwpt", "rhum", "prcp", "snow", "wdir", "wspd", "wpgt", "pres", "tsun"]
+    columns.append("coco")
+    pd.DataFrame({"time": hours, **{name: 1.0 for name in columns}}).to_csv(
+        source / "ATL.csv", index=False
+    )
+
+    # XXX has no <airport>.csv, so every attempt fails like an unknown station
+    subprocess.run(
+        [
+            sys.executable,
+            os.path.join(REPO, "get_weather.py"),
+            "--local_source",
+            str(source),
+            "--no_cache",
+            "--retries",
+            "0",
+            "--workers",
+            "2",
+        ],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": REPO},
+        check=True,
+        capture_output=True,
+    )
+    assert (tmp_path / "error.txt").read_text() == "XXX"
+    manifest = json.loads((tmp_path / "merged_weather.csv" / "_manifest.json").read_text())
+    assert list(manifest["airports"]) == ["ATL"]
+    assert manifest["errors"] == ["XXX"]
@@ -0,0 +1,245 @@
+"""Departure / arrival times from a precomputed (time zone, hour) -> UTC offset table.
+
+spark-job.py used to build a "yyyy-MM-dd HH:00:00" string per flight, parse
+it back and convert it with to_utc_timestamp / from_utc_timestamp and the
+row's time zone name. Here the offsets of every hour in the flights' date
+range are computed once on the driver, for the time zones in airports.csv,
+and broadcast: a flight's times are epoch-second arithmetic plus two
+broadcast hash joins (departure local -> UTC at ORIGIN, arrival UTC -> local
+at DEST). Flights already carry their airports' TIME_ZONE_* columns, so the
+table is keyed by time zone rather than airport: 8,760 rows per zone and year.
+
+Offsets follow Spark's (java.time) resolution of DST edges: a local hour in
+the spring-forward gap takes the offset before the transition, an hour
+repeated at fall-back the earlier (summer) offset, as Python's zoneinfo does
+with fold=0.
+
+    python utc_offsets.py [--airports airports.csv] [--start 2009-01-01] [--end 2018-12-31]
+
+checks every hour of that range, across all its DST transitions, against
+the string / to_utc_timestamp implementation it replaces.
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import functions as F
+
+# Arrivals land up to a day after the last departure; the weather stage also adds 3 days
+MARGIN_DAYS = 3
+
+
+def _hourly(offset_at, first, last):
+    """offset_at(hour) for every hour in [first, last).
+
+    Offsets only change at DST transitions, months apart, so offset_at is
+    evaluated once per day and hour by hour only on the days where it
+    changes: about 7,300 zoneinfo calls per zone and decade, not 87,600.
+    """
+    values = np.empty(last - first, dtype=np.int32)
+    for day in range(first, last, 24):
+        end = min(day + 24, last)
+        if offset_at(day) == offset_at(end):
+            values[day - first : end - first] = offset_at(day)
+        else:
+            values[day - first : end - first] = [offset_at(hour) for hour in range(day, end)]
+    return values
+
+
+def offset_table(time_zones, start, end):
+    """TIME_ZONE, hour, local_offset, utc_offset for every hour from start to end.
+
+    hour counts hours since the epoch. local_offset (seconds) converts the
+    local wall-clock hour to UTC (utc = local - local_offset), utc_offset is
+    the offset in effect at that UTC hour (local = utc + utc_offset). Names
+    zoneinfo does not know are skipped, so their flights get null times.
+    Without a date range (no flights) the table is empty.
+    """
+    frames = []
+    if start is None or end is None:
+        time_zones = []
+        start = end = "1970-01-01"
+    first = int(pd.Timestamp(start).timestamp()) // 3600 - 24 * MARGIN_DAYS
+    last = int(pd.Timestamp(end).timestamp()) // 3600 + 24 * (MARGIN_DAYS + 1)
+    epoch = datetime(1970, 1, 1)
+    for name in sorted(set(time_zones)):
+        try:
+            zone = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"⚠️Unknown time zone {name!r}, its flights get no UTC times")
+            continue
+
+        def local_offset(hour):
+            wall = epoch + timedelta(hours=hour)
+            return int(wall.replace(tzinfo=zone).utcoffset().total_seconds())
+
+        def utc_offset(hour):
+            instant = (epoch + timedelta(hours=hour)).replace(tzinfo=timezone.utc)
+            return int(instant.astimezone(zone).utcoffset().total_seconds())
+
+        frames.append(
+            pd.DataFrame(
+                {
+                    "TIME_ZONE": name,
+                    "hour": np.arange(first, last, dtype=np.int64),
+                    "local_offset": _hourly(local_offset, first, last),
+                    "utc_offset": _hourly(utc_offset, first, last),
+                }
+            )
+        )
+    columns = ["TIME_ZONE", "hour", "local_offset", "utc_offset"]
+    if not frames:
+        return pd.DataFrame(columns=columns).astype(
+            {"hour": "int64", "local_offset": "int32", "utc_offset": "int32"}
+        )
+    return pd.concat(frames, ignore_index=True)[columns]
+
+
+def airport_time_zones(airports_path="airports.csv"):
+    time_zones = pd.read_csv(airports_path)["time_zone"].dropna()
+    return sorted(time_zones[time_zones != "Unknown"].unique())
+
+
+def offsets_frame(spark, time_zones, start, end):
+    """offset_table as a Spark frame; fastest with spark.sql.execution.arrow.pyspark.enabled."""
+    table = offset_table(time_zones, start, end)
+    print(f"🕑UTC offset table: {len(table):,} rows, {table['TIME_ZONE'].nunique()} time zones")
+    # Object strings: pyspark's Arrow conversion can not take pandas' Arrow-backed str columns
+    return spark.createDataFrame(
+        table.astype({"TIME_ZONE": object}),
+        "TIME_ZONE string, hour long, local_offset int, utc_offset int",
+    )
+
+
+def add_flight_times(airline_df, offsets):
+    """Departure_Time_Local / _UTC and Arrival_Time_UTC / _Local from offsets.
+
+    The departure hour is floor(DEP_TIME / 100) on FL_DATE (null outside
+    0-23, e.g. 2400), the arrival the UTC departure plus
+    ACTUAL_ELAPSED_TIME rounded to whole hours.
+    """
+    hour = F.floor(F.col("DEP_TIME") / 100)
+    local_hour = F.when(hour.between(0, 23), F.unix_date("FL_DATE") * 24 + hour)
+    departure = offsets.select(
+        F.col("TIME_ZONE").alias("_dep_zone"),
+        F.col("hour").alias("_dep_hour"),
+        F.col("local_offset").alias("_dep_offset"),
+    )
+    arrival = offsets.select(
+        F.col("TIME_ZONE").alias("_arr_zone"),
+        F.col("hour").alias("_arr_hour"),
+        F.col("utc_offset").alias("_arr_offset"),
+    )
+
+    df = airline_df.withColumn("_local_hour", local_hour.cast("long"))
+    df = df.join(
+        F.broadcast(departure),
+        (F.col("TIME_ZONE_ORIGIN") == F.col("_dep_zone"))
+        & (F.col("_local_hour") == F.col("_dep_hour")),
+        "left",
+    )
+    departure_utc = F.col("_local_hour") * 3600 - F.col("_dep_offset")
+    arrival_utc = (departure_utc + F.round(F.col("ACTUAL_ELAPSED_TIME") / 60) * 3600).cast("long")
+    df = df.withColumn("_arr_utc", arrival_utc).join(
+        F.broadcast(arrival),
+        (F.col("TIME_ZONE_DEST") == F.col("_arr_zone"))
+        & (F.floor(F.col("_arr_utc") / 3600) == F.col("_arr_hour")),
+        "left",
+    )
+    return (
+        df.withColumn("Departure_Time_Local", F.timestamp_seconds(F.col("_local_hour") * 3600))
+        .withColumn("Departure_Time_UTC", F.timestamp_seconds(departure_utc))
+        .withColumn("Arrival_Time_UTC", F.timestamp_seconds(F.col("_arr_utc")))
+        .withColumn(
+            "Arrival_Time_Local", F.timestamp_seconds(F.col("_arr_utc") + F.col("_arr_offset"))
+        )
+        .drop(
+            "_local_hour", "_dep_zone", "_dep_hour", "_dep_offset",
+            "_arr_utc", "_arr_zone", "_arr_hour", "_arr_offset",
+        )
+    )
+
+
+def _string_flight_times(airline_df):
+    # The per-row implementation add_flight_times replaced, kept to check against
+    hour = F.lpad(F.floor(F.col("DEP_TIME") / 100).cast("int"), 2, "0")
+    local = F.to_timestamp(
+        F.concat_ws(" ", F.col("FL_DATE"), F.concat_ws(":", hour, F.lit("00"), F.lit("00"))),
+        "yyyy-MM-dd HH:mm:ss",
+    )
+    df = airline_df.withColumn("Departure_Time_Local", local)
+    df = df.withColumn(
+        "Departure_Time_UTC", F.to_utc_timestamp(F.col("Departure_Time_Local"), F.col("TIME_ZONE_ORIGIN"))
+    )
+    df = df.withColumn(
+        "Arrival_Time_UTC",
+        F.from_unixtime(
+            F.unix_timestamp(F.col("Departure_Time_UTC"))
+            + (F.round(F.col("ACTUAL_ELAPSED_TIME") / 60) * 3600)
+        ),
+    )
+    return df.withColumn(
+        "Arrival_Time_Local", F.from_utc_timestamp(F.col("Arrival_Time_UTC"), F.col("TIME_ZONE_DEST"))
+    )
+
+
+def check(spark, time_zones, start, end):
+    """Every departure hour from start to end, in every zone, both ways; True if equal.
+
+    Each zone's flights arrive in the next zone, after 0-13 hours, so DST
+    edges are crossed on both the departure and the arrival side.
+    """
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days + 1
+    zones = spark.createDataFrame(
+        [(i, zone, time_zones[(i + 1) % len(time_zones)]) for i, zone in enumerate(time_zones)],
+        "zone_id int, TIME_ZONE_ORIGIN string, TIME_ZONE_DEST string",
+    )
+    # 25 "hours" per day: DEP_TIME 2400 must stay null as before
+    flights = (
+        spark.range(days * 25)
+        .select(
+            F.date_add(F.lit(start).cast("date"), (F.col("id") / 25).cast("int")).alias("FL_DATE"),
+            ((F.col("id") % 25) * 100 + F.col("id") % 60).cast("float").alias("DEP_TIME"),
+            ((F.col("id") % 14) * 60 - 20).cast("float").alias("ACTUAL_ELAPSED_TIME"),
+        )
+        .crossJoin(zones)
+    )
+    columns = ["Departure_Time_Local", "Departure_Time_UTC", "Arrival_Time_UTC", "Arrival_Time_Local"]
+    new = add_flight_times(flights, offsets_frame(spark, time_zones, start, end)).withColumn(
+        "Arrival_Time_UTC", F.col("Arrival_Time_UTC").cast("string")
+    )
+    old = _string_flight_times(flights)
+    keys = ["zone_id", "FL_DATE", "DEP_TIME", "ACTUAL_ELAPSED_TIME"]
+    differ = new.select(*keys, *columns).exceptAll(old.select(*keys, *columns)).cache()
+    mismatches = differ.count()
+    print(f"🕑{flights.count():,} flights in {len(time_zones)} time zones, {start} to {end}")
+    if mismatches:
+        differ.orderBy(*keys).show(20, truncate=False)
+        print(f"❌{mismatches} flights differ from to_utc_timestamp / from_utc_timestamp")
+        return False
+    print("✅ UTC offset table matches to_utc_timestamp / from_utc_timestamp, DST edges included")
+    return True
+
+
+if __name__ == "__main__":
+    from pyspark.sql import SparkSession
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--airports", default="airports.csv")
+    parser.add_argument("--start", default="2009-01-01")
+    parser.add_argument("--end", default="2018-12-31")
+    args = parser.parse_args()
+
+    spark = (
+        SparkSession.builder.appName("utc_offsets_check")
+        .config("spark.sql.session.timeZone", "UTC")
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    ok = check(spark, airport_time_zones(args.airports), args.start, args.end)
+    spark.stop()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pandas as pd
+
+
+def _month_ranges(start, end):
+    """(month, first_day, last_day) for every month overlapping [start, end]."""
+    for month in pd.period_range(start, end, freq="M"):
+        first = max(month.start_time.normalize(), start)
+        last = min(month.end_time.normalize(), end)
+        yield str(month), first, last
+
+
+def _merge_runs(intervals):
+    """Merge day intervals that touch, so adjacent months become one fetch."""
+    runs = []
+    for first, last in sorted(intervals):
+        if runs and first <= runs[-1][1] + pd.Timedelta(days=1):
+            runs[-1][1] = max(runs[-1][1], last)
+        else:
+            runs.append([first, last])
+    return runs
+
+
+def cached_source(fetch, cache_dir="weather_cache", refresh_since=None):
+    """Wrap a fetch(airport, start, end) with an on-disk, per-month hourly cache.
+
+    Data lives in <cache_dir>/<airport>/<YYYY-MM>.parquet next to a
+    _coverage.json holding, per month, the last day fetched. Only days after
+    that (or on/after refresh_since, e.g. to pick up late Meteostat
+    corrections) are requested from the wrapped source; everything else is
+    served from disk. Start and end are whole days, end inclusive.
+    """
+    if refresh_since is not None:
+        refresh_since = pd.Timestamp(refresh_since).normalize()
+
+    def cached_fetch(airport, start, end):
+        start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+        airport_dir = os.path.join(cache_dir, airport)
+        os.makedirs(airport_dir, exist_ok=True)
+        coverage_path = os.path.join(airport_dir, "_coverage.json")
+        coverage = {}
+        if os.path.exists(coverage_path):
+            with open(coverage_path) as f:
+                coverage = json.load(f)
+
+        # Which days of each month still need fetching
+        missing = {}
+        for month, first, last in _month_ranges(start, end):
+            covered_until = coverage.get(month)
+            covered_until = pd.Timestamp(covered_until) if covered_until else None
+            if covered_until is not None and refresh_since is not None:
+                covered_until = min(covered_until, refresh_since - pd.Timedelta(days=1))
+            if covered_until is not None and covered_until >= last:
+                continue
+            month_first = pd.Period(month, freq="M").start_time
+            if covered_until is None or covered_until < month_first:
+                fetch_from = month_first  # nothing usable cached for this month
+            else:
+                fetch_from = covered_until + pd.Timedelta(days=1)
+            missing[month] = (fetch_from, last)
+
+        for first, last in _merge_runs(missing.values()):
+            print(f"🌐{airport}: fetching {first.date()} to {last.date()}")
+            data = fetch(airport, first.to_pydatetime(), last.to_pydatetime())
+            months = data.index.to_period("M").astype(str) if len(data) else []
+            for month, (fetch_from, month_last) in missing.items():
+                if not first <= fetch_from <= last:
+                    continue
+                month_path = os.path.join(airport_dir, f"{month}.parquet")
+                fresh = data[months == month] if len(data) else data
+                if os.path.exists(month_path):
+                    # Keep cached hours before the refetched window
+                    cached = pd.read_parquet(month_path)
+                    cached = cached[cached.index < fetch_from]
+                    fresh = pd.concat([cached, fresh]) if len(fresh) else cached
+                if len(fresh):
+                    fresh.sort_index().to_parquet(month_path)
+                # Days from today on may still be missing upstream; never mark them covered
+                yesterday = pd.Timestamp.now().normalize() - pd.Timedelta(days=1)
+                coverage[month] = str(min(month_last, yesterday).date())
+
+            tmp = coverage_path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(coverage, f, indent=2, sort_keys=True)
+            os.replace(tmp, coverage_path)
+
+        frames = [
+            pd.read_parquet(os.path.join(airport_dir, f"{month}.parquet"))
+            for month, _, _ in _month_ranges(start, end)
+            if os.path.exists(os.path.join(airport_dir, f"{month}.parquet"))
+        ]
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames)
+        return data[(data.index >= start) & (data.index < end + pd.Timedelta(days=1))]
+
+    return cached_fetch
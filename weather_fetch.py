@@ -0,0 +1,209 @@
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from schemas import WEATHER, WEATHER_PARTITIONS, conform
+
+
+def fetch_with_retry(fetch, airport, start, end, retries=3, backoff=1.0):
+    """Call fetch, retrying with exponential backoff (backoff, 2*backoff, ...)."""
+    for attempt in range(retries + 1):
+        try:
+            return fetch(airport, start, end)
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+
+def fetch_all(fetch, airports, start, end, workers=8, retries=3, backoff=1.0, max_pending=None):
+    """Fetch every airport on a bounded thread pool.
+
+    Yields (airport, data, seconds, error) as each airport finishes, so a slow
+    station does not hold back the frames fetched after it; PartWriter writes
+    every airport as its own part, so the order does not matter. At most
+    max_pending (default 2 * workers) airports are submitted or waiting to be
+    consumed at once, which keeps memory bounded for long airport lists. data
+    is None and error is the last exception when all attempts failed.
+    """
+    max_pending = max_pending or 2 * workers
+
+    def task(airport):
+        started = time.perf_counter()
+        try:
+            data = fetch_with_retry(fetch, airport, start, end, retries, backoff)
+            return data, time.perf_counter() - started, None
+        except Exception as e:
+            return None, time.perf_counter() - started, e
+
+    todo = iter(airports)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(task, airport): airport for airport in islice(todo, max_pending)}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                airport = pending.pop(future)
+                data, seconds, error = future.result()
+                yield airport, data, seconds, error
+            for airport in islice(todo, max_pending - len(pending)):
+                pending[pool.submit(task, airport)] = airport
+
+
+def local_source(directory):
+    """Offline stand-in for Meteostat reading <directory>/<airport>.csv.
+
+    Files use the Meteostat Hourly layout (a time column plus temp, rhum, prcp,
+    wspd, coco, ...); a missing file raises like an unknown station would.
+    """
+
+    def fetch(airport, start, end):
+        data = pd.read_csv(
+            os.path.join(directory, f"{airport}.csv"),
+            parse_dates=["time"],
+            index_col="time",
+        )
+        # Hourly(start, end) covers the whole end day
+        return data[(data.index >= start) & (data.index < end + pd.Timedelta(days=1))]
+
+    return fetch
+
+
+def nearest_station(stations, latitude, longitude):
+    """Index of the station closest to (latitude, longitude), by great-circle distance."""
+    lat1, lon1 = np.radians(latitude), np.radians(longitude)
+    lat2 = np.radians(stations["latitude"].to_numpy())
+    lon2 = np.radians(stations["longitude"].to_numpy())
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return stations.index[np.argmin(a)]
+
+
+def meteostat_source(airports_path="airports.csv"):
+    """Meteostat Hourly fetch backed by a station catalogue loaded once.
+
+    Stations are looked up by ICAO in a dict built from the catalogue; airports
+    whose ICAO is missing (or unknown to Meteostat) fall back to the nearest
+    station with hourly data, using the coordinates in airports.csv.
+    """
+    from meteostat import Hourly, Stations
+
+    stations = Stations().fetch()
+    if "hourly_start" in stations:
+        stations = stations[stations["hourly_start"].notna()]
+    by_icao = {
+        icao: station_id
+        for station_id, icao in zip(stations.index, stations["icao"])
+        if isinstance(icao, str)
+    }
+
+    airports = pd.read_csv(airports_path).drop_duplicates("code").set_index("code")
+    station_ids = {}
+
+    def resolve(iata):
+        if iata not in station_ids:
+            airport = airports.loc[iata]
+            station_id = by_icao.get(airport["icao"])
+            if station_id is None:
+                station_id = nearest_station(
+                    stations, airport["latitude"], airport["longitude"]
+                )
+                print(f"📍No ICAO station for {iata}, using nearest station {station_id}")
+            station_ids[iata] = station_id
+        return station_ids[iata]
+
+    def fetch(iata, start, end):
+        return Hourly(resolve(iata), start, end).fetch()
+
+    return fetch
+
+
+class PartWriter:
+    """Writes each airport's hourly frame as its own part under path.
+
+    Parquet parts go to airport=<code>/ (Hive layout, as spark-job.py reads
+    them), CSV parts to part-<code>.csv. _manifest.json records every finished
+    airport and is rewritten after each one, so an interrupted run keeps its
+    completed airports and the next run with the same date range skips them.
+    _SUCCESS is only written once every airport has been attempted.
+    """
+
+    def __init__(self, path, output_format, start, end):
+        self.path = path
+        self.output_format = output_format
+        self.start, self.end = str(start), str(end)
+        self.manifest_path = os.path.join(path, "_manifest.json")
+
+        if os.path.isfile(path):  # single-file output of older runs
+            os.remove(path)
+        os.makedirs(path, exist_ok=True)
+        self.manifest = {"start": self.start, "end": self.end, "airports": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                previous = json.load(f)
+            if (previous["start"], previous["end"]) == (self.start, self.end):
+                self.manifest["airports"] = previous["airports"]
+        success = os.path.join(path, "_SUCCESS")
+        if os.path.exists(success):
+            os.remove(success)
+
+    def done(self, airport):
+        return airport in self.manifest["airports"]
+
+    def part_path(self, airport):
+        if self.output_format == "parquet":
+            return os.path.join(self.path, f"airport={airport}")
+        return os.path.join(self.path, f"part-{airport}.csv")
+
+    def remove(self, airport):
+        part = self.part_path(airport)
+        if os.path.isdir(part):
+            shutil.rmtree(part)
+        elif os.path.exists(part):
+            os.remove(part)
+        self.manifest["airports"].pop(airport, None)
+
+    def prune(self, airports):
+        """Drop parts of airports that are not part of this run."""
+        keep = set(airports)
+        for name in os.listdir(self.path):
+            if name.startswith(("_", ".")):
+                continue
+            airport = name.split("=")[-1] if "=" in name else name[5:-4]
+            if airport not in keep or not self.done(airport):
+                self.remove(airport)
+
+    def write(self, airport, data, seconds):
+        self.remove(airport)
+        rows = len(data)
+        if rows:
+            data = data.copy()
+            data["airport"] = airport
+            # Fixed column order and types (schemas.WEATHER), which spark-job.py reads with
+            data = conform(data.reset_index(), WEATHER)
+            if self.output_format == "parquet":
+                from parquet_io import write_partitioned
+
+                write_partitioned([data], self.path, WEATHER, WEATHER_PARTITIONS)
+            else:
+                data.to_csv(self.part_path(airport), index=False)
+        self.manifest["airports"][airport] = {"rows": rows, "seconds": round(seconds, 3)}
+        self._save_manifest()
+
+    def finish(self, errors):
+        self.manifest["errors"] = list(errors)
+        self._save_manifest()
+        open(os.path.join(self.path, "_SUCCESS"), "w").close()
+
+    def _save_manifest(self):
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
@@ -0,0 +1,218 @@
+from pyspark.sql import functions as F
+from pyspark.sql.window import Window
+
+
+def nearest_hourly(weather_df, tolerance_hours=1):
+    """As-of weather lookup table: one row per (airport, hour bucket).
+
+    Each observation is offered to every hour bucket within tolerance_hours of
+    it, and each (airport, bucket) keeps the nearest one (the earlier on ties).
+    The result replaces time with the bucket and is partitioned by
+    (airport, time), so flights keep their single equi-join per side on the
+    hour-aligned departure / arrival times but no longer get nulls for a
+    missing hourly observation. The expansion is on the small weather side
+    only: at most 2 * tolerance_hours + 1 rows per observation.
+    tolerance_hours=0 is the exact-timestamp join (minus duplicate rows).
+    """
+    columns = weather_df.columns
+    offsets = F.array(
+        [F.lit(hours) for hours in range(-tolerance_hours, tolerance_hours + 1)]
+    )
+    observed = F.col("time").cast("long")
+    bucket = F.date_trunc("hour", F.col("time")).cast("long") + F.col("offset") * 3600
+
+    candidates = (
+        weather_df.where(F.col("time").isNotNull())
+        .withColumn("offset", F.explode(offsets))
+        .withColumn("bucket", bucket)
+        .withColumn("distance", F.abs(observed - F.col("bucket")))
+        .where(F.col("distance") <= tolerance_hours * 3600)
+    )
+    nearest = Window.partitionBy("airport", "bucket").orderBy("distance", "time")
+    return (
+        candidates.withColumn("rank", F.row_number().over(nearest))
+        .where(F.col("rank") == 1)
+        .withColumn("time", F.timestamp_seconds(F.col("bucket")))
+        .select(columns)
+        .repartition("airport", "time")
+    )
+
+
+# weather_df column -> output column suffix (prefixed with ORIGIN_ / DEST_)
+WEATHER_FEATURES = {
+    "temperature_deg_c": "TEMPERATURE_DEG_C",
+    "wind_speed_km_per_hr": "WIND_SPEED_KM_PER_HR",
+    "relative_humidity": "RELATIVE_HUMIDITY",
+    "precipitation": "PRECIPITATION",
+    "weather_condition": "WEATHER_CONDITION",
+}
+
+# Flight-side join keys per output prefix: (airport column, hour-aligned UTC time column)
+JOIN_SIDES = {
+    "ORIGIN": ("ORIGIN", "Departure_Time_UTC"),
+    "DEST": ("DEST", "Arrival_Time_UTC"),
+}
+
+# Estimated bytes per row of the compact table (int + long + 4 doubles + int, plus overhead)
+COMPACT_ROW_BYTES = 64
+
+
+def airport_counts(airline_df):
+    """{side: {airport: flights}} for the ORIGIN and DEST join keys."""
+    return {
+        side: {
+            row[airport_col]: row["count"]
+            for row in airline_df.groupBy(airport_col).count().collect()
+        }
+        for side, (airport_col, _) in JOIN_SIDES.items()
+    }
+
+
+def hot_airports(counts, skew_factor=4.0):
+    """{side: [airport, ...]} with more than skew_factor x the median airport's flights."""
+    hot = {}
+    for side, rows in counts.items():
+        sizes = sorted(rows.values())
+        median = sizes[len(sizes) // 2] if sizes else 0
+        hot[side] = sorted(airport for airport, n in rows.items() if n > skew_factor * median)
+        top = sorted(rows.items(), key=lambda item: item[1], reverse=True)[:5]
+        print(
+            f"📊{side}: {len(rows)} airports, median {median:,} flights, "
+            f"top {', '.join(f'{a} {n:,}' for a, n in top)}; hot {hot[side]}"
+        )
+    return hot
+
+
+def shuffle_join(airline_df, weather_df, hot=None, salt_buckets=0):
+    """Equi-join weather on (airport, time) for ORIGIN and DEST via shuffles.
+
+    With salt_buckets > 1 the flights of each side's hot airports ({side:
+    [airport, ...]}) are spread over salt_buckets join keys by a hash of the
+    flight row, and those airports' weather rows are replicated once per salt,
+    so no single shuffle partition carries a whole hub.
+    """
+    joined = airline_df
+    flight_hash = F.xxhash64(*airline_df.columns)
+    for side, (airport_col, time_col) in JOIN_SIDES.items():
+        side_weather = weather_df.select(
+            F.col("airport").alias(f"_{side}_airport"),
+            F.col("time").alias(f"_{side}_time"),
+            *[F.col(name).alias(f"{side}_{out}") for name, out in WEATHER_FEATURES.items()],
+        )
+        condition = (F.col(time_col) == F.col(f"_{side}_time")) & (
+            F.col(airport_col) == F.col(f"_{side}_airport")
+        )
+        salted = salt_buckets > 1 and hot and hot.get(side)
+        if salted:
+            is_hot = F.col(airport_col).isin(hot[side])
+            joined = joined.withColumn(
+                f"_{side}_salt",
+                F.when(is_hot, F.pmod(flight_hash, F.lit(salt_buckets))).otherwise(F.lit(0)),
+            )
+            side_weather = side_weather.withColumn(
+                f"_{side}_weather_salt",
+                F.explode(
+                    F.when(
+                        F.col(f"_{side}_airport").isin(hot[side]),
+                        F.sequence(F.lit(0), F.lit(salt_buckets - 1)),
+                    ).otherwise(F.array(F.lit(0)))
+                ),
+            )
+            condition = condition & (
+                F.col(f"_{side}_salt") == F.col(f"_{side}_weather_salt").cast("long")
+            )
+        joined = joined.join(side_weather, condition, "left").drop(
+            f"_{side}_airport", f"_{side}_time"
+        )
+        if salted:
+            joined = joined.drop(f"_{side}_salt", f"_{side}_weather_salt")
+    return joined
+
+
+def _literal_map(mapping):
+    return F.create_map(*[F.lit(value) for pair in mapping.items() for value in pair])
+
+
+def broadcast_join(airline_df, weather_df, airports, conditions):
+    """Join weather for ORIGIN and DEST through a broadcast compact table.
+
+    Airports and weather conditions are dictionary-encoded to ints and time
+    becomes an epoch-hour long, so the broadcast table holds only numbers.
+    Both lookups are broadcast hash joins: the flight table is not shuffled.
+    """
+    airport_ids = _literal_map({airport: i for i, airport in enumerate(airports)})
+    condition_ids = _literal_map({name: i for i, name in enumerate(conditions)})
+    condition_names = _literal_map({i: name for i, name in enumerate(conditions)})
+    numeric = [name for name in WEATHER_FEATURES if name != "weather_condition"]
+
+    compact = weather_df.select(
+        airport_ids[F.col("airport")].alias("airport_id"),
+        F.col("time").cast("long").alias("hour"),
+        *[F.col(name).cast("double") for name in numeric],
+        condition_ids[F.col("weather_condition")].alias("condition_id"),
+    )
+
+    joined = airline_df
+    for side, (airport_col, time_col) in JOIN_SIDES.items():
+        side_weather = compact.select(
+            F.col("airport_id").alias(f"_{side}_airport_id"),
+            F.col("hour").alias(f"_{side}_hour"),
+            *[F.col(name).alias(f"{side}_{WEATHER_FEATURES[name]}") for name in numeric],
+            F.col("condition_id").alias(f"_{side}_condition_id"),
+        )
+        joined = (
+            joined.join(
+                F.broadcast(side_weather),
+                (airport_ids[F.col(airport_col)] == F.col(f"_{side}_airport_id"))
+                & (
+                    F.col(time_col).cast("timestamp").cast("long")
+                    == F.col(f"_{side}_hour")
+                ),
+                "left",
+            )
+            .withColumn(
+                f"{side}_WEATHER_CONDITION",
+                condition_names[F.col(f"_{side}_condition_id")],
+            )
+            .drop(f"_{side}_airport_id", f"_{side}_hour", f"_{side}_condition_id")
+        )
+    return joined
+
+
+def join_weather(airline_df, weather_df, broadcast_mb=256, salt_buckets=0, skew_factor=4.0):
+    """Attach ORIGIN_* / DEST_* weather columns, broadcasting when it fits.
+
+    The compact table is broadcast when its estimated size is within
+    broadcast_mb (0 disables); otherwise both sides fall back to shuffle joins,
+    salting the hot airports (see hot_airports) when salt_buckets > 1.
+    weather_df is cached for the size estimate and the lookups built from it;
+    call weather_df.unpersist() once the result has been written.
+    """
+    weather_df = weather_df.cache()
+    if broadcast_mb > 0:
+        rows = weather_df.count()
+        estimated_mb = rows * COMPACT_ROW_BYTES / 2**20
+        if estimated_mb <= broadcast_mb:
+            airports = sorted(
+                row.airport for row in weather_df.select("airport").distinct().collect()
+            )
+            conditions = sorted(
+                row.weather_condition
+                for row in weather_df.select("weather_condition").distinct().collect()
+                if row.weather_condition is not None
+            )
+            print(
+                f"📡Broadcasting compact weather table: {rows:,} rows, "
+                f"~{estimated_mb:.0f}MB, {len(airports)} airports"
+            )
+            return broadcast_join(airline_df, weather_df, airports, conditions)
+        print(
+            f"🔀Weather table ~{estimated_mb:.0f}MB exceeds {broadcast_mb}MB, "
+            "using shuffle joins"
+        )
+    hot = None
+    if salt_buckets > 1:
+        # Flights per airport up front, to find the hubs that would become straggler tasks
+        hot = hot_airports(airport_counts(airline_df), skew_factor)
+        print(f"🧂Salting hot airports over {salt_buckets} join keys")
+    return shuffle_join(airline_df, weather_df, hot, salt_buckets)